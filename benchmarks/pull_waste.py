@@ -0,0 +1,88 @@
+import django
+import os
+import sys
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from common.benchmark import benchmark_database
+
+from metar_practice.models import Airport
+from metar_practice.models import AirportPullState
+
+from metar_practice.pull_scheduler import PullScheduler
+
+from types import SimpleNamespace
+
+import datetime
+import random
+
+
+airport_count = 2000
+dead_airport_share = 0.3
+hour_pull_count = 100
+simulated_hours = 24 * 14
+start_time = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def fetch(icao, now, dead_icaos):
+    """ Simulated AVWX call, dead stations never report and live ones report at ten to every hour """
+    if icao in dead_icaos:
+        return 204, None
+    observed_at = now.replace(minute=50, second=0, microsecond=0)
+    if observed_at > now:
+        observed_at -= datetime.timedelta(hours=1)
+    return 200, SimpleNamespace(observed_at=observed_at)
+
+
+def run_random(db_airports, dead_icaos):
+    """ Uniform random pick pull_metar_data used before the scheduler, returns (calls, wasted calls) """
+    seen = {}
+    wasted = 0
+    for hour in range(0, simulated_hours):
+        now = start_time + datetime.timedelta(hours=hour)
+        for db_airport in random.choices(db_airports, k=hour_pull_count):
+            status, db_metar = fetch(db_airport.icao, now, dead_icaos)
+            if status != 200 or seen.get(db_airport.icao) == db_metar.observed_at:
+                wasted += 1
+                continue
+            seen[db_airport.icao] = db_metar.observed_at
+    return simulated_hours * hour_pull_count, wasted
+
+
+def run_scheduler(dead_icaos):
+    """ PullScheduler with failure backoff and quarantine, returns (calls, wasted calls, airports quarantined) """
+    pull_scheduler = PullScheduler()
+    calls = 0
+    for hour in range(0, simulated_hours):
+        now = start_time + datetime.timedelta(hours=hour)
+        for db_airport in pull_scheduler.get_due_airports(hour_pull_count, now=now):
+            status, db_metar = fetch(db_airport.icao, now, dead_icaos)
+            pull_scheduler.record_pull(db_airport, status, db_metar, now=now)
+            calls += 1
+    return calls, pull_scheduler.unchanged_reports + pull_scheduler.failures, AirportPullState.objects.filter(quarantined=True).count()
+
+
+def report(label, calls, wasted):
+    print('{0:<24} {1:>8} calls  {2:>8} wasted  {3:>6.1%}'.format(label, calls, wasted, wasted / calls if calls > 0 else 0))
+
+
+def main():
+    random.seed(0)
+    with benchmark_database():
+        Airport.objects.bulk_create([Airport(name='Benchmark Airport', city='Benchmark', country='Benchmark',
+                                             icao='B{0:03d}'.format(i), latitude='0', longitude='0') for i in range(0, airport_count)])
+        db_airports = list(Airport.objects.all())
+        dead_icaos = set(db_airport.icao for db_airport in random.sample(db_airports, int(airport_count * dead_airport_share)))
+        print('Pulling {0} of {1} airports an hour for {2} hours, {3} never report'.format(hour_pull_count, airport_count,
+                                                                                           simulated_hours, len(dead_icaos)))
+
+        report('Uniform random', *run_random(db_airports, dead_icaos))
+        calls, wasted, quarantined = run_scheduler(dead_icaos)
+        report('PullScheduler', calls, wasted)
+        print('{0} of {1} dead airports quarantined'.format(quarantined, len(dead_icaos)))
+
+
+if __name__ == '__main__':
+    main()
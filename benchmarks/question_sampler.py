@@ -0,0 +1,68 @@
+import django
+import os
+import sys
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from django.core.cache import cache
+
+from common.benchmark import benchmark_database
+from common.benchmark import format_latencies
+from common.benchmark import time_calls
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Question
+
+from metar_practice.enums import QuestionType
+
+from metar_practice.question_sampler import QuestionSampler
+
+
+table_sizes = [10000, 100000, 1000000]
+sampler_repeat = 2000
+baseline_repeat = 20                    # ORDER BY RANDOM() takes seconds per call at 1M rows
+questions_per_metar = 17
+insert_batch_size = 10000
+
+
+def populate_questions(db_metars, count):
+    """ Inserts questions until the table holds count rows, spread across metars like a real pull would """
+    categories = [question_type.value for question_type in QuestionType]
+    existing = Question.objects.count()
+    db_questions = []
+    for i in range(existing, count):
+        db_questions.append(Question(metar=db_metars[(i // questions_per_metar) % len(db_metars)],
+                                     text='What is the benchmark question {0}?'.format(i),
+                                     category=categories[i % len(categories)]))
+        if len(db_questions) == insert_batch_size:
+            Question.objects.bulk_create(db_questions)
+            db_questions = []
+    Question.objects.bulk_create(db_questions)
+
+
+def main():
+    with benchmark_database():
+        db_airport = Airport.objects.create(name='Benchmark Airport', city='Benchmark', country='Benchmark',
+                                            icao='BNCH', latitude='0', longitude='0')
+        Metar.objects.bulk_create([Metar(metar_json='{}', airport=db_airport) for i in range(0, 1000)])
+        db_metars = list(Metar.objects.all())
+        question_sampler = QuestionSampler()
+        unwanted_categories = [question_type.value for question_type in QuestionType][:10]
+
+        for table_size in table_sizes:
+            populate_questions(db_metars, table_size)
+            cache.clear()
+            print('\n{0} questions'.format(Question.objects.count()))
+            print(format_latencies('order_by(\'?\').first()',
+                                   time_calls(lambda: Question.objects.order_by('?').first(), baseline_repeat)))
+            print(format_latencies('QuestionSampler',
+                                   time_calls(lambda: question_sampler.get_random_question_id(), sampler_repeat)))
+            print(format_latencies('QuestionSampler (10 unwanted)',
+                                   time_calls(lambda: question_sampler.get_random_question_id(unwanted_categories), sampler_repeat)))
+
+
+if __name__ == '__main__':
+    main()
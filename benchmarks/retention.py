@@ -0,0 +1,83 @@
+import django
+import os
+import sys
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from common.benchmark import benchmark_database
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Answer
+from metar_practice.models import Question
+
+from metar_practice.enums import QuestionType
+
+from metar_practice.retention import RetentionEngine
+
+from metar_practice import counters
+
+import time
+
+
+metar_count = 2000
+questions_per_metar = 17
+answer_pool_size = 500
+evict_question_count = 10000
+
+
+def populate(db_airport, db_answers):
+    """ Inserts metar_count METARs holding questions_per_metar questions each, every question linked to one pooled answer """
+    categories = [question_type.value for question_type in QuestionType]
+    Metar.objects.bulk_create([Metar(metar_json='{{"raw": "{0}"}}'.format(i), airport=db_airport) for i in range(0, metar_count)])
+    db_questions = []
+    for db_metar in Metar.objects.all():
+        for i in range(0, questions_per_metar):
+            db_questions.append(Question(metar=db_metar, text='What is benchmark question {0}?'.format(i), category=categories[i % len(categories)]))
+    Question.objects.bulk_create(db_questions)
+    Question.answers.through.objects.bulk_create([Question.answers.through(question_id=question_id, answer_id=db_answers[question_id % len(db_answers)].pk)
+                                                  for question_id in Question.objects.values_list('pk', flat=True)])
+
+
+def prune_legacy(question_limit):
+    """ Pruning loop pull_metar_data ran before the retention engine """
+    db_answers = []
+    with counters.deferred():
+        while Question.objects.count() > question_limit:
+            db_metar = Metar.objects.order_by("?").first()
+            db_questions = Question.objects.filter(metar=db_metar)
+            for db_question in db_questions:
+                for db_answer in db_question.answers.all():
+                    if db_answer not in db_answers:
+                        db_answers.append(db_answer)
+            db_metar.delete()
+
+
+def run(label, prune):
+    question_limit = metar_count * questions_per_metar - evict_question_count
+    start = time.perf_counter()
+    prune(question_limit)
+    elapsed = time.perf_counter() - start
+    print('{0:<24} {1:>8.2f}s  {2:>10.0f} questions/s'.format(label, elapsed, evict_question_count / elapsed))
+
+
+def main():
+    with benchmark_database():
+        db_airport = Airport.objects.create(name='Benchmark Airport', city='Benchmark', country='Benchmark',
+                                            icao='BNCH', latitude='0', longitude='0')
+        Answer.objects.bulk_create([Answer(text='Benchmark answer {0}'.format(i)) for i in range(0, answer_pool_size)])
+        db_answers = list(Answer.objects.all())
+        print('Evicting {0} of {1} questions'.format(evict_question_count, metar_count * questions_per_metar))
+
+        populate(db_airport, db_answers)
+        run('Legacy random loop', prune_legacy)
+        Metar.objects.all().delete()
+
+        populate(db_airport, db_answers)
+        run('RetentionEngine', lambda question_limit: RetentionEngine(question_limit).evict())
+
+
+if __name__ == '__main__':
+    main()
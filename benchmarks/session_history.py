@@ -0,0 +1,92 @@
+import django
+import os
+import sys
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import setup_test_environment
+from django.contrib.sessions.backends.db import SessionStore
+
+from common.benchmark import benchmark_database
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Answer
+from metar_practice.models import Question
+
+from metar_practice.enums import QuestionType
+
+from metar_practice.question_payloads import get_question_payload
+from metar_practice.question_payloads import payload_to_context
+from metar_practice.question_payloads import rebuild_question_payloads
+from metar_practice.session_history import HISTORY_SESSION_KEY
+from metar_practice.session_history import pack_question
+
+from metar_practice.views import QUESTIONS_TRACEBACK_ALLOWED
+
+from metar_practice import views
+
+
+request_count = 200
+session_engines = ['django.contrib.sessions.backends.db',
+                   'django.contrib.sessions.backends.cache',
+                   'django.contrib.sessions.backends.signed_cookies']
+
+
+def populate():
+    """ Inserts one METAR holding a question with two answers for every category """
+    db_airport = Airport.objects.create(name='John F Kennedy International Airport', city='New York', country='United States',
+                                        icao='KJFK', latitude='40.63980103', longitude='-73.77890015')
+    db_metar = Metar.objects.create(metar_json='{"raw": "KJFK 271551Z 35021G29KT 10SM -RA FEW024 BKN036 OVC046 10/07 A2966"}', airport=db_airport)
+    db_answers = [Answer.objects.create(text='Benchmark answer {0}'.format(i)) for i in range(0, 2)]
+    for question_type in QuestionType:
+        db_question = Question.objects.create(metar=db_metar, text='What is the {0}?'.format(question_type.value.lower()), category=question_type.value)
+        db_question.answers.add(*db_answers)
+    rebuild_question_payloads()
+
+
+def measure_sizes():
+    """ Prints encoded session bytes holding a full history as question dicts and as packed ids """
+    questions = [payload_to_context(get_question_payload(question_id))[2]
+                 for question_id in Question.objects.values_list('pk', flat=True)[:QUESTIONS_TRACEBACK_ALLOWED]]
+    session_store = SessionStore()
+    legacy = session_store.encode({'previous_questions': questions, 'logged': None})
+    packed = session_store.encode({HISTORY_SESSION_KEY: [pack_question(question['id'], question['category']) for question in questions], 'logged': None})
+    print('{0:<32} {1:>6} bytes per session'.format('Question dicts', len(legacy)))
+    print('{0:<32} {1:>6} bytes per session'.format('Packed question ids', len(packed)))
+
+
+def measure_writes(session_engine):
+    """ Prints database writes to django_session per practice page view and the session cookie size """
+    views.SESSIONLESS_VISITS = False                # Every visit reads and writes the session, as a visitor with a session cookie would
+    with override_settings(SESSION_ENGINE=session_engine):
+        client = Client()
+        client.get('/METAR_practice/')
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(0, request_count):
+                client.get('/METAR_practice/')
+        writes = [query for query in queries.captured_queries
+                  if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')]
+        print('{0:<48} {1:>5.2f} session writes/request  cookie {2:>4} bytes'.format(session_engine,
+                                                                                    len(writes) / request_count,
+                                                                                    len(client.cookies[settings.SESSION_COOKIE_NAME].value)))
+
+
+def main():
+    setup_test_environment()
+    with benchmark_database():
+        populate()
+        measure_sizes()
+        for session_engine in session_engines:
+            measure_writes(session_engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import django
+import os
+import sys
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from common.benchmark import benchmark_database
+from common.benchmark import format_latencies
+from common.benchmark import time_calls
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Answer
+from metar_practice.models import Question
+
+from metar_practice.enums import QuestionType
+
+from metar_practice.question_payloads import rebuild_question_payloads
+
+from metar_practice import views
+
+
+request_count = 500
+session_engines = ['django.contrib.sessions.backends.db',
+                   'django.contrib.sessions.backends.signed_cookies']
+
+
+def populate():
+    """ Inserts one METAR holding a question with an answer for every category """
+    db_airport = Airport.objects.create(name='John F Kennedy International Airport', city='New York', country='United States',
+                                        icao='KJFK', latitude='40.63980103', longitude='-73.77890015')
+    db_metar = Metar.objects.create(metar_json='{"raw": "KJFK 271551Z 35021G29KT 10SM -RA FEW024 BKN036 OVC046 10/07 A2966"}', airport=db_airport)
+    db_answer = Answer.objects.create(text='Benchmark answer')
+    for question_type in QuestionType:
+        db_question = Question.objects.create(metar=db_metar, text='What is the {0}?'.format(question_type.value.lower()), category=question_type.value)
+        db_question.answers.add(db_answer)
+    rebuild_question_payloads()
+
+
+def visit(client):
+    """ Requests the practice page as a crawler would, never sending cookies back """
+    client.cookies.clear()
+    client.get('/METAR_practice/')
+
+
+def run(label, session_engine, sessionless):
+    views.SESSIONLESS_VISITS = sessionless
+    with override_settings(SESSION_ENGINE=session_engine):
+        client = Client()
+        visit(client)
+        with CaptureQueriesContext(connection) as queries:
+            latencies = time_calls(lambda: visit(client), request_count)
+        writes = [query for query in queries.captured_queries
+                  if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')]
+        print('{0}  {1:>7.0f} requests/s  {2:>5.2f} session writes/request'.format(format_latencies(label, latencies),
+                                                                                 request_count / (sum(latencies) / 1000),
+                                                                                 len(writes) / request_count))
+
+
+def main():
+    with benchmark_database():
+        populate()
+        print('{0} cookieless visits per run'.format(request_count))
+        for session_engine in session_engines:
+            backend = session_engine.split('.')[-1]
+            run('{0} with session'.format(backend), session_engine, False)
+            run('{0} sessionless'.format(backend), session_engine, True)
+
+
+if __name__ == '__main__':
+    main()
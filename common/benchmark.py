@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+from django.db import connection
+
+from common.utils import percentile
+
+import time
+
+
+def time_calls(func, repeat):
+    """ Calls func repeatedly and returns the latency of each call in milliseconds """
+    latencies = []
+    for i in range(0, repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def format_latencies(label, latencies):
+    """ Formats p50/p99 summary line for latencies in milliseconds """
+    return '{0:<32} p50={1:>10.3f}ms  p99={2:>10.3f}ms  n={3}'.format(label,
+                                                                       percentile(latencies, 0.50),
+                                                                       percentile(latencies, 0.99),
+                                                                       len(latencies))
+
+
+@contextmanager
+def benchmark_database():
+    """ Runs the enclosed block against a throwaway test database so production data is never touched """
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -6,3 +6,10 @@ def get_url(request_path):
         else:
             path.append({'traversal' : traversal, 'url' : '/{0}'.format(traversal)})
     return path
+
+
+def percentile(samples, fraction):
+    """ Returns the nearest-rank percentile of the given samples """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
@@ -6,6 +6,10 @@ from .models import Metar
 from .models import Answer
 from .models import Question
 from .models import Report
+from .models import Counter
+from .models import JobCursor
+from .models import QuestionPayload
+from .models import AirportPullState
 
 import os
 import json
@@ -64,9 +68,29 @@ class ReportAdmim(admin.ModelAdmin):
     actions = [download_reports_json]
 
 
+class QuestionPayloadAdmim(admin.ModelAdmin):
+    list_display = ['pk', 'question_text', 'question_category', 'airport_icao']
+
+
+class CounterAdmim(admin.ModelAdmin):
+    list_display = ['name', 'value']
+
+
+class JobCursorAdmim(admin.ModelAdmin):
+    list_display = ['name', 'value']
+
+
+class AirportPullStateAdmim(admin.ModelAdmin):
+    list_display = ['airport', 'last_fetched_at', 'last_observed_at', 'failure_count', 'quarantined', 'report_interval', 'next_due_at']
+
+
 
 admin.site.register(Airport, AirportAdmim)
 admin.site.register(Metar, MetarAdmim)
 admin.site.register(Answer, AnswerAdmim)
 admin.site.register(Question, QuestionAdmim)
 admin.site.register(Report, ReportAdmim)
+admin.site.register(QuestionPayload, QuestionPayloadAdmim)
+admin.site.register(Counter, CounterAdmim)
+admin.site.register(JobCursor, JobCursorAdmim)
+admin.site.register(AirportPullState, AirportPullStateAdmim)
@@ -0,0 +1,99 @@
+from django.db.models import F
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models.functions import ASin
+from django.db.models.functions import Cos
+from django.db.models.functions import Least
+from django.db.models.functions import Power
+from django.db.models.functions import Radians
+from django.db.models.functions import Sin
+from django.db.models.functions import Sqrt
+
+from metar_practice.models import Airport
+
+import math
+
+
+EARTH_RADIUS_KM = 6371.0
+HALF_EARTH_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+NEAREST_SEARCH_RADIUS_KM = 100                  # First radius searched for nearest airports, doubled until enough are found
+NEAR_RADIUS_KM = 500                            # Radius used for ?near= when no ?radius= is given
+
+
+def get_distance_km(latitude_1, longitude_1, latitude_2, longitude_2):
+    """  Returns great circle distance between two positions in kilometres """
+    latitude_1, longitude_1, latitude_2, longitude_2 = map(math.radians, (latitude_1, longitude_1, latitude_2, longitude_2))
+    a = math.sin((latitude_2 - latitude_1) / 2) ** 2 + \
+        math.cos(latitude_1) * math.cos(latitude_2) * math.sin((longitude_2 - longitude_1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1, math.sqrt(a)))
+
+
+def get_radius_box(latitude, longitude, radius_km):
+    """  Returns (south, west, north, east) of the smallest box holding every position within radius_km """
+    angle = radius_km / EARTH_RADIUS_KM
+    south = latitude - math.degrees(angle)
+    north = latitude + math.degrees(angle)
+    if south <= -90 or north >= 90 or angle >= math.pi / 2:
+        return max(south, -90), -180, min(north, 90), 180                    # Circle reaches a pole so covers every longitude
+    spread = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+    west = longitude - spread
+    east = longitude + spread
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return south, west, north, east
+
+
+def get_box_airports(south, west, north, east):
+    """  Retrieves airports that are not retired inside a box, a box with west past east crosses the antimeridian """
+    db_airports = Airport.objects.filter(retired=False, latitude_deg__gte=south, latitude_deg__lte=north)
+    if west <= east:
+        return db_airports.filter(longitude_deg__gte=west, longitude_deg__lte=east)
+    return db_airports.filter(Q(longitude_deg__gte=west) | Q(longitude_deg__lte=east))
+
+
+def get_radius_airports(latitude, longitude, radius_km):
+    """  Returns (distance in km, airport) of airports within radius_km of a position, nearest first """
+    db_airports = get_box_airports(*get_radius_box(latitude, longitude, radius_km))
+    distances = []
+    for db_airport in db_airports:
+        distance = get_distance_km(latitude, longitude, db_airport.latitude_deg, db_airport.longitude_deg)
+        if distance <= radius_km:
+            distances.append((distance, db_airport))
+    return sorted(distances, key=lambda item: item[0])
+
+
+def get_radius_queryset(latitude, longitude, radius_km):
+    """  Returns airports within radius_km of a position as a queryset, the box narrows by index and the great circle distance is computed in SQL """
+    latitude_radians = math.radians(latitude)
+    half_chord = Power(Sin((Radians(F('latitude_deg')) - Value(latitude_radians)) / 2), 2) + \
+                 Value(math.cos(latitude_radians)) * Cos(Radians(F('latitude_deg'))) * \
+                 Power(Sin((Radians(F('longitude_deg')) - Value(math.radians(longitude))) / 2), 2)
+    distance_km = Value(2 * EARTH_RADIUS_KM) * ASin(Least(Value(1.0), Sqrt(half_chord)))
+    return get_box_airports(*get_radius_box(latitude, longitude, radius_km)).alias(distance_km=distance_km).filter(distance_km__lte=radius_km)
+
+
+def get_nearest_airports(latitude, longitude, count=10, max_distance_km=HALF_EARTH_CIRCUMFERENCE_KM):
+    """  Returns (distance in km, airport) of up to count airports nearest a position, widening the searched box until enough are found """
+    radius_km = min(NEAREST_SEARCH_RADIUS_KM, max_distance_km)
+    while True:
+        distances = get_radius_airports(latitude, longitude, radius_km)
+        if len(distances) >= count or radius_km >= max_distance_km:
+            return distances[:count]
+        radius_km = min(radius_km * 2, max_distance_km)
+
+
+def get_selected_airports(params):
+    """  Returns airports chosen by ?near=LAT,LON[&radius=KM] or ?box=SOUTH,WEST,NORTH,EAST as a queryset to use as a subquery, or None without a valid selection """
+    try:
+        if 'near' in params:
+            latitude, longitude = [float(value) for value in params['near'].split(',')]
+            radius_km = float(params.get('radius', NEAR_RADIUS_KM))
+            return get_radius_queryset(latitude, longitude, radius_km)
+        if 'box' in params:
+            south, west, north, east = [float(value) for value in params['box'].split(',')]
+            return get_box_airports(south, west, north, east)
+    except ValueError as e:
+        print(e)
+    return None
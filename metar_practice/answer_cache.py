@@ -0,0 +1,39 @@
+from collections import OrderedDict
+
+
+class AnswerCache:
+    """  Least recently used map of answer text to Answer id, shared by the question collectors of a pull run """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.answer_ids = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, text):
+        """  Returns cached Answer id for text or None """
+        answer_id = self.answer_ids.get(text)
+        if answer_id is None:
+            self.misses += 1
+            return None
+        self.answer_ids.move_to_end(text)
+        self.hits += 1
+        return answer_id
+
+
+    def put(self, text, answer_id):
+        """  Caches Answer id for text, dropping the least recently used entry when full """
+        self.answer_ids[text] = answer_id
+        self.answer_ids.move_to_end(text)
+        if len(self.answer_ids) > self.maxsize:
+            self.answer_ids.popitem(last=False)
+
+
+    def clear(self):
+        """  Forgets every cached Answer id, used when a cached answer turns out to have been deleted """
+        self.answer_ids.clear()
+
+
+    def __len__(self):
+        return len(self.answer_ids)
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models import Exists
+from django.db.models import OuterRef
+
+from metar_practice.models import Answer
+from metar_practice.models import JobCursor
+from metar_practice.models import Question
+
+import time
+
+
+ANSWER_GC_CURSOR = 'answer_gc:cursor'
+ANSWER_GC_CHUNK_SIZE = 1000
+
+
+class AnswerGCReport:
+    """  Records what an answer garbage collection run deleted and where it stopped """
+
+    def __init__(self):
+        self.deleted = 0
+        self.cursor = 0
+        self.finished = False
+        self.seconds = 0
+
+
+    def summary(self):
+        """  Returns deleted count, run time and whether the answer table was scanned to the end """
+        progress = 'finished' if self.finished else 'paused after answer {0}'.format(self.cursor)
+        return 'Deleted {0} orphan answers in {1:.2f}s, {2}'.format(self.deleted, self.seconds, progress)
+
+
+def get_orphan_answers():
+    """  Returns answers no question links to, as a NOT EXISTS anti-join on the question answers through table """
+    return Answer.objects.filter(~Exists(Question.answers.through.objects.filter(answer_id=OuterRef('pk'))))
+
+
+def collect_orphan_answers(chunk_size=ANSWER_GC_CHUNK_SIZE, time_limit=None):
+    """  Deletes orphan answers chunk_size at a time, resuming where the last run paused, until done or time_limit seconds pass """
+    report = AnswerGCReport()
+    start = time.perf_counter()
+    db_cursor = JobCursor.objects.filter(name=ANSWER_GC_CURSOR).first()
+    report.cursor = db_cursor.value if db_cursor is not None else 0
+
+    while time_limit is None or time.perf_counter() - start < time_limit:
+        orphan_ids = list(get_orphan_answers().filter(pk__gt=report.cursor)
+                                              .order_by('pk')
+                                              .values_list('pk', flat=True)[:chunk_size])
+        if len(orphan_ids) == 0:
+            report.finished = True
+            report.cursor = 0                                # Start from the beginning next run
+            break
+        with transaction.atomic():
+            report.deleted += get_orphan_answers().filter(pk__in=orphan_ids).delete()[1].get(Answer._meta.label, 0)   # Rechecked in case a question linked it since
+        report.cursor = orphan_ids[-1]
+
+    JobCursor.objects.update_or_create(name=ANSWER_GC_CURSOR, defaults={'value': report.cursor})
+    report.seconds = time.perf_counter() - start
+    return report
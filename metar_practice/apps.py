@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MetarPracticeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'metar_practice'
+
+    def ready(self):
+        from metar_practice import signals
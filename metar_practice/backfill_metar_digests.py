@@ -0,0 +1,19 @@
+import django
+import os
+import sys
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from metar_practice.metar_digests import backfill_metar_digests
+
+
+def main():
+    """ Computes digests for METARs stored before duplicate detection used them """
+    updated_count = backfill_metar_digests()
+    print('Backfilled {0} METAR digests.'.format(updated_count))
+
+
+if __name__ == '__main__':
+    main()
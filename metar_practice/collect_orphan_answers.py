@@ -0,0 +1,22 @@
+import django
+import os
+import sys
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from metar_practice.answer_gc import collect_orphan_answers
+
+
+def main(time_limit=None):
+    """ Deletes answers no question uses, pass --time-limit SECONDS to pause and resume from the same place next run """
+    print(collect_orphan_answers(time_limit=time_limit).summary())
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    time_limit = None
+    if '--time-limit' in arguments:
+        time_limit = float(arguments[arguments.index('--time-limit') + 1])
+    main(time_limit=time_limit)
@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db.models import BigIntegerField
+from django.db.models import Case
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Value
+from django.db.models import When
+
+from metar_practice.models import Airport
+from metar_practice.models import Counter
+from metar_practice.models import Question
+
+from metar_practice.enums import QuestionType
+
+import threading
+
+
+QUESTIONS_COUNTER = 'questions'
+AIRPORTS_COUNTER = 'airports'
+COUNTERS_CACHE_KEY = 'metar_practice:counters'
+COUNTERS_CACHE_TIMEOUT = 60
+
+_deferred = threading.local()
+
+
+def category_counter(category):
+    """  Returns counter name holding the number of questions in category """
+    return '{0}:{1}'.format(QUESTIONS_COUNTER, category)
+
+
+def get_counts():
+    """  Retrieves every counter value, reading from the cache where possible """
+    counts = cache.get(COUNTERS_CACHE_KEY)
+    if counts is None:
+        counts = dict(Counter.objects.values_list('name', 'value'))
+        if len(counts) == 0:
+            counts = reconcile()[0]
+        cache.set(COUNTERS_CACHE_KEY, counts, COUNTERS_CACHE_TIMEOUT)
+    return counts
+
+
+def add(deltas):
+    """  Adds deltas to counters, holding them back while inside a deferred() block """
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        for name, delta in deltas.items():
+            pending[name] = pending.get(name, 0) + delta
+        return
+
+    deltas = {name: delta for name, delta in deltas.items() if delta != 0}
+    if len(deltas) == 0:
+        return
+    updated = Counter.objects.filter(name__in=deltas.keys()).update(value=F('value') + Case(*[When(name=name, then=Value(delta)) for name, delta in deltas.items()],
+                                                                                            output_field=BigIntegerField()))
+    if updated != len(deltas):
+        reconcile()                                         # First use of counter so count from scratch
+    cache.delete(COUNTERS_CACHE_KEY)
+
+
+@contextmanager
+def deferred():
+    """  Collects counter changes made inside the block and writes them once on exit, used by bulk jobs """
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+
+    _deferred.pending = {}
+    try:
+        yield
+    finally:
+        pending = _deferred.pending
+        _deferred.pending = None
+        add(pending)
+
+
+def reconcile():
+    """  Recounts every counter from the tables, correcting drift, and returns the counts and the drift found """
+    counts = {QUESTIONS_COUNTER: 0, AIRPORTS_COUNTER: Airport.objects.filter(retired=False).count()}
+    for question_type in QuestionType:
+        counts[category_counter(question_type.value)] = 0
+    for category, count in Question.objects.values_list('category').annotate(count=Count('pk')).order_by():
+        counts[category_counter(category)] = count
+        counts[QUESTIONS_COUNTER] += count
+
+    stored = dict(Counter.objects.values_list('name', 'value'))
+    Counter.objects.bulk_create([Counter(name=name, value=value) for name, value in counts.items() if name not in stored], ignore_conflicts=True)
+    drift = {}
+    for name, value in counts.items():
+        if name in stored and stored[name] != value:
+            Counter.objects.filter(name=name).update(value=value)
+        if stored.get(name, 0) != value:
+            drift[name] = value - stored.get(name, 0)
+    cache.delete(COUNTERS_CACHE_KEY)
+    return counts, drift
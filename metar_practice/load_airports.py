@@ -2,16 +2,62 @@ import django
 import csv
 import os
 import sys
+import time
 
 sys.path.append('..')
 os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
 django.setup()
 
+from django.db import transaction
+
 from metar_practice.models import Airport
+from metar_practice.models import Question
+from metar_practice.models import QuestionPayload
+
+from metar_practice.question_payloads import rebuild_question_payloads
+
+from metar_practice import counters
+
+
+AIRPORT_COLUMNS = {'name': 'Name',
+                   'city': 'City',
+                   'country': 'Country',
+                   'latitude': 'Latitude',
+                   'longitude': 'Longitude'}
+LOAD_BATCH_SIZE = 1000
+
+
+class LoadReport:
+    """  Records how many airports a load inserted, updated, left unchanged, retired, deleted or skipped """
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.retired = 0
+        self.deleted = 0
+        self.invalid = 0
+        self.seconds = 0
+
+
+    def summary(self):
+        """  Returns row counts of the load and its duration """
+        return 'Inserted {0}, updated {1}, retired {2} and deleted {3} airports, left {4} unchanged, skipped {5} invalid rows in {6:.2f}s'.format(self.inserted,
+                                                                                                                                                 self.updated,
+                                                                                                                                                 self.retired,
+                                                                                                                                                 self.deleted,
+                                                                                                                                                 self.unchanged,
+                                                                                                                                                 self.invalid,
+                                                                                                                                                 self.seconds)
 
 
 class LoadAirports:
 
+    def __init__(self, batch_size=LOAD_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.max_lengths = {name: Airport._meta.get_field(name).max_length for name in list(AIRPORT_COLUMNS) + ['icao']}
+
+
     def is_valid(self, row):
         """ Determines if a given row is valid for possible use """
         return (row['Name'] is not None and row['Name'] != '') and \
@@ -22,31 +68,108 @@ class LoadAirports:
                (row['Longitude'] is not None and row['Longitude'] != '')
 
 
-    def main(self):
-        """ Inserts valid airports extracted from airports.csv into database """
-        Airport.objects.all().delete()
+    def get_airport(self, row):
+        """ Returns icao, field values, fingerprint and numeric position of a row, or None if they do not fit the Airport columns """
+        airport = {name: row[column] for name, column in AIRPORT_COLUMNS.items()}
+        airport['icao'] = row['ICAO']
+        for name, value in airport.items():
+            if len(value) > self.max_lengths[name]:
+                return None
+        airport['fingerprint'] = Airport.get_fingerprint(*[airport[name] for name in AIRPORT_COLUMNS])
+        airport['latitude_deg'] = Airport.get_degrees(airport['latitude'], 90)
+        airport['longitude_deg'] = Airport.get_degrees(airport['longitude'], 180)
+        return airport
+
+
+    def read_batches(self, f, report, seen_icaos):
+        """ Streams valid airports from the CSV in batches, the first row for an icao wins """
+        batch = []
+        for row in csv.DictReader(f):
+            airport = self.get_airport(row) if self.is_valid(row) else None
+            if airport is None:
+                report.invalid += 1
+                continue
+            if airport['icao'] in seen_icaos:
+                continue
+            seen_icaos.add(airport['icao'])
+            batch.append(airport)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if len(batch) != 0:
+            yield batch
+
+
+    def get_stored_airports(self):
+        """ Returns (pk, fingerprint, retired) of every stored airport keyed by icao, read in one query """
+        return {icao: (pk, fingerprint, retired) for icao, pk, fingerprint, retired in Airport.objects.values_list('icao', 'pk', 'fingerprint', 'retired')}
+
+
+    def upsert(self, batch, stored_airports, report):
+        """ Inserts new airports and rewrites those whose fingerprint changed or that were retired, in a single transaction """
+        db_new_airports = []
+        db_changed_airports = []
+        restored_count = 0
+        for airport in batch:
+            stored = stored_airports.get(airport['icao'])
+            if stored is None:
+                db_new_airports.append(Airport(**airport))
+            elif stored[1] != airport['fingerprint'] or stored[2]:
+                db_changed_airports.append(Airport(pk=stored[0], retired=False, **airport))
+                restored_count += 1 if stored[2] else 0
+            else:
+                report.unchanged += 1
+        if len(db_new_airports) == 0 and len(db_changed_airports) == 0:
+            return
+
+        with transaction.atomic():
+            Airport.objects.bulk_create(db_new_airports, ignore_conflicts=True)         # Unique icao so a concurrent insert wins quietly
+            Airport.objects.bulk_update(db_changed_airports, list(AIRPORT_COLUMNS) + ['fingerprint', 'retired', 'latitude_deg', 'longitude_deg'])
+            QuestionPayload.objects.filter(question__metar__airport__in=db_changed_airports).delete()  # Payloads copy airport details
+            if len(db_changed_airports) != 0:
+                rebuild_question_payloads(db_questions=Question.objects.filter(metar__airport__in=db_changed_airports))
+        counters.add({counters.AIRPORTS_COUNTER: len(db_new_airports) + restored_count})
+        report.inserted += len(db_new_airports)
+        report.updated += len(db_changed_airports)
+
+
+    def retire(self, icaos, report, purge=False):
+        """ Retires airports no longer in the CSV so their questions stay, or deletes them with their METARs if purge """
+        for i in range(0, len(icaos), self.batch_size):
+            batch = icaos[i:i + self.batch_size]
+            with transaction.atomic():
+                if purge:
+                    report.deleted += Airport.objects.filter(icao__in=batch).delete()[1].get(Airport._meta.label, 0)
+                else:
+                    retired_count = Airport.objects.filter(icao__in=batch, retired=False).update(retired=True)
+                    counters.add({counters.AIRPORTS_COUNTER: -retired_count})
+                    report.retired += retired_count
+
+
+    def main(self, purge=False):
+        """ Syncs airports with those extracted from airports.csv """
+        with counters.deferred():
+            report = self.load(purge=purge)
+        print(report.summary())
+        return report
+
+
+    def load(self, purge=False):
+        """ Applies the difference between airports.csv and stored airports, compared by row fingerprint """
+        report = LoadReport()
+        start = time.perf_counter()
+        stored_airports = self.get_stored_airports()
+        seen_icaos = set()
         data_path = os.path.join(os.path.split(os.getcwd())[0], 'static', 'csv', 'metar_practice', 'airports.csv')
-        airport_count = 0
         with open(data_path, mode='r', encoding='utf8') as f:
-            r = csv.DictReader(f)
-            for row in r:
-                if self.is_valid(row):
-                    try:
-                        db_airport = Airport.objects.get(icao=row['ICAO'])              # To avoid adding duplicates can think of icao as pk
-                    except Airport.DoesNotExist:
-                        db_airport = Airport(name=row['Name'],
-                                            city=row['City'],
-                                            country=row['Country'],
-                                            icao=row['ICAO'],
-                                            latitude=row['Latitude'],
-                                            longitude=row['Longitude'])
-                    db_airport.full_clean()
-                    db_airport.save()
-                    print('Added icao={}, pk={}'.format(db_airport.icao, db_airport.pk))
-                    airport_count += 1
-        print('Added {0} unique airports.'.format(airport_count))
+            for batch in self.read_batches(f, report, seen_icaos):
+                self.upsert(batch, stored_airports, report)
+        missing_icaos = [icao for icao, stored in stored_airports.items() if icao not in seen_icaos and (purge or not stored[2])]
+        self.retire(missing_icaos, report, purge=purge)
+        report.seconds = time.perf_counter() - start
+        return report
 
 
 if __name__ == '__main__':
     load_airports = LoadAirports()
-    load_airports.main()
+    load_airports.main(purge='--purge' in sys.argv[1:])
@@ -1,46 +1,159 @@
-import django
 import json
 import requests
 import os
-import sys
-
-sys.path.append('..')
-os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
-django.setup()
 
 from django.forms.models import model_to_dict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from metar_practice.models import Airport
 from metar_practice.models import Metar
 
 
+AVWX_API_URL = 'https://avwx.rest/api'
+AVWX_INVALID_ICAO_ERROR = '{0} is not a valid ICAO or IATA code'
+AVWX_QUERY = 'options=&airport=true&reporting=true&format=json&onfail=cache'
+AVWX_BATCH_SIZE = 10
+AVWX_POOL_SIZE = 10
+AVWX_RETRIES = 3
+AVWX_BACKOFF_FACTOR = 0.5
+AVWX_RETRY_STATUSES = (429, 500, 502, 503, 504)
+AVWX_TIMEOUT = (5, 15)                                      # Seconds to connect and to wait for a response
+
+
 class MetarCollector:
 
+    def __init__(self, api_url=AVWX_API_URL, pool_size=AVWX_POOL_SIZE, retries=AVWX_RETRIES, backoff_factor=AVWX_BACKOFF_FACTOR, timeout=AVWX_TIMEOUT):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = os.environ.get('METAR_KEY')
+        self.adapter = HTTPAdapter(pool_connections=1,
+                                   pool_maxsize=pool_size,
+                                   max_retries=Retry(total=retries,
+                                                     backoff_factor=backoff_factor,
+                                                     status_forcelist=AVWX_RETRY_STATUSES,
+                                                     allowed_methods=frozenset(['GET']),
+                                                     raise_on_status=False))
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+
+    def close(self):
+        """  Closes pooled AVWX connections """
+        self.session.close()
+
+
+    def get_connection_stats(self):
+        """  Returns how many AVWX requests were sent and how many connections the pool opened for them """
+        stats = {'requests': 0, 'connections': 0}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            stats['requests'] += pool.num_requests
+            stats['connections'] += pool.num_connections
+        stats['reused'] = stats['requests'] - stats['connections']
+        return stats
+
+
     def get_raw_metar(self, db_airport):
         """  Retrieves METAR report and creates corresponding Metar database object """
         try:
-            icao = db_airport.icao
-            url = 'https://avwx.rest/api/metar/{0}?options=&airport=true&reporting=true&format=json&onfail=cache'.format(icao)
-            res = requests.get(url, headers={'Authorization':os.environ.get('METAR_KEY')})
+            status_code, text = self.fetch_metar(db_airport.icao)
+            return self.store_metar(db_airport, status_code, text)
+        except Exception as e:
+            return None, None
+
+
+    def fetch_metar(self, icao):
+        """  Requests METAR report for icao from AVWX without touching the database, safe to call from worker threads """
+        try:
+            url = '{0}/metar/{1}?{2}'.format(self.api_url, icao, AVWX_QUERY)
+            res = self.session.get(url, timeout=self.timeout)
+            return res.status_code, res.text
+        except Exception as e:
+            return None, None
+
+
+    def get_raw_metars(self, db_airports, batch_size=AVWX_BATCH_SIZE):
+        """  Retrieves METAR reports for airports batch_size stations per request, returns (db_airport, status, db_metar) per airport """
+        pulls = []
+        for start in range(0, len(db_airports), batch_size):
+            group = db_airports[start:start + batch_size]
+            reports = self.fetch_metars([db_airport.icao for db_airport in group])
+            for db_airport in group:
+                status_code, text = reports.get(db_airport.icao, (None, None))
+                pulls.append((db_airport, *self.store_metar(db_airport, status_code, text)))
+        return pulls
+
+
+    def fetch_metars(self, icaos):
+        """  Requests METAR reports for several icaos in one AVWX call, returns {icao: (status, text)} shaped like single station responses """
+        icaos = list(dict.fromkeys(icaos))                  # Same airport can be drawn twice in one pull
+        if len(icaos) == 1:
+            return {icaos[0]: self.fetch_metar(icaos[0])}
+
+        reports = {}
+        while len(icaos) > 0:
+            try:
+                url = '{0}/multi/metar/{1}?{2}'.format(self.api_url, ','.join(icaos), AVWX_QUERY)
+                res = self.session.get(url, timeout=self.timeout)
+            except Exception as e:
+                reports.update({icao: (None, None) for icao in icaos})
+                break
+
             if res.status_code == 200:
-                db_metar = None
-                try:
-                    db_metar = Metar.objects.get(metar_json=res.text,
-                                                 airport=db_airport)          # To avoid adding duplicates
-                except Metar.DoesNotExist:
-                    db_metar = Metar(metar_json=res.text,
+                reports.update(self.split_metars(icaos, res.text))
+                break
+
+            rejected_icao = self.get_rejected_icao(icaos, res.status_code, res.text)
+            if rejected_icao is None:
+                reports.update({icao: (res.status_code, res.text) for icao in icaos})
+                break
+            reports[rejected_icao] = (res.status_code, res.text)
+            icaos.remove(rejected_icao)                      # AVWX fails the whole batch on one bad station so retry without it
+        return reports
+
+
+    def split_metars(self, icaos, text):
+        """  Splits multi station response into per icao (status, text), stations without a report get status 204 """
+        try:
+            station_reports = {}
+            for report in json.loads(text):
+                if isinstance(report, dict) and 'station' in report:
+                    station_reports[report['station']] = json.dumps(report)
+        except Exception as e:
+            return {icao: (None, None) for icao in icaos}
+        return {icao: (200, station_reports[icao]) if icao in station_reports else (204, None) for icao in icaos}
+
+
+    def get_rejected_icao(self, icaos, status_code, text):
+        """  Returns icao AVWX rejected as invalid in an error response, None if the error was not about a station """
+        try:
+            error = json.loads(text)['error']
+        except Exception as e:
+            return None
+        for icao in icaos:
+            if status_code == 400 and error == AVWX_INVALID_ICAO_ERROR.format(icao):
+                return icao
+        return None
+
+
+    def store_metar(self, db_airport, status_code, text):
+        """  Creates Metar database object for a fetched METAR report, removing the airport if AVWX rejected its icao """
+        try:
+            if status_code == 200:
+                db_metar = Metar.objects.filter(airport=db_airport,
+                                                digest=Metar.get_digest(text)).first()   # To avoid adding duplicates
+                if db_metar is None:
+                    db_metar = Metar(metar_json=text,
                                      airport=db_airport)
                     db_metar.full_clean()
                     db_metar.save()
-                return res.status_code, db_metar
+                return status_code, db_metar
             else:
-                if res.status_code == 400 and json.loads(res.text)['error'] == '{0} is not a valid ICAO or IATA code'.format(icao):
-                    Airport.objects.filter(icao=icao).delete()
-                return res.status_code, None
+                if status_code == 400 and json.loads(text)['error'] == AVWX_INVALID_ICAO_ERROR.format(db_airport.icao):
+                    Airport.objects.filter(icao=db_airport.icao).delete()
+                return status_code, None
         except Exception as e:
             return None, None
-
-
-    def get_random_airport(self):
-        """  Retrieves random airport object """
-        return Airport.objects.order_by('?').first()
@@ -0,0 +1,19 @@
+from metar_practice.models import Metar
+
+
+METAR_DIGEST_BATCH_SIZE = 500
+
+
+def backfill_metar_digests(batch_size=METAR_DIGEST_BATCH_SIZE):
+    """  Computes the digest of METARs stored before digests existed, one batch of ids at a time, returns rows updated """
+    updated_count = 0
+    last_id = 0
+    while True:
+        db_metars = list(Metar.objects.filter(pk__gt=last_id, digest__isnull=True).only('pk', 'metar_data').order_by('pk')[:batch_size])
+        if not db_metars:
+            return updated_count
+        for db_metar in db_metars:
+            db_metar.digest = Metar.get_digest(db_metar.metar_json)
+        Metar.objects.bulk_update(db_metars, ['digest'])
+        updated_count += len(db_metars)
+        last_id = db_metars[-1].pk
@@ -0,0 +1,85 @@
+import datetime
+import json
+import zlib
+
+
+METAR_FIELDS = ('station', 'time', 'raw', 'flight_rules', 'wind_direction', 'wind_speed', 'wind_gust', 'altimeter',
+                'temperature', 'dewpoint', 'visibility', 'clouds', 'wx_codes', 'remarks_info', 'units')
+METAR_DROPPED_KEYS = ('spoken',)
+METAR_COMPRESSION_LEVEL = 9
+METAR_CEILING_COVERAGES = ('BKN', 'OVC', 'VV')
+
+
+def strip_dropped_keys(value):
+    """  Returns value with spoken text removed from every nested dictionary """
+    if isinstance(value, dict):
+        return {key: strip_dropped_keys(item) for key, item in value.items() if key not in METAR_DROPPED_KEYS}
+    if isinstance(value, list):
+        return [strip_dropped_keys(item) for item in value]
+    return value
+
+
+def compact_metar_json(metar_json):
+    """  Returns METAR JSON reduced to the fields questions and the practice page use, text that is not a JSON object is kept as is """
+    try:
+        metar = json.loads(metar_json)
+    except ValueError as e:
+        return metar_json
+    if not isinstance(metar, dict):
+        return metar_json
+    metar = {key: metar[key] for key in METAR_FIELDS if key in metar}
+    return json.dumps(strip_dropped_keys(metar), separators=(',', ':'))
+
+
+def encode_metar_json(metar_json):
+    """  Returns compacted METAR JSON compressed for storage """
+    return zlib.compress(compact_metar_json(metar_json).encode(), METAR_COMPRESSION_LEVEL)
+
+
+def decode_metar_json(metar_data):
+    """  Returns METAR JSON from its stored compressed form """
+    return zlib.decompress(bytes(metar_data)).decode()
+
+
+def get_metar_value(metar, key, cast):
+    """  Returns the value of a METAR element converted with cast, or None when it is missing or malformed """
+    try:
+        return cast(metar[key]['value'])
+    except (KeyError, TypeError, ValueError) as e:
+        return None
+
+
+def get_metar_time(metar):
+    """  Returns the observation time of a METAR as an aware datetime, or None when it is missing or malformed """
+    try:
+        dt = metar['time']['dt']
+        if dt.endswith('Z'):
+            dt = dt[:-1] if '+' in dt else dt[:-1] + '+00:00'      # AVWX appends Z to an explicit offset
+        return datetime.datetime.fromisoformat(dt)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return None
+
+
+def extract_metar_fields(metar_json):
+    """  Returns values for the structured Metar columns decoded from METAR JSON, numbers are in the report's own units """
+    try:
+        metar = json.loads(metar_json)
+    except ValueError as e:
+        metar = {}
+    if not isinstance(metar, dict):
+        metar = {}
+    clouds = [item for item in (metar.get('clouds') or []) if isinstance(item, dict)]
+    ceilings = [item.get('altitude') for item in clouds if item.get('type') in METAR_CEILING_COVERAGES and isinstance(item.get('altitude'), int)]
+    return {'station': metar.get('station') or '',
+            'raw': metar.get('raw') or '',
+            'observed_at': get_metar_time(metar),
+            'flight_rules': metar.get('flight_rules') or '',
+            'wind_direction': get_metar_value(metar, 'wind_direction', int),
+            'wind_speed': get_metar_value(metar, 'wind_speed', int),
+            'wind_gust': get_metar_value(metar, 'wind_gust', int),
+            'visibility': get_metar_value(metar, 'visibility', float),
+            'temperature': get_metar_value(metar, 'temperature', int),
+            'dewpoint': get_metar_value(metar, 'dewpoint', int),
+            'altimeter': get_metar_value(metar, 'altimeter', float),
+            'clouds': ' '.join(item.get('repr') or '' for item in clouds)[:120],
+            'ceiling': min(ceilings) if len(ceilings) != 0 else None}
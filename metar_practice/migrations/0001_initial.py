@@ -0,0 +1,60 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Airport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('city', models.CharField(max_length=120)),
+                ('country', models.CharField(max_length=120)),
+                ('icao', models.CharField(max_length=4)),
+                ('latitude', models.CharField(max_length=120)),
+                ('longitude', models.CharField(max_length=120)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Answer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=120)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Metar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metar_json', models.TextField()),
+                ('airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='metar_practice.airport')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=120)),
+                ('category', models.CharField(choices=[('AIRPORT', 'AIRPORT'), ('TIME', 'TIME'), ('WIND_DIRECTION', 'WIND_DIRECTION'), ('WIND_SPEED', 'WIND_SPEED'), ('WIND_GUST', 'WIND_GUST'), ('ALTIMETER', 'ALTIMETER'), ('TEMPERATURE', 'TEMPERATURE'), ('DEWPOINT', 'DEWPOINT'), ('VISIBILITY', 'VISIBILITY'), ('CLOUD_COVERAGE', 'CLOUD_COVERAGE'), ('CLOUD_HEIGHT_INDIVIDUAL', 'CLOUD_HEIGHT_INDIVIDUAL'), ('CLOUD_HEIGHT_COLLECTIVE', 'CLOUD_HEIGHT_COLLECTIVE'), ('WEATHER_CODES', 'WEATHER_CODES'), ('REMARKS_CODES', 'REMARKS_CODES'), ('REMARKS_TEMPERATURE_DECIMAL', 'REMARKS_TEMPERATURE_DECIMAL'), ('REMARKS_SEA_LEVEL_PRESSURE', 'REMARKS_SEA_LEVEL_PRESSURE')], max_length=255)),
+                ('answers', models.ManyToManyField(to='metar_practice.Answer')),
+                ('metar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='metar_practice.metar')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Report',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='metar_practice.question')),
+            ],
+        ),
+    ]
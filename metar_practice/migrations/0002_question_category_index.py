@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='category',
+            field=models.CharField(choices=[('AIRPORT', 'AIRPORT'), ('TIME', 'TIME'), ('WIND_DIRECTION', 'WIND_DIRECTION'), ('WIND_SPEED', 'WIND_SPEED'), ('WIND_GUST', 'WIND_GUST'), ('ALTIMETER', 'ALTIMETER'), ('TEMPERATURE', 'TEMPERATURE'), ('DEWPOINT', 'DEWPOINT'), ('VISIBILITY', 'VISIBILITY'), ('CLOUD_COVERAGE', 'CLOUD_COVERAGE'), ('CLOUD_HEIGHT_INDIVIDUAL', 'CLOUD_HEIGHT_INDIVIDUAL'), ('CLOUD_HEIGHT_COLLECTIVE', 'CLOUD_HEIGHT_COLLECTIVE'), ('WEATHER_CODES', 'WEATHER_CODES'), ('REMARKS_CODES', 'REMARKS_CODES'), ('REMARKS_TEMPERATURE_DECIMAL', 'REMARKS_TEMPERATURE_DECIMAL'), ('REMARKS_SEA_LEVEL_PRESSURE', 'REMARKS_SEA_LEVEL_PRESSURE')], db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0003_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionPayload',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='metar_practice.question')),
+                ('metar_raw', models.TextField(blank=True)),
+                ('airport_name', models.CharField(max_length=120)),
+                ('airport_city', models.CharField(max_length=120)),
+                ('airport_country', models.CharField(max_length=120)),
+                ('airport_icao', models.CharField(max_length=4)),
+                ('airport_latitude', models.CharField(max_length=120)),
+                ('airport_longitude', models.CharField(max_length=120)),
+                ('question_text', models.CharField(max_length=120)),
+                ('question_category', models.CharField(choices=[('AIRPORT', 'AIRPORT'), ('TIME', 'TIME'), ('WIND_DIRECTION', 'WIND_DIRECTION'), ('WIND_SPEED', 'WIND_SPEED'), ('WIND_GUST', 'WIND_GUST'), ('ALTIMETER', 'ALTIMETER'), ('TEMPERATURE', 'TEMPERATURE'), ('DEWPOINT', 'DEWPOINT'), ('VISIBILITY', 'VISIBILITY'), ('CLOUD_COVERAGE', 'CLOUD_COVERAGE'), ('CLOUD_HEIGHT_INDIVIDUAL', 'CLOUD_HEIGHT_INDIVIDUAL'), ('CLOUD_HEIGHT_COLLECTIVE', 'CLOUD_HEIGHT_COLLECTIVE'), ('WEATHER_CODES', 'WEATHER_CODES'), ('REMARKS_CODES', 'REMARKS_CODES'), ('REMARKS_TEMPERATURE_DECIMAL', 'REMARKS_TEMPERATURE_DECIMAL'), ('REMARKS_SEA_LEVEL_PRESSURE', 'REMARKS_SEA_LEVEL_PRESSURE')], max_length=255)),
+                ('answers', models.TextField(blank=True)),
+            ],
+        ),
+    ]
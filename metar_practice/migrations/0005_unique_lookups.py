@@ -0,0 +1,57 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:31
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """  Merges rows the new unique constraints would reject into the oldest copy """
+    Airport = apps.get_model('metar_practice', 'Airport')
+    Metar = apps.get_model('metar_practice', 'Metar')
+    Answer = apps.get_model('metar_practice', 'Answer')
+    Question = apps.get_model('metar_practice', 'Question')
+    Report = apps.get_model('metar_practice', 'Report')
+    QuestionAnswer = Question.answers.through
+
+    for duplicate in Airport.objects.values('icao').annotate(keep=Min('pk'), count=Count('pk')).filter(count__gt=1):
+        db_duplicates = Airport.objects.filter(icao=duplicate['icao']).exclude(pk=duplicate['keep'])
+        Metar.objects.filter(airport__in=db_duplicates).update(airport_id=duplicate['keep'])
+        db_duplicates.delete()
+
+    for duplicate in Question.objects.values('metar', 'text', 'category').annotate(keep=Min('pk'), count=Count('pk')).filter(count__gt=1):
+        db_duplicates = Question.objects.filter(metar=duplicate['metar'], text=duplicate['text'], category=duplicate['category']).exclude(pk=duplicate['keep'])
+        Report.objects.filter(question__in=db_duplicates).update(question_id=duplicate['keep'])
+        db_duplicates.delete()
+
+    for duplicate in Answer.objects.values('text').annotate(keep=Min('pk'), count=Count('pk')).filter(count__gt=1):
+        db_duplicates = Answer.objects.filter(text=duplicate['text']).exclude(pk=duplicate['keep'])
+        linked_question_ids = set(QuestionAnswer.objects.filter(answer_id=duplicate['keep']).values_list('question_id', flat=True))
+        for question_id in set(QuestionAnswer.objects.filter(answer__in=db_duplicates).values_list('question_id', flat=True)) - linked_question_ids:
+            QuestionAnswer.objects.create(question_id=question_id, answer_id=duplicate['keep'])
+        db_duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0004_question_payload'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='airport',
+            name='icao',
+            field=models.CharField(max_length=4, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='text',
+            field=models.CharField(max_length=120, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.UniqueConstraint(fields=('metar', 'text', 'category'), name='unique_question_per_metar'),
+        ),
+    ]
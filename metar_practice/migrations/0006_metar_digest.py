@@ -0,0 +1,22 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0005_unique_lookups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metar',
+            name='digest',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='metar',
+            index=models.Index(fields=['airport', 'digest'], name='metar_airport_digest_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+from metar_practice.metar_storage import encode_metar_json
+
+
+def compact_metars(apps, schema_editor):
+    """  Rewrites stored METAR JSON into compressed compact form and reports the bytes saved """
+    Metar = apps.get_model('metar_practice', 'Metar')
+    metar_count = 0
+    bytes_before = 0
+    bytes_after = 0
+    last_id = 0
+    while True:
+        db_metars = list(Metar.objects.filter(pk__gt=last_id).only('pk', 'metar_json').order_by('pk')[:500])
+        if len(db_metars) == 0:
+            break
+        for db_metar in db_metars:
+            db_metar.metar_data = encode_metar_json(db_metar.metar_json)
+            bytes_before += len(db_metar.metar_json.encode())
+            bytes_after += len(db_metar.metar_data)
+        Metar.objects.bulk_update(db_metars, ['metar_data'])
+        metar_count += len(db_metars)
+        last_id = db_metars[-1].pk
+    if metar_count > 0:
+        print('\n  Compacted {0} METARs from {1} to {2} bytes, saving {3} bytes.'.format(metar_count, bytes_before, bytes_after, bytes_before - bytes_after))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0006_metar_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metar',
+            name='metar_data',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(compact_metars, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='metar',
+            name='metar_json',
+        ),
+        migrations.AlterField(
+            model_name='metar',
+            name='metar_data',
+            field=models.BinaryField(),
+        ),
+    ]
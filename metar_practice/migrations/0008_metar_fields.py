@@ -0,0 +1,104 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:38
+
+from django.db import migrations, models
+
+from metar_practice.metar_storage import decode_metar_json
+from metar_practice.metar_storage import extract_metar_fields
+
+
+def fill_metar_fields(apps, schema_editor):
+    """  Decodes existing METARs once to fill their structured columns """
+    Metar = apps.get_model('metar_practice', 'Metar')
+    field_names = None
+    last_id = 0
+    while True:
+        db_metars = list(Metar.objects.filter(pk__gt=last_id).order_by('pk')[:500])
+        if len(db_metars) == 0:
+            break
+        for db_metar in db_metars:
+            fields = extract_metar_fields(decode_metar_json(db_metar.metar_data))
+            for name, value in fields.items():
+                setattr(db_metar, name, value)
+            field_names = list(fields.keys())
+        Metar.objects.bulk_update(db_metars, field_names)
+        last_id = db_metars[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0007_metar_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metar',
+            name='altimeter',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='ceiling',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='clouds',
+            field=models.CharField(blank=True, default='', editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='dewpoint',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='flight_rules',
+            field=models.CharField(blank=True, default='', editable=False, max_length=4),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='observed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='raw',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='station',
+            field=models.CharField(blank=True, default='', editable=False, max_length=4),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='temperature',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='visibility',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='wind_direction',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='wind_gust',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metar',
+            name='wind_speed',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='metar',
+            index=models.Index(fields=['flight_rules'], name='metar_flight_rules_idx'),
+        ),
+        migrations.RunPython(fill_metar_fields, migrations.RunPython.noop),
+    ]
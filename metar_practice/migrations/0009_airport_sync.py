@@ -0,0 +1,37 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:40
+
+from django.db import migrations, models
+
+import hashlib
+import json
+
+
+def fingerprint_airports(apps, schema_editor):
+    """  Fingerprints existing airports so the first sync only rewrites rows that differ from airports.csv """
+    Airport = apps.get_model('metar_practice', 'Airport')
+    db_airports = list(Airport.objects.all())
+    for db_airport in db_airports:
+        details = [db_airport.name, db_airport.city, db_airport.country, db_airport.latitude, db_airport.longitude]
+        db_airport.fingerprint = hashlib.sha1(json.dumps(details).encode()).hexdigest()
+    Airport.objects.bulk_update(db_airports, ['fingerprint'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0008_metar_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airport',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='airport',
+            name='retired',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(fingerprint_airports, migrations.RunPython.noop),
+    ]
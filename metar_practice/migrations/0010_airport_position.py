@@ -0,0 +1,46 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+def get_degrees(value, limit):
+    try:
+        degrees = float(value)
+    except (TypeError, ValueError) as e:
+        return None
+    return degrees if -limit <= degrees <= limit else None
+
+
+def fill_airport_positions(apps, schema_editor):
+    """  Converts the latitude and longitude text of existing airports into numbers """
+    Airport = apps.get_model('metar_practice', 'Airport')
+    db_airports = list(Airport.objects.all())
+    for db_airport in db_airports:
+        db_airport.latitude_deg = get_degrees(db_airport.latitude, 90)
+        db_airport.longitude_deg = get_degrees(db_airport.longitude, 180)
+    Airport.objects.bulk_update(db_airports, ['latitude_deg', 'longitude_deg'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0009_airport_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airport',
+            name='latitude_deg',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='airport',
+            name='longitude_deg',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='airport',
+            index=models.Index(fields=['latitude_deg', 'longitude_deg'], name='airport_position_idx'),
+        ),
+        migrations.RunPython(fill_airport_positions, migrations.RunPython.noop),
+    ]
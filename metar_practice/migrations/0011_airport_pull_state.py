@@ -0,0 +1,25 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0010_airport_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AirportPullState',
+            fields=[
+                ('airport', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pull_state', serialize=False, to='metar_practice.airport')),
+                ('last_fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('last_observed_at', models.DateTimeField(blank=True, null=True)),
+                ('failure_count', models.IntegerField(default=0)),
+                ('report_interval', models.IntegerField(default=3600)),
+                ('next_due_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2026-10-17 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0011_airport_pull_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airportpullstate',
+            name='quarantined',
+            field=models.BooleanField(default=False),
+        ),
+    ]
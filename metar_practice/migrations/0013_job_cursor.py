@@ -0,0 +1,31 @@
+# Generated by Django 3.2.13 on 2026-10-17 03:06
+
+from django.db import migrations, models
+
+
+def move_answer_gc_cursor(apps, schema_editor):
+    """  Moves the answer garbage collection cursor out of the counters table """
+    Counter = apps.get_model('metar_practice', 'Counter')
+    JobCursor = apps.get_model('metar_practice', 'JobCursor')
+    for db_counter in Counter.objects.filter(name='answer_gc:cursor'):
+        JobCursor.objects.update_or_create(name=db_counter.name, defaults={'value': db_counter.value})
+        db_counter.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metar_practice', '0012_airport_quarantine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(move_answer_gc_cursor, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
 from django.db import models
 
 from metar_practice.enums import QuestionType
+from metar_practice.metar_storage import encode_metar_json
+from metar_practice.metar_storage import decode_metar_json
+from metar_practice.metar_storage import extract_metar_fields
+
+import hashlib
+import json
 
 
 class Airport(models.Model):
@@ -8,20 +14,101 @@ class Airport(models.Model):
     name = models.CharField(max_length=120, blank=False)
     city = models.CharField(max_length=120, blank=False)
     country = models.CharField(max_length=120, blank=False)
-    icao = models.CharField(max_length=4, blank=False)
+    icao = models.CharField(max_length=4, blank=False, unique=True)
     latitude = models.CharField(max_length=120, blank=False)
     longitude = models.CharField(max_length=120, blank=False)
+    fingerprint = models.CharField(max_length=40, blank=True, default='', editable=False)  # Note sha1 of the airports.csv row it was loaded from
+    retired = models.BooleanField(default=False, editable=False)                          # Note no longer in airports.csv, kept for its questions
+    latitude_deg = models.FloatField(null=True, blank=True, editable=False)               # Note latitude as a number for geo queries
+    longitude_deg = models.FloatField(null=True, blank=True, editable=False)              # Note longitude as a number for geo queries
+
+    class Meta:
+        indexes = [models.Index(fields=['latitude_deg', 'longitude_deg'], name='airport_position_idx')]
+
+
+    @staticmethod
+    def get_fingerprint(name, city, country, latitude, longitude):
+        """  Returns fingerprint of airport details used to detect changed airports.csv rows """
+        return hashlib.sha1(json.dumps([name, city, country, latitude, longitude]).encode()).hexdigest()
+
+
+    @staticmethod
+    def get_degrees(value, limit):
+        """  Returns coordinate text as a number of degrees, or None when it is not a number within +/- limit """
+        try:
+            degrees = float(value)
+        except (TypeError, ValueError) as e:
+            return None
+        return degrees if -limit <= degrees <= limit else None
+
+
+    def save(self, *args, **kwargs):
+        self.latitude_deg = Airport.get_degrees(self.latitude, 90)
+        self.longitude_deg = Airport.get_degrees(self.longitude, 180)
+        super().save(*args, **kwargs)
 
 
 class Metar(models.Model):
     """  Metar model used for storing details about metar at connected airports """
-    metar_json = models.TextField(null=False)                                             # Note JSON representation
+    metar_data = models.BinaryField(null=False)                                           # Note compressed compact JSON, use metar_json
     airport = models.ForeignKey(Airport, on_delete=models.CASCADE)
+    digest = models.CharField(max_length=64, null=True, blank=True, editable=False)       # Note sha256 of station, observation time and raw report
+    station = models.CharField(max_length=4, blank=True, default='', editable=False)
+    raw = models.TextField(blank=True, default='', editable=False)
+    observed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    flight_rules = models.CharField(max_length=4, blank=True, default='', editable=False)
+    wind_direction = models.IntegerField(null=True, blank=True, editable=False)           # Note degrees
+    wind_speed = models.IntegerField(null=True, blank=True, editable=False)
+    wind_gust = models.IntegerField(null=True, blank=True, editable=False)
+    visibility = models.FloatField(null=True, blank=True, editable=False)
+    temperature = models.IntegerField(null=True, blank=True, editable=False)
+    dewpoint = models.IntegerField(null=True, blank=True, editable=False)
+    altimeter = models.FloatField(null=True, blank=True, editable=False)
+    clouds = models.CharField(max_length=120, blank=True, default='', editable=False)     # Note cloud layers as reported, e.g. FEW024 BKN036
+    ceiling = models.IntegerField(null=True, blank=True, editable=False)                  # Note lowest broken or overcast layer in hundreds of feet
+
+    class Meta:
+        indexes = [models.Index(fields=['airport', 'digest'], name='metar_airport_digest_idx'),
+                   models.Index(fields=['flight_rules'], name='metar_flight_rules_idx')]
+
+
+    @staticmethod
+    def get_digest(metar_json):
+        """  Returns digest identifying a METAR report by station, observation time and raw text, ignoring fetch metadata """
+        try:
+            metar = json.loads(metar_json)
+            key = json.dumps([metar.get('station'), (metar.get('time') or {}).get('dt'), metar.get('raw')])
+        except (ValueError, TypeError, AttributeError) as e:
+            key = metar_json
+        return hashlib.sha256(key.encode()).hexdigest()
+
+
+    @property
+    def metar_json(self):
+        """  Returns the stored METAR as JSON text """
+        return decode_metar_json(self.metar_data)
+
+
+    @metar_json.setter
+    def metar_json(self, metar_json):
+        self.metar_data = encode_metar_json(metar_json)
+
+
+    def set_metar_fields(self, metar_json):
+        """  Fills the digest and structured columns from METAR JSON so reads never need to decode it """
+        self.digest = Metar.get_digest(metar_json)
+        for name, value in extract_metar_fields(metar_json).items():
+            setattr(self, name, value)
+
+
+    def save(self, *args, **kwargs):
+        self.set_metar_fields(self.metar_json)
+        super().save(*args, **kwargs)
 
 
 class Answer(models.Model):
     """  Answer model used for storing answer strings """
-    text = models.CharField(max_length=120, blank=False)
+    text = models.CharField(max_length=120, blank=False, unique=True)
 
 
 class Question(models.Model):
@@ -29,10 +116,51 @@ class Question(models.Model):
     metar = models.ForeignKey(Metar, on_delete=models.CASCADE)
     text = models.CharField(max_length=120, blank=False)
     answers = models.ManyToManyField(Answer)
-    category = models.CharField(max_length=255, choices=QuestionType.choices())
+    category = models.CharField(max_length=255, choices=QuestionType.choices(), db_index=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['metar', 'text', 'category'], name='unique_question_per_metar')]
 
 
 class Report(models.Model):
     """  Report model used for storing question details and a users problem/issue """
     description = models.TextField(null=False)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
+
+
+class Counter(models.Model):
+    """  Counter model used for storing running totals of questions and airports """
+    name = models.CharField(max_length=255, unique=True)
+    value = models.BigIntegerField(default=0)
+
+
+class JobCursor(models.Model):
+    """  JobCursor model used for storing where a resumable maintenance job paused, kept apart from the counters """
+    name = models.CharField(max_length=255, unique=True)
+    value = models.BigIntegerField(default=0)                                             # Note primary key the job continues after
+
+
+class QuestionPayload(models.Model):
+    """  QuestionPayload model used for storing everything the practice page shows for a question, avoiding joins """
+    question = models.OneToOneField(Question, primary_key=True, on_delete=models.CASCADE, related_name='payload')
+    metar_raw = models.TextField(blank=True)
+    airport_name = models.CharField(max_length=120)
+    airport_city = models.CharField(max_length=120)
+    airport_country = models.CharField(max_length=120)
+    airport_icao = models.CharField(max_length=4)
+    airport_latitude = models.CharField(max_length=120)
+    airport_longitude = models.CharField(max_length=120)
+    question_text = models.CharField(max_length=120)
+    question_category = models.CharField(max_length=255, choices=QuestionType.choices())
+    answers = models.TextField(blank=True)                                                # Note newline separated answer strings
+
+
+class AirportPullState(models.Model):
+    """  AirportPullState model used for scheduling METAR pulls of an airport from what earlier pulls returned """
+    airport = models.OneToOneField(Airport, primary_key=True, on_delete=models.CASCADE, related_name='pull_state')
+    last_fetched_at = models.DateTimeField(null=True, blank=True)
+    last_observed_at = models.DateTimeField(null=True, blank=True)                        # Note observation time of the newest report pulled
+    failure_count = models.IntegerField(default=0)                                        # Note consecutive pulls without a report
+    quarantined = models.BooleanField(default=False)                                      # Note failed too often, only probed occasionally
+    report_interval = models.IntegerField(default=3600)                                   # Note seconds between reports, smoothed over pulls
+    next_due_at = models.DateTimeField(db_index=True)                                     # Note when a new report is next expected
@@ -0,0 +1,119 @@
+import django
+import datetime
+import os
+import signal
+import sys
+import threading
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from django.db import close_old_connections
+
+from metar_practice.answer_cache import AnswerCache
+from metar_practice.metar_collector import MetarCollector
+from metar_practice.pull_metar_data import PullReport
+from metar_practice.pull_metar_data import remove_overflow
+from metar_practice.pull_metar_data import hour_pull_count
+from metar_practice.pull_metar_data import avwx_batch_size
+from metar_practice.pull_metar_data import answer_cache_size
+from metar_practice.pull_scheduler import PullScheduler
+from metar_practice.question_collector import QuestionCollector
+
+import time
+
+
+HOUSEKEEPING_INTERVAL = 3600            # Seconds between reports, METAR eviction, orphan answer collection and counter reconciling
+
+
+class PullDaemon:
+    """  Resident pull service spreading hour_pull_count pulls evenly over each hour instead of bursting them from cron
+
+         The AVWX session, answer cache and database connection stay warm between pulls. Every tick pulls up to
+         avwx_batch_size airports that are due, and housekeeping pull_metar_data does after each run happens once every
+         HOUSEKEEPING_INTERVAL. stop() lets the current tick finish before the loop exits, it is the SIGTERM handler. """
+
+    def __init__(self, pulls_per_hour=hour_pull_count, batch_size=avwx_batch_size, housekeeping_interval=HOUSEKEEPING_INTERVAL,
+                 clock=time.monotonic):
+        self.batch_size = batch_size
+        self.tick_interval = 3600 * batch_size / pulls_per_hour
+        self.housekeeping_interval = housekeeping_interval
+        self.clock = clock
+        self.stopping = threading.Event()
+        self.metar_collector = MetarCollector(pool_size=1)
+        self.pull_scheduler = PullScheduler()
+        self.answer_cache = AnswerCache(answer_cache_size)
+        self.pull_report = PullReport()
+
+
+    def stop(self, signum=None, frame=None):
+        """  Asks the loop to exit once the current tick is done """
+        self.stopping.set()
+
+
+    def pull_due(self):
+        """  Pulls and generates questions for up to batch_size airports that are due, returns how many were pulled """
+        db_airports = self.pull_scheduler.get_due_airports(self.batch_size)
+        if len(db_airports) == 0:
+            return 0
+
+        start = time.perf_counter()
+        reports = self.metar_collector.fetch_metars([db_airport.icao for db_airport in db_airports])
+        statuses = sorted(set(str(status) for status, text in reports.values()))
+        self.pull_report.record(','.join(reports.keys()), '/'.join(statuses), (time.perf_counter() - start) * 1000)
+        for db_airport in db_airports:
+            status, db_metar = self.metar_collector.store_metar(db_airport, *reports.get(db_airport.icao, (None, None)))
+            self.pull_scheduler.record_pull(db_airport, status, db_metar)
+            if status == 200 and db_metar is not None:
+                QuestionCollector(db_metar, self.answer_cache).generate_questions()
+        return len(db_airports)
+
+
+    def housekeep(self):
+        """  Prints the pull reports since the last housekeeping then trims the database like the end of a pull_metar_data run """
+        print('\n{0}'.format(self.pull_report.summary()))
+        print(self.pull_scheduler.summary())
+        print('Answer cache hits={0} misses={1}'.format(self.answer_cache.hits, self.answer_cache.misses))
+        connection_stats = self.metar_collector.get_connection_stats()
+        print('AVWX connections opened={0} reused={1}'.format(connection_stats['connections'], connection_stats['reused']))
+        remove_overflow()
+        self.pull_report = PullReport()
+        self.pull_scheduler = PullScheduler()
+
+
+    def tick(self):
+        """  Runs one pull, a failure is printed and the database connection dropped so the next tick starts clean """
+        try:
+            self.pull_due()
+        except Exception as e:
+            print(e)
+            close_old_connections()
+
+
+    def run(self):
+        """  Pulls every tick_interval seconds until stopped, then housekeeps a last time and closes the AVWX session """
+        next_tick = self.clock()
+        next_housekeeping = next_tick + self.housekeeping_interval
+        while not self.stopping.is_set():
+            self.tick()
+            if self.clock() >= next_housekeeping:
+                self.housekeep()
+                next_housekeeping += self.housekeeping_interval
+            next_tick += self.tick_interval
+            self.stopping.wait(max(0, next_tick - self.clock()))
+        self.housekeep()
+        self.metar_collector.close()
+        print('\nStopped METAR pull daemon {0}\n'.format(datetime.datetime.utcnow()))
+
+
+def main():
+    pull_daemon = PullDaemon()
+    signal.signal(signal.SIGTERM, pull_daemon.stop)
+    signal.signal(signal.SIGINT, pull_daemon.stop)
+    print('Started METAR pull daemon pulling {0} airports every {1:.0f}s'.format(pull_daemon.batch_size, pull_daemon.tick_interval))
+    pull_daemon.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,54 +8,159 @@ sys.path.append('..')
 os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
 django.setup()
 
-from metar_practice.models import Metar
-from metar_practice.models import Question
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 
+from common.utils import percentile
+
+from metar_practice.answer_cache import AnswerCache
+from metar_practice.answer_gc import collect_orphan_answers
 from metar_practice.metar_collector import MetarCollector
+from metar_practice.pull_scheduler import PullScheduler
 from metar_practice.question_collector import QuestionCollector
+from metar_practice.rate_limiter import TokenBucket
+from metar_practice.retention import RetentionEngine
+from metar_practice.retention import OLDEST_FIRST
+
+from metar_practice import counters
+
+import time
 
 
 hour_pull_count = 50
 database_question_limit = 100000
+pull_concurrency = 1                    # AVWX requests in flight at once, 1 pulls sequentially
+avwx_requests_per_second = 1            # Average AVWX request rate allowed by the plan quota
+avwx_request_burst = 5                  # AVWX requests allowed back to back before the rate applies
+avwx_batch_size = 1                     # Stations per AVWX request, above 1 uses the multi station endpoint
+retention_policy = OLDEST_FIRST         # Order METARs are evicted in once over database_question_limit
+retention_batch_size = 500              # METARs deleted per transaction when evicting
+answer_cache_size = 10000               # Answer ids remembered across METARs in a run to skip answer lookups
+answer_gc_time_limit = 30               # Seconds spent deleting orphan answers, collect_orphan_answers.py resumes the rest
+
+
+class PullReport:
+    """  Records the latency of every AVWX request in a pull run and summarises its throughput """
+
+    def __init__(self):
+        self.latencies = []
+        self.start = time.perf_counter()
+
+
+    def record(self, icao, status, latency):
+        """  Records latency in milliseconds of a single AVWX request """
+        self.latencies.append(latency)
+        print('AVWX request icao={0} status={1} latency={2:.0f}ms'.format(icao, status, latency))
+
+
+    def summary(self):
+        """  Returns request count, throughput and latency percentiles of the run so far """
+        elapsed = time.perf_counter() - self.start
+        if len(self.latencies) == 0:
+            return 'Made 0 AVWX requests in {0:.2f}s'.format(elapsed)
+        return 'Made {0} AVWX requests in {1:.2f}s ({2:.2f} requests/s) latency p50={3:.0f}ms p99={4:.0f}ms'.format(len(self.latencies),
+                                                                                                                     elapsed,
+                                                                                                                     len(self.latencies) / elapsed,
+                                                                                                                     percentile(self.latencies, 0.50),
+                                                                                                                     percentile(self.latencies, 0.99))
+
+
+def process_pull(i, db_airport, status, db_metar, answer_cache=None):
+    """  Generates questions for a pulled METAR report and logs the outcome """
+    if status == 200 and db_metar is not None:
+        question_colllector = QuestionCollector(db_metar, answer_cache)
+        question_colllector.generate_questions()
+        print('\nSuccessfully pulled METAR data {0}/{1}\n'.format(i+1, hour_pull_count))
+
+    if db_airport is None or status != 200 or db_metar is None:
+        print('\nFailed to pull METAR data {0}/{1}'.format(i+1, hour_pull_count))
+        print('status={} db_airport={} db_metar={}\n'.format(status, db_airport, db_metar))
+
+
+def get_scheduled_airports(pull_scheduler):
+    """  Retrieves the airports due a pull this run, logging how many of the hour_pull_count slots go unused """
+    db_airports = pull_scheduler.get_due_airports(hour_pull_count)
+    if len(db_airports) < hour_pull_count:
+        print('\nOnly {0} airports are due a pull, leaving {1}/{2} pulls unused\n'.format(len(db_airports), hour_pull_count - len(db_airports), hour_pull_count))
+    return db_airports
+
+
+def pull_sequentially(metar_collector, pull_scheduler, pull_report, answer_cache):
+    """  Pulls METAR reports one after another """
+    for i, db_airport in enumerate(get_scheduled_airports(pull_scheduler)):
+        start = time.perf_counter()
+        status, db_metar = metar_collector.get_raw_metar(db_airport)
+        pull_report.record(db_airport.icao, status, (time.perf_counter() - start) * 1000)
+        pull_scheduler.record_pull(db_airport, status, db_metar)
+        process_pull(i, db_airport, status, db_metar, answer_cache)
+
+
+def fetch_metars(metar_collector, rate_limiter, icaos):
+    """  Worker task fetching METAR reports for a group of icaos once the rate limiter allows, returning the responses and latency """
+    rate_limiter.acquire()
+    start = time.perf_counter()
+    reports = metar_collector.fetch_metars(icaos)
+    return reports, (time.perf_counter() - start) * 1000
+
+
+def pull_concurrently(metar_collector, pull_scheduler, pull_report, answer_cache):
+    """  Fetches METAR reports in groups of avwx_batch_size on a pool of worker threads while this thread stays the only database writer """
+    rate_limiter = TokenBucket(avwx_requests_per_second, avwx_request_burst)
+    db_airports = get_scheduled_airports(pull_scheduler)
+    i = 0
+
+    with ThreadPoolExecutor(max_workers=pull_concurrency) as executor:
+        futures = {}
+        for start in range(0, len(db_airports), avwx_batch_size):
+            group = db_airports[start:start + avwx_batch_size]
+            futures[executor.submit(fetch_metars, metar_collector, rate_limiter, [db_airport.icao for db_airport in group])] = group
+
+        for future in as_completed(futures):
+            group = futures[future]
+            reports, latency = future.result()
+            statuses = sorted(set(str(status) for status, text in reports.values()))
+            pull_report.record(','.join(reports.keys()), '/'.join(statuses), latency)
+            for db_airport in group:
+                status, db_metar = metar_collector.store_metar(db_airport, *reports.get(db_airport.icao, (None, None)))
+                pull_scheduler.record_pull(db_airport, status, db_metar)
+                process_pull(i, db_airport, status, db_metar, answer_cache)
+                i += 1
+
 
 def main():
-    metar_collector = MetarCollector()
+    metar_collector = MetarCollector(pool_size=pull_concurrency)
     time_now = datetime.datetime.utcnow()
-    for i in range(0, hour_pull_count):
-        db_airport = metar_collector.get_random_airport()
-        status = None
-        db_metar = None
-        db_questions = None
+    pull_report = PullReport()
+    pull_scheduler = PullScheduler()
+    answer_cache = AnswerCache(answer_cache_size)
+    if pull_concurrency > 1 or avwx_batch_size > 1:
+        pull_concurrently(metar_collector, pull_scheduler, pull_report, answer_cache)
+    else:
+        pull_sequentially(metar_collector, pull_scheduler, pull_report, answer_cache)
+    print('\n{0}'.format(pull_report.summary()))
+    print(pull_scheduler.summary())
+    print('Answer cache hits={0} misses={1}'.format(answer_cache.hits, answer_cache.misses))
+    connection_stats = metar_collector.get_connection_stats()
+    print('AVWX connections opened={0} reused={1}'.format(connection_stats['connections'], connection_stats['reused']))
+    metar_collector.close()
+    remove_overflow()
+    print('\nSuccessfully completed {0} METAR data pull\n'.format(time_now))
 
-        if db_airport is not None:
-            status, db_metar = metar_collector.get_raw_metar(db_airport)
 
-        if status == 200 and db_metar is not None:
-            question_colllector = QuestionCollector(db_metar)
-            question_colllector.generate_questions()
-            print('\nSuccessfully pulled METAR data {0}/{1}\n'.format(i+1, hour_pull_count))
+def remove_overflow():
+    """  Evicts METARs over database_question_limit, deletes orphan answers and reconciles counters """
+    print('\nRemoving overflow of METAR data')
+    retention_engine = RetentionEngine(database_question_limit, retention_policy, retention_batch_size)
+    retention_report = retention_engine.evict()
+    print(retention_report.summary())
 
-        if db_airport is None or status != 200 or db_metar is None:
-            print('\nFailed to pull METAR data {0}/{1}'.format(i+1, hour_pull_count))
-            print('status={} db_airport={} db_metar={}\n'.format(status, db_airport, db_metar))
+    print('\nRemoving orphan answers')
+    print(collect_orphan_answers(time_limit=answer_gc_time_limit).summary())
 
-    print('\nRemoving overflow of METAR data')
-    db_answers = []
-    print(database_question_limit)
-    while Question.objects.count() > database_question_limit:
-        db_metar = Metar.objects.order_by("?").first()
-        db_questions = Question.objects.filter(metar=db_metar)
-        for db_question in db_questions:
-            for db_answer in db_question.answers.all():
-                if db_answer not in db_answers:
-                    db_answers.append(db_answer)
-        db_metar.delete()
-
-    for db_answer in db_answers:
-        db_questions = Question.objects.filter(answers=db_answer)
-        if len(db_questions) == 0:
-            db_answer.delete()
-    print('\nSuccessfully completed {0} METAR data pull\n'.format(time_now))
+    counts, drift = counters.reconcile()
+    print('\nReconciled counters questions={0} airports={1} drift={2}'.format(counts[counters.QUESTIONS_COUNTER],
+                                                                            counts[counters.AIRPORTS_COUNTER],
+                                                                            drift))
 
 
 if __name__ == "__main__":
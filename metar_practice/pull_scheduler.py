@@ -0,0 +1,112 @@
+from django.db.models import F
+from django.utils import timezone
+
+from metar_practice.models import Airport
+from metar_practice.models import AirportPullState
+
+import datetime
+
+
+REPORT_INTERVAL = 3600                  # Seconds assumed between reports until pulls show otherwise
+REPORT_INTERVAL_MIN = 900               # Shortest interval learned, keeps SPECI reports from shrinking it further
+REPORT_INTERVAL_MAX = 10800             # Longest gap between two reports still treated as consecutive
+REPORT_INTERVAL_SMOOTHING = 0.3         # Weight given to the newest gap when updating the interval
+FAILURE_BACKOFF_MAX = 604800            # Longest wait in seconds before retrying an airport that keeps failing
+QUARANTINE_FAILURES = 8                 # Consecutive failures after which an airport is quarantined
+QUARANTINE_PROBE_INTERVAL = 2592000     # Seconds between pulls of a quarantined airport checking if it has recovered
+
+
+class PullScheduler:
+    """  Chooses which airports to pull from per airport state so each AVWX call is likely to return a new report
+
+         Airports never pulled come first, then airports whose next report is due, most overdue first. An airport's
+         next report is expected one report interval after its newest observation, an airport whose newest report is
+         already older than that is not due again for another interval. Failed pulls back off exponentially from the
+         report interval and after QUARANTINE_FAILURES in a row the airport is quarantined, pulled only once every
+         QUARANTINE_PROBE_INTERVAL until it returns a report. Outcomes are counted to report how many calls were wasted. """
+
+    def __init__(self):
+        self.new_reports = 0
+        self.unchanged_reports = 0
+        self.failures = 0
+        self.quarantines = 0
+
+
+    def summary(self):
+        """  Returns pull outcome counts and the share of calls that returned no new report """
+        pulls = self.new_reports + self.unchanged_reports + self.failures
+        wasted = 0
+        if pulls > 0:
+            wasted = (self.unchanged_reports + self.failures) / pulls
+        return 'Pulled {0} airports: {1} new reports, {2} unchanged, {3} failed, {4:.0%} of calls wasted, {5} airports quarantined'.format(pulls,
+                                                                                                                                          self.new_reports,
+                                                                                                                                          self.unchanged_reports,
+                                                                                                                                          self.failures,
+                                                                                                                                          wasted,
+                                                                                                                                          self.quarantines)
+
+
+    def get_due_airports(self, count, now=None):
+        """  Retrieves up to count airports that are not retired and are due a pull, with their pull state, in one query """
+        now = now if now is not None else timezone.now()
+        return list(Airport.objects.filter(retired=False)
+                                   .exclude(pull_state__next_due_at__gt=now)
+                                   .select_related('pull_state')
+                                   .order_by(F('pull_state__next_due_at').asc(nulls_first=True), 'pk')[:count])
+
+
+    def get_pull_state(self, db_airport):
+        """  Returns the pull state of an airport, unsaved and blank if it has never been pulled """
+        try:
+            return db_airport.pull_state
+        except AirportPullState.DoesNotExist as e:
+            return AirportPullState(airport=db_airport, report_interval=REPORT_INTERVAL)
+
+
+    def update_report_interval(self, pull_state, observed_at):
+        """  Smooths the report interval towards the gap since the previous report when the two reports are consecutive """
+        if pull_state.last_observed_at is None:
+            return
+        gap = (observed_at - pull_state.last_observed_at).total_seconds()
+        if 0 < gap <= REPORT_INTERVAL_MAX:
+            interval = (1 - REPORT_INTERVAL_SMOOTHING) * pull_state.report_interval + REPORT_INTERVAL_SMOOTHING * gap
+            pull_state.report_interval = int(min(max(interval, REPORT_INTERVAL_MIN), REPORT_INTERVAL_MAX))
+
+
+    def record_pull(self, db_airport, status, db_metar, now=None):
+        """  Updates and saves the pull state of an airport after a pull and returns it, or None if the pull removed the airport """
+        now = now if now is not None else timezone.now()
+        if status == 400 and not Airport.objects.filter(pk=db_airport.pk).exists():
+            return None                                                     # Removed by MetarCollector for an invalid icao
+        pull_state = self.get_pull_state(db_airport)
+        pull_state.last_fetched_at = now
+        interval = datetime.timedelta(seconds=pull_state.report_interval)
+        next_due_at = now + interval
+        if status == 200 and db_metar is not None:
+            pull_state.failure_count = 0
+            pull_state.quarantined = False
+            observed_at = db_metar.observed_at
+            if observed_at is not None and (pull_state.last_observed_at is None or observed_at > pull_state.last_observed_at):
+                self.update_report_interval(pull_state, observed_at)
+                pull_state.last_observed_at = observed_at
+                self.new_reports += 1
+            else:
+                self.unchanged_reports += 1
+            if pull_state.last_observed_at is not None:
+                expected_at = pull_state.last_observed_at + datetime.timedelta(seconds=pull_state.report_interval)
+                if expected_at > now:
+                    next_due_at = expected_at
+        else:
+            self.failures += 1
+            pull_state.failure_count += 1
+            if pull_state.failure_count >= QUARANTINE_FAILURES:
+                self.quarantines += 0 if pull_state.quarantined else 1
+                pull_state.quarantined = True
+                next_due_at = now + datetime.timedelta(seconds=QUARANTINE_PROBE_INTERVAL)
+            else:
+                backoff = min(pull_state.report_interval * 2 ** (pull_state.failure_count - 1), FAILURE_BACKOFF_MAX)
+                next_due_at = now + datetime.timedelta(seconds=backoff)
+        pull_state.next_due_at = next_due_at
+        pull_state.save()
+        db_airport.pull_state = pull_state
+        return pull_state
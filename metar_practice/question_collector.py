@@ -1,17 +1,18 @@
-import django
 import json
-import sys
-import os
 
-sys.path.append('..')
-os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
-django.setup()
+from django.db import IntegrityError
+from django.db import transaction
 
 from metar_practice.models import Answer
 from metar_practice.models import Question
+from metar_practice.models import QuestionPayload
 
 from metar_practice.enums import QuestionType
 
+from metar_practice.question_payloads import build_question_payload
+
+from metar_practice import counters
+
 
 class UsuableDataError(Exception):
     pass
@@ -19,47 +20,120 @@ class UsuableDataError(Exception):
 
 class QuestionCollector:
 
-    def __init__(self, db_metar):
+    def __init__(self, db_metar, answer_cache=None):
         self.db_metar = db_metar
         self.metar = json.loads(db_metar.metar_json)
         self.questions = {}
+        self.answer_cache = answer_cache
+        self.pending_questions = []
+        self.batching = False
 
 
     def create_db_answers(self, answers):
-        """  Creates Answer objects for answer strings """
-        db_answers = []
-        while len(answers) != 0:
-            answer = answers.pop(0)
-            db_answer = None
-            try:
-                db_answer = Answer.objects.get(text=answer)
-            except Answer.DoesNotExist:
-                db_answer = Answer(text=answer)
-                db_answer.full_clean()
-                db_answer.save()
-            db_answers.append(db_answer)
-        return db_answers
+        """  Creates Answer objects for answer strings, looking up uncached strings in one query and bulk creating missing ones """
+        answer_ids = {}
+        uncached = []
+        for answer in dict.fromkeys(answers):
+            answer_id = self.answer_cache.get(answer) if self.answer_cache is not None else None
+            if answer_id is None:
+                uncached.append(answer)
+            else:
+                answer_ids[answer] = answer_id
+
+        if len(uncached) != 0:
+            found_ids = self.get_answer_ids(uncached)
+            db_new_answers = [Answer(text=answer) for answer in uncached if answer not in found_ids]
+            if len(db_new_answers) != 0:
+                for db_answer in db_new_answers:
+                    db_answer.clean_fields()
+                Answer.objects.bulk_create(db_new_answers, ignore_conflicts=True)         # Unique text so a concurrent insert wins quietly
+                found_ids.update(self.get_answer_ids([db_answer.text for db_answer in db_new_answers]))
+            for answer in uncached:
+                answer_ids[answer] = found_ids[answer]
+                if self.answer_cache is not None:
+                    self.answer_cache.put(answer, found_ids[answer])
+        return [Answer(pk=answer_ids[answer], text=answer) for answer in answers]
+
+
+    def get_answer_ids(self, answers):
+        """  Returns {text: id} of existing answers for answer strings, the oldest answer winning if a string is stored twice """
+        return dict(Answer.objects.filter(text__in=answers).order_by('-pk').values_list('text', 'pk'))
 
 
     def create_db_question(self, text, answers, category):
-        """  Creates Question object for relevant question and answer strings """
-        db_answers = self.create_db_answers(answers)
-        db_question = None
-        try:
-            db_question = Question.objects.get(metar=self.db_metar,
-                                               text=text,
-                                               category=category.value)
-            # Note to self no need to check answers here the answers are directly a result of the metar and question/text
-        except Question.DoesNotExist:
-            db_question = Question(metar=self.db_metar,
-                                   text=text,
-                                   category=category.value)
-            db_question.full_clean()
-            db_question.save()
-            [db_question.answers.add(db_answer) for db_answer in db_answers]
+        """  Creates Question object for relevant question and answer strings, held back while generate_questions batches writes """
+        db_question = Question(metar=self.db_metar,
+                               text=text,
+                               category=category.value)
+        db_question.clean_fields(exclude=['metar'])
+        self.pending_questions.append((db_question, list(answers)))
+        if not self.batching:
+            self.save_db_questions()
         return db_question
 
 
+    def save_db_questions(self):
+        """  Writes held back questions with their answers, links and payloads in one transaction, retrying once if a cached answer was deleted
+             or another writer stored one of the questions first, so only questions this call inserted are counted """
+        pending_questions = self.pending_questions
+        self.pending_questions = []
+        if len(pending_questions) == 0:
+            return
+        try:
+            with transaction.atomic():
+                created = self.write_db_questions(pending_questions)
+        except IntegrityError:
+            if self.answer_cache is not None:
+                self.answer_cache.clear()                   # A cached answer may have been deleted
+            with transaction.atomic():
+                created = self.write_db_questions(pending_questions)    # Questions another writer stored first are now skipped
+
+        deltas = {counters.QUESTIONS_COUNTER: len(created)}              # bulk_create skips the post_save counter signal
+        for db_question in created:
+            name = counters.category_counter(db_question.category)
+            deltas[name] = deltas.get(name, 0) + 1
+        counters.add(deltas)
+
+
+    def write_db_questions(self, pending_questions):
+        """  Bulk creates the questions of pending_questions this METAR does not already have and returns them, raising IntegrityError if one was stored meanwhile """
+        db_answers = self.create_db_answers([answer for db_question, answers in pending_questions for answer in answers])
+        db_answers_by_text = {db_answer.text: db_answer for db_answer in db_answers}
+        question_ids = self.get_question_ids(pending_questions)
+
+        db_new_questions = {}
+        for db_question, answers in pending_questions:
+            key = (db_question.text, db_question.category)
+            if key not in question_ids and key not in db_new_questions:
+                db_new_questions[key] = (db_question, answers)
+                # Note to self no need to check answers here the answers are directly a result of the metar and question/text
+        Question.objects.bulk_create([db_question for db_question, answers in db_new_questions.values()])   # Conflicts raise so every question returned was inserted here
+        question_ids.update(self.get_question_ids(db_new_questions.values()))
+        for db_question, answers in pending_questions:
+            db_question.pk = question_ids[(db_question.text, db_question.category)]
+
+        db_links = []
+        db_payloads = []
+        for db_question, answers in db_new_questions.values():
+            question_answers = [db_answers_by_text[answer] for answer in answers]
+            for db_answer in dict.fromkeys(question_answers):
+                db_links.append(Question.answers.through(question_id=db_question.pk, answer_id=db_answer.pk))
+            db_payloads.append(build_question_payload(db_question, question_answers))
+        Question.answers.through.objects.bulk_create(db_links, ignore_conflicts=True)
+        QuestionPayload.objects.bulk_create(db_payloads, ignore_conflicts=True)
+        return [db_question for db_question, answers in db_new_questions.values()]
+
+
+    def get_question_ids(self, pending_questions):
+        """  Returns {(text, category): id} of this METAR's stored questions matching pending_questions """
+        texts = set(db_question.text for db_question, answers in pending_questions)
+        if len(texts) == 0:
+            return {}
+        return {(text, category): question_id for text, category, question_id in Question.objects.filter(metar=self.db_metar, text__in=texts)
+                                                                                                 .order_by('-pk')
+                                                                                                 .values_list('text', 'category', 'pk')}
+
+
     def generate_airport_question(self):
         """  Generates question for user pertaining to icao of airport corresponding to the METAR report """
         try:
@@ -344,7 +418,18 @@ class QuestionCollector:
 
 
     def generate_questions(self):
-        """  Generates questions for given METAR """
+        """  Generates questions for given METAR, writing them to the database together once every generator has run """
+        self.batching = True
+        try:
+            self.generate_all_questions()
+        finally:
+            self.batching = False
+        self.save_db_questions()
+        return list(self.questions.values())
+
+
+    def generate_all_questions(self):
+        """  Runs every question generator """
         self.generate_airport_question()
         self.generate_time_question()
         self.generate_wind_direction_question()
@@ -363,4 +448,3 @@ class QuestionCollector:
         self.generate_remarks_temperature_decimal_question()
         self.generate_remarks_dewpoint_decimal_question()
         self.generate_remarks_sea_level_pressure_question()
-        return list(self.questions.values())
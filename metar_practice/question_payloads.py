@@ -0,0 +1,82 @@
+from metar_practice.models import Question
+from metar_practice.models import QuestionPayload
+
+
+ANSWER_SEPARATOR = '\n'
+
+
+def build_question_payload(db_question, db_answers=None):
+    """  Builds unsaved QuestionPayload object from a question, its answers and its METAR's raw report column """
+    db_metar = db_question.metar
+    db_airport = db_metar.airport
+    if db_answers is None:
+        db_answers = db_question.answers.all()
+    return QuestionPayload(question=db_question,
+                           metar_raw=db_metar.raw,
+                           airport_name=db_airport.name,
+                           airport_city=db_airport.city,
+                           airport_country=db_airport.country,
+                           airport_icao=db_airport.icao,
+                           airport_latitude=db_airport.latitude,
+                           airport_longitude=db_airport.longitude,
+                           question_text=db_question.text,
+                           question_category=db_question.category,
+                           answers=ANSWER_SEPARATOR.join(db_answer.text for db_answer in db_answers))
+
+
+def get_question_payload(question_id):
+    """  Retrieves QuestionPayload object by primary key, building it for questions created before payloads existed """
+    db_payload = QuestionPayload.objects.filter(pk=question_id).first()
+    if db_payload is None:
+        db_question = Question.objects.select_related('metar__airport').defer('metar__metar_data').filter(pk=question_id).first()
+        if db_question is None:
+            return None
+        db_payload = build_question_payload(db_question)
+        QuestionPayload.objects.bulk_create([db_payload], ignore_conflicts=True)    # Another request may have built it first
+    return db_payload
+
+
+def payload_to_context(db_payload):
+    """  Splits QuestionPayload object into the airport, metar and question dictionaries used by the template """
+    airport = {'name': db_payload.airport_name,
+               'city': db_payload.airport_city,
+               'country': db_payload.airport_country,
+               'icao': db_payload.airport_icao,
+               'latitude': db_payload.airport_latitude,
+               'longitude': db_payload.airport_longitude}
+    metar = {'raw': db_payload.metar_raw}
+    answers = []
+    if db_payload.answers != '':
+        answers = [{'text': text} for text in db_payload.answers.split(ANSWER_SEPARATOR)]
+    question = {'id': db_payload.pk,
+                'text': db_payload.question_text,
+                'category': db_payload.question_category,
+                'answers': answers}
+    return airport, metar, question
+
+
+def rebuild_question_payloads(rebuild_all=False, batch_size=500, db_questions=None):
+    """  Builds payloads for questions missing one, or for every question if rebuild_all, and returns how many were written
+
+         Passing a db_questions queryset limits the rebuild to those questions, so callers that changed a few rows do not
+         scan the whole questions table. """
+    if db_questions is None:
+        db_questions = Question.objects.all()
+    if rebuild_all:
+        QuestionPayload.objects.filter(question__in=db_questions).delete()
+
+    rebuilt_count = 0
+    last_pk = 0
+    while True:
+        db_batch = list(db_questions.filter(pk__gt=last_pk, payload__isnull=True)
+                                    .select_related('metar__airport')
+                                    .defer('metar__metar_data')
+                                    .prefetch_related('answers')
+                                    .order_by('pk')[:batch_size])
+        if len(db_batch) == 0:
+            break
+        db_payloads = [build_question_payload(db_question) for db_question in db_batch]
+        QuestionPayload.objects.bulk_create(db_payloads, ignore_conflicts=True)
+        rebuilt_count += len(db_payloads)
+        last_pk = db_batch[-1].pk
+    return rebuilt_count
@@ -0,0 +1,158 @@
+from collections import deque
+
+from django.core.cache import caches
+from django.db import connection
+
+from metar_practice.models import Question
+from metar_practice.models import QuestionPayload
+
+from metar_practice.enums import QuestionType
+
+from metar_practice.question_sampler import QuestionSampler
+
+import random
+import threading
+import time
+
+
+POOL_SIZE = 64                          # Payloads held per category, bounds the memory of each worker's pool
+POOL_LOW_WATER = 16                     # A category is refilled once fewer payloads than this remain
+POOL_RUN_LENGTH = 4                     # Consecutive questions taken from each random position, short runs mix many METARs
+POOL_MAX_AGE = 60                       # Seconds a payload is served for, bounds staleness if an invalidation is missed
+POOL_GENERATION_CACHE = 'shared'        # Cache seen by every process, a per process cache would hide invalidations from web workers
+POOL_GENERATION_CACHE_KEY = 'metar_practice:question_pool_generation'
+
+
+def invalidate_question_pools():
+    """  Tells every worker's QuestionPool to drop its payloads, called after METARs are pruned """
+    cache = caches[POOL_GENERATION_CACHE]
+    try:
+        cache.incr(POOL_GENERATION_CACHE_KEY)
+    except ValueError as e:
+        cache.set(POOL_GENERATION_CACHE_KEY, 1, None)
+
+
+class QuestionPool:
+    """  Per worker ring buffers of ready to serve QuestionPayload objects, one per question category
+
+         Each buffer holds up to size payloads drawn in runs of run_length from many random positions in its category,
+         and is topped up on a background thread when it falls under low_water, so most page views choose a question
+         without touching the database. Payloads are served once and dropped after max_age seconds. Pruning METARs bumps a generation number
+         in the shared cache which empties the pool of every worker on the host. """
+
+    def __init__(self, size=POOL_SIZE, low_water=POOL_LOW_WATER, max_age=POOL_MAX_AGE, refill_async=True, rng=None, clock=time.monotonic,
+                 run_length=POOL_RUN_LENGTH):
+        self.size = size
+        self.low_water = low_water
+        self.run_length = run_length
+        self.max_age = max_age
+        self.refill_async = refill_async
+        self.rng = rng if rng is not None else random
+        self.clock = clock
+        self.question_sampler = QuestionSampler(self.rng)
+        self.buffers = {question_type.value: deque(maxlen=size) for question_type in QuestionType}
+        self.refilling = set()
+        self.generation = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+
+
+    def summary(self):
+        """  Returns hit and miss counts and how many payloads are ready """
+        return 'Question pool hits={0} misses={1} refills={2} ready={3}'.format(self.hits, self.misses, self.refills, len(self))
+
+
+    def check_generation(self):
+        """  Empties every buffer if METARs were pruned since the last check """
+        generation = caches[POOL_GENERATION_CACHE].get(POOL_GENERATION_CACHE_KEY, 0)
+        with self.lock:
+            if generation != self.generation:
+                for buffer in self.buffers.values():
+                    buffer.clear()
+                self.generation = generation
+
+
+    def get(self, unwanted_categories=None):
+        """  Returns a ready QuestionPayload from a category that is not unwanted where possible, or None if its buffer is empty """
+        self.check_generation()
+        category = self.question_sampler.choose_category(self.question_sampler.get_category_stats(), unwanted_categories or [])
+        if category is None:
+            return None
+
+        db_payload = None
+        expired = self.clock() - self.max_age
+        with self.lock:
+            buffer = self.buffers.setdefault(category, deque(maxlen=self.size))
+            while len(buffer) > 0 and db_payload is None:
+                loaded_at, db_payload = buffer.popleft()
+                if loaded_at < expired:
+                    db_payload = None
+            remaining = len(buffer)
+            if db_payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if remaining < self.low_water:
+            self.request_refill(category)
+        return db_payload
+
+
+    def request_refill(self, category):
+        """  Starts refilling a category unless a refill of it is already running """
+        with self.lock:
+            if category in self.refilling:
+                return
+            self.refilling.add(category)
+        if self.refill_async:
+            threading.Thread(target=self.refill, args=(category,), daemon=True).start()
+        else:
+            self.refill(category)
+
+
+    def refill(self, category):
+        """  Tops up a category's buffer in bulk, discarding the payloads if the pool was invalidated meanwhile """
+        try:
+            self.check_generation()
+            generation = self.generation
+            db_payloads = self.load(category, self.size - len(self.buffers[category]))
+            loaded_at = self.clock()
+            with self.lock:
+                if generation == self.generation:
+                    self.buffers[category].extend((loaded_at, db_payload) for db_payload in db_payloads)
+                    self.refills += 1
+        except Exception as e:
+            print(e)
+        finally:
+            with self.lock:
+                self.refilling.discard(category)
+            if self.refill_async:
+                connection.close()                          # Each refill thread opened its own connection
+
+
+    def load(self, category, count):
+        """  Retrieves up to count payloads of a category in short runs, each from its own random position in the id range, shuffled """
+        stats = self.question_sampler.get_category_stats().get(category)
+        if stats is None or count <= 0:
+            return []
+        question_count, lowest, highest = stats
+        question_ids = Question.objects.filter(category=category).values_list('pk', flat=True)
+        picked_ids = []
+        while len(picked_ids) < count:
+            run_length = min(self.run_length, count - len(picked_ids))
+            unpicked_ids = question_ids.exclude(pk__in=picked_ids)
+            pivot = self.rng.randint(lowest, highest)
+            run_ids = list(unpicked_ids.filter(pk__gte=pivot).order_by('pk')[:run_length])
+            if len(run_ids) < run_length:
+                run_ids += list(unpicked_ids.filter(pk__lt=pivot).order_by('pk')[:run_length - len(run_ids)])    # Wrap around to the start
+            if len(run_ids) == 0:
+                break                                       # Every question of the category is picked
+            picked_ids += run_ids
+        db_payloads = list(QuestionPayload.objects.filter(pk__in=picked_ids))
+        self.rng.shuffle(db_payloads)
+        return db_payloads
+
+
+    def __len__(self):
+        return sum(len(buffer) for buffer in self.buffers.values())
@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models import Max
+from django.db.models import Min
+
+from metar_practice.models import Question
+
+import random
+
+
+CATEGORY_STATS_CACHE_KEY = 'metar_practice:question_category_stats'
+CATEGORY_STATS_CACHE_TIMEOUT = 60
+
+
+class QuestionSampler:
+    """  Picks random questions without sorting the table with ORDER BY RANDOM()
+
+         A category is drawn first, weighted by how many questions it holds and skipping unwanted categories, then a
+         random key is sampled between the lowest and highest ids of that category and the first question at or after
+         it is taken using the category index. Gaps left by deleted questions slightly favour the question after the gap.
+         Category stats are cached so a pick costs at most three queries: stats, seek and a wrap around seek. If the
+         cached stats point at an emptied category they are refreshed once, bounding a pick at six queries. """
+
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random
+
+
+    def get_category_stats(self):
+        """  Retrieves question count and lowest/highest id for each category, using the cache where possible """
+        category_stats = cache.get(CATEGORY_STATS_CACHE_KEY)
+        if category_stats is None:
+            category_stats = {}
+            for row in Question.objects.values('category').annotate(count=Count('pk'), lowest=Min('pk'), highest=Max('pk')).order_by():
+                category_stats[row['category']] = (row['count'], row['lowest'], row['highest'])
+            cache.set(CATEGORY_STATS_CACHE_KEY, category_stats, CATEGORY_STATS_CACHE_TIMEOUT)
+        return category_stats
+
+
+    def choose_category(self, category_stats, unwanted_categories):
+        """  Picks category weighted by question count, falling back to every category if all are unwanted """
+        categories = [category for category, stats in category_stats.items() if stats[0] > 0 and category not in unwanted_categories]
+        if len(categories) == 0:
+            categories = [category for category, stats in category_stats.items() if stats[0] > 0]
+        if len(categories) == 0:
+            return None
+        return self.rng.choices(categories, weights=[category_stats[category][0] for category in categories])[0]
+
+
+    def get_random_question_id(self, unwanted_categories=None):
+        """  Retrieves random Question primary key from a category that is not unwanted where possible """
+        for attempt in range(0, 2):
+            category_stats = self.get_category_stats()
+            category = self.choose_category(category_stats, unwanted_categories or [])
+            if category is None:
+                return None
+
+            count, lowest, highest = category_stats[category]
+            pivot = self.rng.randint(lowest, highest)
+            question_ids = Question.objects.filter(category=category).values_list('pk', flat=True)
+            question_id = question_ids.filter(pk__gte=pivot).order_by('pk').first()
+            if question_id is None:
+                question_id = question_ids.filter(pk__lt=pivot).order_by('-pk').first()    # Cached highest id was deleted
+            if question_id is not None:
+                return question_id
+            cache.delete(CATEGORY_STATS_CACHE_KEY)                                          # Cached category has been emptied
+        return None
+
+
+    def get_random_question_id_for_airports(self, db_airports, unwanted_categories=None):
+        """  Retrieves random Question primary key asked about one of the given airports, from a category that is not unwanted where possible
+
+             db_airports is used as a subquery so large selections bind no parameters. Questions of the area are counted per
+             category, a category is drawn weighted by those counts and a random offset is taken within it, so the pick is
+             uniform over the area's questions however their ids are spread through the table. """
+        question_ids = Question.objects.filter(metar__airport__in=db_airports).values_list('pk', flat=True)
+        area_stats = {row['category']: (row['count'],) for row in question_ids.values('category').annotate(count=Count('pk')).order_by()}
+        category = self.choose_category(area_stats, unwanted_categories or [])
+        if category is None:
+            return None
+        return question_ids.filter(category=category).order_by('pk')[self.rng.randrange(area_stats[category][0])]
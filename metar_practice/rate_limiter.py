@@ -0,0 +1,31 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """  Thread safe token bucket allowing bursts of up to capacity calls and rate calls per second on average """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+
+    def acquire(self):
+        """  Blocks until a token is available, takes it and returns the seconds spent waiting """
+        waited = 0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+            waited += wait
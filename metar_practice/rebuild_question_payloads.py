@@ -0,0 +1,19 @@
+import django
+import os
+import sys
+
+sys.path.append('..')
+os.environ['DJANGO_SETTINGS_MODULE'] = 'rhodrithomasmorgan.settings'
+django.setup()
+
+from metar_practice.question_payloads import rebuild_question_payloads
+
+
+def main(rebuild_all=False):
+    """ Writes question payloads for existing questions, pass --all to rebuild payloads that already exist """
+    rebuilt_count = rebuild_question_payloads(rebuild_all=rebuild_all)
+    print('Rebuilt {0} question payloads.'.format(rebuilt_count))
+
+
+if __name__ == '__main__':
+    main(rebuild_all='--all' in sys.argv[1:])
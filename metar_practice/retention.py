@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Window
+from django.db.models.functions import RowNumber
+
+from metar_practice.models import Metar
+from metar_practice.models import Question
+
+from metar_practice.question_pool import invalidate_question_pools
+
+from metar_practice import counters
+
+import time
+
+
+OLDEST_FIRST = 'oldest'
+BUSIEST_AIRPORT_FIRST = 'busiest_airport'
+RANDOM = 'random'
+RETENTION_BATCH_SIZE = 500
+
+
+class RetentionReport:
+    """  Records what a retention run evicted and how quickly """
+
+    def __init__(self):
+        self.metars = 0
+        self.questions = 0
+        self.seconds = 0
+
+
+    def summary(self):
+        """  Returns evicted row counts and eviction throughput """
+        rate = 0
+        if self.seconds > 0:
+            rate = (self.metars + self.questions) / self.seconds
+        return 'Evicted {0} METARs and {1} questions in {2:.2f}s ({3:.0f} rows/s)'.format(self.metars,
+                                                                                         self.questions,
+                                                                                         self.seconds,
+                                                                                         rate)
+
+
+class RetentionEngine:
+    """  Keeps the question table under a limit by evicting whole METARs in the order given by a retention policy """
+
+    def __init__(self, question_limit, policy=OLDEST_FIRST, batch_size=RETENTION_BATCH_SIZE):
+        if policy not in (OLDEST_FIRST, BUSIEST_AIRPORT_FIRST, RANDOM):
+            raise ValueError('Unknown retention policy {0}'.format(policy))
+        self.question_limit = question_limit
+        self.policy = policy
+        self.batch_size = batch_size
+
+
+    def get_eviction_order(self):
+        """  Returns (metar id, question count) rows in the order METARs should be evicted """
+        db_metars = Metar.objects.values('pk').annotate(question_count=Count('question'))
+        if self.policy == OLDEST_FIRST:
+            db_metars = db_metars.order_by('pk')
+        elif self.policy == BUSIEST_AIRPORT_FIRST:
+            db_metars = db_metars.annotate(airport_rank=Window(RowNumber(),
+                                                               partition_by=[F('airport_id')],
+                                                               order_by=F('pk').desc())).order_by('-airport_rank', 'pk')
+        else:
+            db_metars = db_metars.order_by('?')
+        return db_metars.values_list('pk', 'question_count')
+
+
+    def get_eviction_set(self):
+        """  Returns ids of the METARs to evict and how many questions they hold, computed in a single query """
+        excess = Question.objects.count() - self.question_limit
+        metar_ids = []
+        question_count = 0
+        if excess <= 0:
+            return metar_ids, question_count
+        for metar_id, metar_question_count in self.get_eviction_order().iterator():
+            metar_ids.append(metar_id)
+            question_count += metar_question_count
+            if question_count >= excess:
+                break
+        return metar_ids, question_count
+
+
+    def evict(self):
+        """  Deletes the eviction set in batched transactions and returns a RetentionReport """
+        report = RetentionReport()
+        start = time.perf_counter()
+        metar_ids, question_count = self.get_eviction_set()
+        with counters.deferred():
+            for i in range(0, len(metar_ids), self.batch_size):
+                batch = metar_ids[i:i + self.batch_size]
+                with transaction.atomic():
+                    category_counts = Question.objects.filter(metar_id__in=batch).values_list('category').annotate(count=Count('pk')).order_by()
+                    deltas = {counters.category_counter(category): -count for category, count in category_counts}
+                    deleted = Metar.objects.filter(pk__in=batch).delete()[1]
+                report.metars += deleted.get(Metar._meta.label, 0)
+                report.questions += deleted.get(Question._meta.label, 0)
+                deltas[counters.QUESTIONS_COUNTER] = -deleted.get(Question._meta.label, 0)
+                counters.add(deltas)                        # Questions have no delete signal so they can be deleted in bulk
+        if report.metars > 0:
+            invalidate_question_pools()
+        report.seconds = time.perf_counter() - start
+        return report
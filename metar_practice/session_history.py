@@ -0,0 +1,35 @@
+from metar_practice.enums import QuestionType
+
+
+HISTORY_SESSION_KEY = 'history'
+CATEGORIES = [question_type.value for question_type in QuestionType]
+CATEGORY_INDEXES = {category: i for i, category in enumerate(CATEGORIES)}
+CATEGORY_BITS = 5                       # Low bits of a history entry holding the category index, room for 32 categories
+
+
+def pack_question(question_id, category):
+    """  Packs a question id and its category into one int so a session history entry costs a few bytes """
+    return question_id << CATEGORY_BITS | CATEGORY_INDEXES[category]
+
+
+def unpack_question(entry):
+    """  Returns (question id, category) of a packed history entry """
+    return entry >> CATEGORY_BITS, CATEGORIES[entry & ((1 << CATEGORY_BITS) - 1)]
+
+
+def get_history(session):
+    """  Returns (question id, category) of questions recently shown in a session, oldest first, skipping unreadable entries """
+    history = []
+    for entry in session.get(HISTORY_SESSION_KEY, []):
+        try:
+            history.append(unpack_question(entry))
+        except (TypeError, IndexError) as e:
+            print(e)
+    return history
+
+
+def add_to_history(session, question_id, category, limit):
+    """  Appends a question to the session history keeping only the newest limit entries """
+    history = [pack_question(*question) for question in get_history(session)]
+    history.append(pack_question(question_id, category))
+    session[HISTORY_SESSION_KEY] = history[-limit:]
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from metar_practice.models import Airport
+from metar_practice.models import Question
+
+from metar_practice import counters
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, **kwargs):
+    """  Counts newly created questions """
+    if created:
+        counters.add({counters.QUESTIONS_COUNTER: 1, counters.category_counter(instance.category): 1})
+
+
+@receiver(post_save, sender=Airport)
+def airport_saved(sender, instance, created, **kwargs):
+    """  Counts newly created airports """
+    if created:
+        counters.add({counters.AIRPORTS_COUNTER: 1})
+
+
+@receiver(post_delete, sender=Airport)
+def airport_deleted(sender, instance, **kwargs):
+    """  Uncounts deleted airports, retired airports were uncounted when they were retired """
+    if not instance.retired:
+        counters.add({counters.AIRPORTS_COUNTER: -1})
@@ -0,0 +1,80 @@
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import json
+import threading
+
+
+class AvwxStubServer:
+    """  Local HTTP server answering AVWX single and multi station METAR requests from canned reports """
+
+    def __init__(self, reports, invalid_icaos=(), failures=0):
+        self.reports = reports
+        self.invalid_icaos = set(invalid_icaos)
+        self.failures = failures
+        self.paths = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.build_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+
+
+    @property
+    def api_url(self):
+        return 'http://127.0.0.1:{0}/api'.format(self.server.server_address[1])
+
+
+    def start(self):
+        self.thread.start()
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+    def respond(self, path):
+        """  Returns status code and body AVWX would send for path """
+        self.paths.append(path)
+        if self.failures > 0:
+            self.failures -= 1
+            return 503, json.dumps({'error': 'Service unavailable'})
+        parts = urlparse(path).path.strip('/').split('/')
+        if parts[:2] == ['api', 'multi'] and len(parts) == 4 and parts[2] == 'metar':
+            icaos = parts[3].split(',')
+        elif parts[:2] == ['api', 'metar'] and len(parts) == 3:
+            icaos = [parts[2]]
+        else:
+            return 404, json.dumps({'error': 'Not found'})
+
+        for icao in icaos:
+            if icao in self.invalid_icaos:
+                return 400, json.dumps({'error': '{0} is not a valid ICAO or IATA code'.format(icao)})
+        if len(icaos) == 1 and parts[1] == 'metar':
+            if icaos[0] not in self.reports:
+                return 204, ''
+            return 200, json.dumps(self.reports[icaos[0]])
+        return 200, json.dumps([self.reports[icao] for icao in icaos if icao in self.reports])
+
+
+    def build_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'                   # Keep connections alive like AVWX does
+
+            def do_GET(self):
+                status_code, body = stub.respond(self.path)
+                body = body.encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,110 @@
+from django.test import TestCase
+
+from metar_practice.airport_geo import get_distance_km
+from metar_practice.airport_geo import get_radius_box
+from metar_practice.airport_geo import get_box_airports
+from metar_practice.airport_geo import get_radius_airports
+from metar_practice.airport_geo import get_nearest_airports
+from metar_practice.airport_geo import get_selected_airports
+
+from metar_practice.models import Airport
+
+
+class TestAirportGeo(TestCase):
+
+    def setUp(self):
+        self.db_airports = {}
+        for icao, latitude, longitude in [('KJFK', '40.63980103', '-73.77890015'),
+                                          ('KLGA', '40.77719879', '-73.87259674'),
+                                          ('EGLL', '51.4706', '-0.461941'),
+                                          ('EGKK', '51.14810181', '-0.190277994'),
+                                          ('NZWN', '-41.32720184', '174.8049927'),
+                                          ('NFFN', '-17.75539970', '177.4429932'),
+                                          ('NSFA', '-13.82999992', '-172.0079956')]:
+            db_airport = Airport(name=icao, city=icao, country=icao, icao=icao, latitude=latitude, longitude=longitude)
+            db_airport.full_clean()
+            db_airport.save()
+            self.db_airports[icao] = db_airport
+
+
+    def helper_icaos(self, db_airports):
+        return sorted(db_airport.icao for db_airport in db_airports)
+
+
+    def test_save_sets_degrees(self):
+        self.assertEquals(self.db_airports['KJFK'].latitude_deg, 40.63980103)
+        self.assertEquals(self.db_airports['KJFK'].longitude_deg, -73.77890015)
+
+
+    def test_get_degrees_invalid(self):
+        self.assertIsNone(Airport.get_degrees('north', 90))
+        self.assertIsNone(Airport.get_degrees('91', 90))
+        self.assertEquals(Airport.get_degrees('-180', 180), -180)
+
+
+    def test_get_distance_km(self):
+        self.assertAlmostEqual(get_distance_km(40.63980103, -73.77890015, 51.4706, -0.461941), 5540, delta=5)
+        self.assertEquals(get_distance_km(51.4706, -0.461941, 51.4706, -0.461941), 0)
+
+
+    def test_get_radius_box_pole(self):
+        self.assertEquals(get_radius_box(89, 0, 500), (89 - 500 / 6371.0 * 57.29577951308232, -180, 90, 180))
+
+
+    def test_get_radius_box_antimeridian(self):
+        south, west, north, east = get_radius_box(-17.7554, 177.443, 1000)
+        self.assertGreater(west, east)
+
+
+    def test_get_box_airports(self):
+        self.assertEquals(self.helper_icaos(get_box_airports(50, -1, 52, 0)), ['EGKK', 'EGLL'])
+
+
+    def test_get_box_airports_antimeridian(self):
+        self.assertEquals(self.helper_icaos(get_box_airports(-45, 170, -10, -170)), ['NFFN', 'NSFA', 'NZWN'])
+
+
+    def test_get_box_airports_retired(self):
+        Airport.objects.filter(icao='EGKK').update(retired=True)
+        self.assertEquals(self.helper_icaos(get_box_airports(50, -1, 52, 0)), ['EGLL'])
+
+
+    def test_get_radius_airports(self):
+        distances = get_radius_airports(40.7, -73.8, 50)
+        self.assertEquals([db_airport.icao for distance, db_airport in distances], ['KJFK', 'KLGA'])
+
+
+    def test_get_radius_airports_antimeridian(self):
+        distances = get_radius_airports(-17.7554, 177.443, 1500)
+        self.assertEquals([db_airport.icao for distance, db_airport in distances], ['NFFN', 'NSFA'])
+
+
+    def test_get_nearest_airports(self):
+        distances = get_nearest_airports(51.5, -0.1, count=3)
+        self.assertEquals([db_airport.icao for distance, db_airport in distances], ['EGLL', 'EGKK', 'KLGA'])
+
+
+    def test_get_nearest_airports_max_distance(self):
+        distances = get_nearest_airports(51.5, -0.1, count=3, max_distance_km=1000)
+        self.assertEquals([db_airport.icao for distance, db_airport in distances], ['EGLL', 'EGKK'])
+
+
+    def test_get_selected_airports_near(self):
+        db_airports = get_selected_airports({'near': '51.5,-0.1', 'radius': '100'})
+        self.assertEquals(sorted(db_airports.values_list('pk', flat=True)), sorted([self.db_airports['EGLL'].pk, self.db_airports['EGKK'].pk]))
+
+
+    def test_get_selected_airports_near_matches_radius_airports(self):
+        expected = sorted(db_airport.pk for distance, db_airport in get_radius_airports(40.7, -73.9, 20))
+        self.assertEquals(sorted(get_selected_airports({'near': '40.7,-73.9', 'radius': '20'}).values_list('pk', flat=True)), expected)
+
+
+    def test_get_selected_airports_box(self):
+        db_airports = get_selected_airports({'box': '40,-75,41,-73'})
+        self.assertEquals(sorted(db_airports.values_list('pk', flat=True)), sorted([self.db_airports['KJFK'].pk, self.db_airports['KLGA'].pk]))
+
+
+    def test_get_selected_airports_invalid(self):
+        self.assertIsNone(get_selected_airports({}))
+        self.assertIsNone(get_selected_airports({'near': 'London'}))
+        self.assertIsNone(get_selected_airports({'box': '1,2,3'}))
@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+
+from metar_practice.answer_cache import AnswerCache
+
+
+class TestAnswerCache(SimpleTestCase):
+
+    def test_get_missing(self):
+        answer_cache = AnswerCache()
+        self.assertIsNone(answer_cache.get('KJFK'))
+        self.assertEquals(answer_cache.misses, 1)
+
+
+    def test_put_get(self):
+        answer_cache = AnswerCache()
+        answer_cache.put('KJFK', 1)
+        self.assertEquals(answer_cache.get('KJFK'), 1)
+        self.assertEquals(answer_cache.hits, 1)
+
+
+    def test_evicts_least_recently_used(self):
+        answer_cache = AnswerCache(maxsize=2)
+        answer_cache.put('KJFK', 1)
+        answer_cache.put('EGLL', 2)
+        answer_cache.get('KJFK')
+        answer_cache.put('KLAX', 3)
+        self.assertEquals(len(answer_cache), 2)
+        self.assertIsNone(answer_cache.get('EGLL'))
+        self.assertEquals(answer_cache.get('KJFK'), 1)
+        self.assertEquals(answer_cache.get('KLAX'), 3)
+
+
+    def test_clear(self):
+        answer_cache = AnswerCache()
+        answer_cache.put('KJFK', 1)
+        answer_cache.clear()
+        self.assertEquals(len(answer_cache), 0)
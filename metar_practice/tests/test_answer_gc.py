@@ -0,0 +1,140 @@
+from django.test import TestCase
+import mock
+
+from metar_practice.answer_gc import collect_orphan_answers
+from metar_practice.answer_gc import get_orphan_answers
+from metar_practice.answer_gc import AnswerGCReport
+from metar_practice.answer_gc import ANSWER_GC_CURSOR
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Answer
+from metar_practice.models import Question
+from metar_practice.models import Counter
+from metar_practice.models import JobCursor
+
+from metar_practice.enums import QuestionType
+
+import json
+
+
+class TestAnswerGC(TestCase):
+
+    def setUp(self):
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao='KJFK',
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        self.db_metar = Metar(metar_json=json.dumps({'raw': 'KJFK 031551Z'}),
+                              airport=db_airport)
+        self.db_metar.full_clean()
+        self.db_metar.save()
+        self.db_question = Question(metar=self.db_metar,
+                                    text='What is the airport ICAO?',
+                                    category=QuestionType.AIRPORT.value)
+        self.db_question.full_clean()
+        self.db_question.save()
+
+
+    def helper_create_db_answers(self, count, linked=False):
+        db_answers = []
+        for i in range(0, count):
+            db_answer = Answer(text='Answer {0} {1}'.format(linked, i))
+            db_answer.full_clean()
+            db_answer.save()
+            if linked:
+                self.db_question.answers.add(db_answer)
+            db_answers.append(db_answer)
+        return db_answers
+
+
+    def helper_get_cursor(self):
+        return JobCursor.objects.get(name=ANSWER_GC_CURSOR).value
+
+
+    def test_get_orphan_answers(self):
+        self.helper_create_db_answers(2, linked=True)
+        db_orphans = self.helper_create_db_answers(3)
+        with self.assertNumQueries(1):
+            self.assertEquals(list(get_orphan_answers().order_by('pk')), db_orphans)
+
+
+    def test_collect_orphan_answers(self):
+        db_linked = self.helper_create_db_answers(2, linked=True)
+        self.helper_create_db_answers(5)
+        report = collect_orphan_answers(chunk_size=2)
+        self.assertEquals(report.deleted, 5)
+        self.assertTrue(report.finished)
+        self.assertEquals(list(Answer.objects.order_by('pk')), db_linked)
+        self.assertEquals(self.helper_get_cursor(), 0)
+
+
+    @mock.patch('metar_practice.answer_gc.time.perf_counter')
+    def test_collect_orphan_answers_cursor_not_counter(self, mock_perf_counter):
+        self.helper_create_db_answers(5)
+        mock_perf_counter.side_effect = [0, 0, 10, 10]
+        collect_orphan_answers(chunk_size=2, time_limit=5)
+        self.assertFalse(Counter.objects.filter(name=ANSWER_GC_CURSOR).exists())
+
+
+    def test_collect_orphan_answers_after_question_deleted(self):
+        self.helper_create_db_answers(3, linked=True)
+        self.db_metar.delete()
+        self.assertEquals(collect_orphan_answers().deleted, 3)
+        self.assertEquals(len(Answer.objects.all()), 0)
+
+
+    def test_collect_orphan_answers_nothing(self):
+        self.helper_create_db_answers(2, linked=True)
+        report = collect_orphan_answers()
+        self.assertEquals(report.deleted, 0)
+        self.assertTrue(report.finished)
+
+
+    @mock.patch('metar_practice.answer_gc.time.perf_counter')
+    def test_collect_orphan_answers_time_limit(self, mock_perf_counter):
+        db_orphans = self.helper_create_db_answers(5)
+        mock_perf_counter.side_effect = [0, 0, 10, 10]
+        report = collect_orphan_answers(chunk_size=2, time_limit=5)
+        self.assertEquals(report.deleted, 2)
+        self.assertFalse(report.finished)
+        self.assertEquals(self.helper_get_cursor(), db_orphans[1].pk)
+        self.assertEquals(list(Answer.objects.order_by('pk')), db_orphans[2:])
+
+
+    def test_collect_orphan_answers_resumes(self):
+        db_orphans = self.helper_create_db_answers(4)
+        JobCursor.objects.create(name=ANSWER_GC_CURSOR, value=db_orphans[1].pk)
+        report = collect_orphan_answers()
+        self.assertEquals(report.deleted, 2)
+        self.assertEquals(list(Answer.objects.order_by('pk')), db_orphans[:2])
+        self.assertEquals(collect_orphan_answers().deleted, 2)
+
+
+    @mock.patch('metar_practice.answer_gc.get_orphan_answers')
+    def test_collect_orphan_answers_relinked(self, mock_get_orphan_answers):
+        db_answer = self.helper_create_db_answers(1)[0]
+        mock_get_orphan_answers.side_effect = [Answer.objects.all(), get_orphan_answers(), Answer.objects.none()]
+        self.db_question.answers.add(db_answer)
+        self.assertEquals(collect_orphan_answers().deleted, 0)
+        self.assertTrue(Answer.objects.filter(pk=db_answer.pk).exists())
+
+
+class TestAnswerGCReport(TestCase):
+
+    def test_summary(self):
+        report = AnswerGCReport()
+        report.deleted = 10
+        report.cursor = 42
+        report.seconds = 1.5
+        self.assertEquals(report.summary(), 'Deleted 10 orphan answers in 1.50s, paused after answer 42')
+
+
+    def test_summary_finished(self):
+        report = AnswerGCReport()
+        report.finished = True
+        self.assertEquals(report.summary(), 'Deleted 0 orphan answers in 0.00s, finished')
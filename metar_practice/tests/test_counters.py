@@ -0,0 +1,166 @@
+from django.test import TestCase
+from django.core.cache import cache
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Question
+from metar_practice.models import Counter
+
+from metar_practice.enums import QuestionType
+
+from metar_practice import counters
+
+import os
+import json
+
+
+class TestCounters(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.db_airport = Airport(name='John F Kennedy International Airport',
+                                  city='New York',
+                                  country='United States',
+                                  icao='KJFK',
+                                  latitude='40.63980103',
+                                  longitude='-73.77890015')
+        self.db_airport.full_clean()
+        self.db_airport.save()
+        metar_path = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'question_collector', 'sample_metar.json')
+        with open(metar_path) as f:
+            metar_json = json.load(f)
+        self.db_metar = Metar(metar_json=json.dumps(metar_json),
+                              airport=self.db_airport)
+        self.db_metar.full_clean()
+        self.db_metar.save()
+
+
+    def helper_create_db_question(self, category):
+        db_question = Question(metar=self.db_metar,
+                               text='This is test question string {0}'.format(Question.objects.count()),
+                               category=category.value)
+        db_question.full_clean()
+        db_question.save()
+        return db_question
+
+
+    def helper_get_counter(self, name):
+        return Counter.objects.get(name=name).value
+
+
+    def test_category_counter(self):
+        self.assertEquals(counters.category_counter(QuestionType.AIRPORT.value), 'questions:AIRPORT')
+
+
+    def test_question_created(self):
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        self.helper_create_db_question(QuestionType.TIME)
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 3)
+        self.assertEquals(self.helper_get_counter(counters.category_counter(QuestionType.AIRPORT.value)), 2)
+        self.assertEquals(self.helper_get_counter(counters.category_counter(QuestionType.TIME.value)), 1)
+        self.assertEquals(self.helper_get_counter(counters.category_counter(QuestionType.WIND_SPEED.value)), 0)
+
+
+    def test_question_updated(self):
+        db_question = self.helper_create_db_question(QuestionType.AIRPORT)
+        db_question.text = 'This is an updated test question string'
+        db_question.save()
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 1)
+
+
+    def test_question_deleted(self):
+        db_question = self.helper_create_db_question(QuestionType.AIRPORT)
+        self.helper_create_db_question(QuestionType.TIME)
+        db_question.delete()
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 2)     # Corrected by the next reconcile
+        counters.reconcile()
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 1)
+        self.assertEquals(self.helper_get_counter(counters.category_counter(QuestionType.AIRPORT.value)), 0)
+
+
+    def test_question_deleted_cascade(self):
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        self.helper_create_db_question(QuestionType.TIME)
+        self.db_metar.delete()
+        self.assertEquals(counters.reconcile()[1], {counters.QUESTIONS_COUNTER: -2,
+                                                    counters.category_counter(QuestionType.AIRPORT.value): -1,
+                                                    counters.category_counter(QuestionType.TIME.value): -1})
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 0)
+
+
+    def test_airport_created_deleted(self):
+        self.assertEquals(self.helper_get_counter(counters.AIRPORTS_COUNTER), 1)
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        self.db_airport.delete()
+        self.assertEquals(self.helper_get_counter(counters.AIRPORTS_COUNTER), 0)
+
+
+    def test_deferred(self):
+        with counters.deferred():
+            for i in range(0, 5):
+                self.helper_create_db_question(QuestionType.AIRPORT)
+            self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 0)
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 5)
+        self.assertEquals(self.helper_get_counter(counters.category_counter(QuestionType.AIRPORT.value)), 5)
+
+
+    def test_deferred_single_write(self):
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        db_questions = [self.helper_create_db_question(QuestionType.AIRPORT) for i in range(0, 5)]
+        with counters.deferred():
+            with self.assertNumQueries(0):
+                for db_question in db_questions:
+                    counters.add({counters.QUESTIONS_COUNTER: -1})
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 1)
+
+
+    def test_deferred_nested(self):
+        with counters.deferred():
+            with counters.deferred():
+                self.helper_create_db_question(QuestionType.AIRPORT)
+            self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 0)
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 1)
+
+
+    def test_get_counts(self):
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        counts = counters.get_counts()
+        self.assertEquals(counts[counters.QUESTIONS_COUNTER], 1)
+        self.assertEquals(counts[counters.AIRPORTS_COUNTER], 1)
+        with self.assertNumQueries(0):
+            self.assertEquals(counters.get_counts(), counts)
+
+
+    def test_get_counts_invalidated(self):
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        counters.get_counts()
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        self.assertEquals(counters.get_counts()[counters.QUESTIONS_COUNTER], 2)
+
+
+    def test_get_counts_empty(self):
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        Counter.objects.all().delete()
+        counts = counters.get_counts()
+        self.assertEquals(counts[counters.QUESTIONS_COUNTER], 1)
+        self.assertEquals(counts[counters.AIRPORTS_COUNTER], 1)
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 1)
+
+
+    def test_reconcile(self):
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        self.helper_create_db_question(QuestionType.TIME)
+        Counter.objects.filter(name=counters.QUESTIONS_COUNTER).update(value=10)
+        Counter.objects.filter(name=counters.category_counter(QuestionType.TIME.value)).delete()
+        counts, drift = counters.reconcile()
+        self.assertEquals(counts[counters.QUESTIONS_COUNTER], 2)
+        self.assertEquals(drift, {counters.QUESTIONS_COUNTER: -8, counters.category_counter(QuestionType.TIME.value): 1})
+        self.assertEquals(self.helper_get_counter(counters.QUESTIONS_COUNTER), 2)
+        self.assertEquals(self.helper_get_counter(counters.category_counter(QuestionType.TIME.value)), 1)
+
+
+    def test_reconcile_no_drift(self):
+        self.helper_create_db_question(QuestionType.AIRPORT)
+        counts, drift = counters.reconcile()
+        self.assertEquals(drift, {})
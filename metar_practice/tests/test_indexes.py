@@ -0,0 +1,82 @@
+from django.db import IntegrityError
+from django.db import transaction
+from django.test import TestCase
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Answer
+from metar_practice.models import Question
+
+from metar_practice.enums import QuestionType
+
+
+class TestQueryPlans(TestCase):
+
+    def assert_uses_index(self, queryset):
+        plan = queryset.explain()
+        self.assertIn('SEARCH', plan)
+        self.assertIn('INDEX', plan)
+        self.assertNotIn('SCAN', plan)
+
+
+    def test_airport_icao(self):
+        self.assert_uses_index(Airport.objects.filter(icao='KJFK'))
+
+
+    def test_airport_position(self):
+        self.assert_uses_index(Airport.objects.filter(latitude_deg__gte=50, latitude_deg__lte=52, longitude_deg__gte=-1, longitude_deg__lte=0))
+
+
+    def test_answer_text(self):
+        self.assert_uses_index(Answer.objects.filter(text__in=['KJFK', '1551 ZULU']).values_list('text', 'pk'))
+
+
+    def test_metar_airport_digest(self):
+        self.assert_uses_index(Metar.objects.filter(airport_id=1, digest=Metar.get_digest('{}')).order_by('pk')[:1])
+
+
+    def test_metar_flight_rules(self):
+        self.assert_uses_index(Metar.objects.filter(flight_rules='IFR').values_list('pk'))
+
+
+    def test_question_metar_text(self):
+        self.assert_uses_index(Question.objects.filter(metar_id=1, text__in=['What is the airport ICAO?']).values_list('text', 'category', 'pk'))
+
+
+    def test_question_category(self):
+        self.assert_uses_index(Question.objects.filter(category=QuestionType.AIRPORT.value, pk__gte=1).values_list('pk').order_by('pk'))
+
+
+class TestUniqueConstraints(TestCase):
+
+    def setUp(self):
+        self.db_airport = Airport.objects.create(name='John F Kennedy International Airport',
+                                                 city='New York',
+                                                 country='United States',
+                                                 icao='KJFK',
+                                                 latitude='40.63980103',
+                                                 longitude='-73.77890015')
+        self.db_metar = Metar.objects.create(metar_json='{}', airport=self.db_airport)
+
+
+    def test_airport_icao_unique(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Airport.objects.create(name='Duplicate', city='Duplicate', country='Duplicate', icao='KJFK', latitude='0', longitude='0')
+
+
+    def test_answer_text_unique(self):
+        Answer.objects.create(text='KJFK')
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Answer.objects.create(text='KJFK')
+
+
+    def test_question_unique_per_metar(self):
+        Question.objects.create(metar=self.db_metar, text='What is the airport ICAO?', category=QuestionType.AIRPORT.value)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Question.objects.create(metar=self.db_metar, text='What is the airport ICAO?', category=QuestionType.AIRPORT.value)
+        db_metar = Metar.objects.create(metar_json='{}', airport=self.db_airport)
+        Question.objects.create(metar=db_metar, text='What is the airport ICAO?', category=QuestionType.AIRPORT.value)
+        self.assertEquals(len(Question.objects.all()), 2)
@@ -4,8 +4,18 @@ from django.test import TestCase
 from metar_practice.load_airports import LoadAirports
 
 from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Question
+from metar_practice.models import QuestionPayload
+
+from metar_practice.question_payloads import build_question_payload
+
+from metar_practice.enums import QuestionType
+
+from metar_practice import counters
 
 import os
+import tempfile
 
 
 class TestIsValid(TestCase):
@@ -162,9 +172,11 @@ class TestLoadAirports(TestCase):
     def test_load_airports(self, mock_os, mock_load_airports_is_valid):
         mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
         mock_load_airports_is_valid.return_value = True
-        self.load_airports.main()
-        self.assertEquals(len(Airport.objects.all()), len(self.sample_airport_icaos))
+        report = self.load_airports.main()
+        self.assertEquals(len(Airport.objects.all()), len(self.sample_airport_icaos) + len(self.fictional_airports))
         self.assert_contains_airports()
+        self.assertEquals((report.inserted, report.updated, report.unchanged), (len(self.sample_airport_icaos), 0, 0))
+        self.assertEquals(report.retired, len(self.fictional_airports))
 
 
     @mock.patch('metar_practice.load_airports.LoadAirports.is_valid', return_value=True)
@@ -172,9 +184,113 @@ class TestLoadAirports(TestCase):
     def test_load_airports_duplicates(self, mock_os, mock_load_airports_is_valid):
         mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports_duplicates.csv')
         mock_load_airports_is_valid.return_value = True
+        report = self.load_airports.main()
+        self.assertEquals(len(Airport.objects.all()), len(self.sample_airport_icaos) + len(self.fictional_airports))
+        self.assert_contains_airports()
+        self.assertEquals(report.inserted, len(self.sample_airport_icaos))
+
+
+    @mock.patch('metar_practice.load_airports.os')
+    def test_load_airports_batches(self, mock_os):
+        mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
+        self.load_airports.batch_size = 2
+        with self.assertNumQueries(17):
+            report = self.load_airports.main()
+        self.assertEquals(report.inserted, len(self.sample_airport_icaos))
+
+
+    def helper_write_csv(self, replacements):
+        sample_path = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
+        with open(sample_path, encoding='utf8') as f:
+            data = f.read()
+        for old, new in replacements:
+            data = data.replace(old, new)
+        f = tempfile.NamedTemporaryFile(mode='w', suffix='.csv', encoding='utf8', delete=False)
+        f.write(data)
+        f.close()
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+
+    @mock.patch('metar_practice.load_airports.os')
+    def test_load_airports_reload(self, mock_os):
+        mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
+        self.load_airports.main()
+        mock_os.path.join.return_value = self.helper_write_csv([('London Heathrow Airport', 'Heathrow Airport')])
+        with self.assertNumQueries(6):
+            report = self.load_airports.main()
+        self.assertEquals((report.inserted, report.updated, report.unchanged), (0, 1, len(self.sample_airport_icaos) - 1))
+        self.assertEquals(Airport.objects.get(icao='EGLL').name, 'Heathrow Airport')
+
+
+    @mock.patch('metar_practice.load_airports.os')
+    def test_load_airports_unchanged(self, mock_os):
+        mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
         self.load_airports.main()
+        with self.assertNumQueries(1):
+            report = self.load_airports.main()
+        self.assertEquals((report.inserted, report.updated, report.unchanged, report.retired), (0, 0, len(self.sample_airport_icaos), 0))
+
+
+    @mock.patch('metar_practice.load_airports.os')
+    def test_load_airports_keeps_dependent_data(self, mock_os):
+        mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
+        self.load_airports.main()
+        db_airport = Airport.objects.get(icao='EGLL')
+        db_metar = Metar.objects.create(metar_json='{}', airport=db_airport)
+        db_question = Question.objects.create(metar=db_metar, text='What is the airport ICAO?', category=QuestionType.AIRPORT.value)
+        build_question_payload(db_question).save()
+        mock_os.path.join.return_value = self.helper_write_csv([('London,United Kingdom', 'Hounslow,United Kingdom')])
+        self.load_airports.main()
+        self.assertTrue(Question.objects.filter(pk=db_question.pk).exists())
+        self.assertEquals(QuestionPayload.objects.get(pk=db_question.pk).airport_city, 'Hounslow')
+
+
+    @mock.patch('metar_practice.load_airports.os')
+    def test_load_airports_rebuilds_changed_payloads_only(self, mock_os):
+        mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
+        self.load_airports.main()
+        db_unchanged_airport = Airport.objects.exclude(icao='EGLL').first()
+        db_metar = Metar.objects.create(metar_json='{}', airport=db_unchanged_airport)
+        db_question = Question.objects.create(metar=db_metar, text='What is the airport ICAO?', category=QuestionType.AIRPORT.value)
+        QuestionPayload.objects.filter(pk=db_question.pk).delete()
+        mock_os.path.join.return_value = self.helper_write_csv([('London,United Kingdom', 'Hounslow,United Kingdom')])
+        self.load_airports.main()
+        self.assertFalse(QuestionPayload.objects.filter(pk=db_question.pk).exists())
+
+
+    @mock.patch('metar_practice.load_airports.os')
+    def test_load_airports_retires_missing(self, mock_os):
+        mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
+        self.load_airports.main()
+        db_metar = Metar.objects.create(metar_json='{}', airport=Airport.objects.get(icao='EGLL'))
+        mock_os.path.join.return_value = self.helper_write_csv([('London Heathrow Airport,London,United Kingdom,LHR,EGLL,51.4706,-0.461941\n', '')])
+        report = self.load_airports.main()
+        self.assertEquals((report.retired, report.deleted), (1, 0))
+        self.assertTrue(Airport.objects.get(icao='EGLL').retired)
+        self.assertTrue(Metar.objects.filter(pk=db_metar.pk).exists())
+        self.assertEquals(counters.get_counts()[counters.AIRPORTS_COUNTER], len(self.sample_airport_icaos) - 1)
+        mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
+        report = self.load_airports.main()
+        self.assertEquals(report.updated, 1)
+        self.assertFalse(Airport.objects.get(icao='EGLL').retired)
+        self.assertEquals(counters.get_counts()[counters.AIRPORTS_COUNTER], len(self.sample_airport_icaos))
+
+
+    @mock.patch('metar_practice.load_airports.os')
+    def test_load_airports_purge(self, mock_os):
+        mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports.csv')
+        self.load_airports.main()
+        report = self.load_airports.main(purge=True)
+        self.assertEquals(report.deleted, len(self.fictional_airports))
         self.assertEquals(len(Airport.objects.all()), len(self.sample_airport_icaos))
-        self.assert_contains_airports()
+
+
+    def test_get_airport_too_long(self):
+        row = {'Name': 'Goroka Airport', 'City': 'Goroka', 'Country': 'Papua New Guinea', 'ICAO': 'AYGAX', 'Latitude': '-6.08', 'Longitude': '145.39'}
+        self.assertIsNone(self.load_airports.get_airport(row))
+        row['ICAO'] = 'AYGA'
+        self.assertEquals(self.load_airports.get_airport(row)['icao'], 'AYGA')
 
 
     @mock.patch('metar_practice.load_airports.LoadAirports.is_valid', return_value=True)
@@ -183,4 +299,4 @@ class TestLoadAirports(TestCase):
         mock_os.path.join.return_value = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'load_airports', 'sample_airports_empty.csv')
         mock_load_airports_is_valid.return_value = True
         self.load_airports.main()
-        self.assertEquals(len(Airport.objects.all()), 0)
+        self.assertEquals(len(Airport.objects.all()), len(self.fictional_airports))
@@ -1,12 +1,17 @@
 from django.test import TestCase
+import mock
+import requests
 import responses
 
 from metar_practice.metar_collector import MetarCollector
 from metar_practice.question_collector import QuestionCollector
+from metar_practice.metar_storage import compact_metar_json
 
 from metar_practice.models import Airport
 from metar_practice.models import Metar
 
+from metar_practice.tests.avwx_stub import AvwxStubServer
+
 import os
 import json
 
@@ -50,7 +55,7 @@ class TestGetRawMetar(TestCase):
         status_code, returned_db_metar = metar_collector.get_raw_metar(db_airport)
         db_metar = None
         try:
-            db_metar = Metar.objects.get(metar_json=metar_json,
+            db_metar = Metar.objects.get(digest=Metar.get_digest(metar_json),
                                          airport=db_airport)
         except Metar.DoesNotExist:
             self.fail('METAR not found')
@@ -86,6 +91,35 @@ class TestGetRawMetar(TestCase):
         self.assertIsNotNone(self.helper_get_db_airport(db_airport.pk))
 
 
+    @responses.activate
+    def test_get_raw_metar_airport_already_exists_refetched(self):
+        metar_collector = MetarCollector()
+        icao = 'KJFK'
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao=icao,
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        metar_path = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'metar_collector', 'sample_metar.json')
+        metar = json.loads(self.helper_extract_json(metar_path))
+        db_metar = Metar(metar_json=json.dumps(metar),
+                         airport=db_airport)
+        db_metar.full_clean()
+        db_metar.save()
+        metar['meta']['timestamp'] = '2020-04-03T16:05:00.000000Z'
+        responses.add(method='GET',
+                      url='https://avwx.rest/api/metar/{0}?options=&airport=true&reporting=true&format=json&onfail=cache'.format(icao),
+                      body=json.dumps(metar, indent=4),
+                      status=200)
+        status_code, returned_db_metar = metar_collector.get_raw_metar(db_airport)
+        self.assertEquals(status_code, 200)
+        self.assertEquals(returned_db_metar, db_metar)
+        self.assertEquals(len(Metar.objects.all()), 1)
+
+
     @responses.activate
     def test_get_raw_metar_airport_error_airport_does_not_exist(self):
         metar_collector = MetarCollector()
@@ -153,23 +187,179 @@ class TestGetRawMetar(TestCase):
         self.assertIsNotNone(self.helper_get_db_airport(db_airport.pk))
 
 
-class TestGetRandomAirport(TestCase):
+class TestFetchMetar(TestCase):
 
-    def test_get_random_airport(self):
+    @responses.activate
+    def test_fetch_metar(self):
         metar_collector = MetarCollector()
-        db_airport = Airport(name='John F Kennedy International Airport',
-                             city='New York',
-                             country='United States',
-                             icao='KJFK',
-                             latitude='40.63980103',
-                             longitude='-73.77890015')
+        icao = 'KJFK'
+        responses.add(method='GET',
+                      url='https://avwx.rest/api/metar/{0}?options=&airport=true&reporting=true&format=json&onfail=cache'.format(icao),
+                      body='{}',
+                      status=200)
+        with self.assertNumQueries(0):
+            self.assertEquals(metar_collector.fetch_metar(icao), (200, '{}'))
+
+
+    @responses.activate
+    def test_fetch_metar_error_exception(self):
+        metar_collector = MetarCollector()
+        self.assertEquals(metar_collector.fetch_metar('AAAA'), (None, None))
+
+
+class TestGetRawMetars(TestCase):
+
+    def setUp(self):
+        self.reports = {}
+        for icao, file_name in [('KJFK', 'sample_metar_KJFK_1.json'), ('EGLL', 'sample_metar_EGLL.json')]:
+            with open(os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'pull_metar_data', file_name)) as f:
+                self.reports[icao] = json.load(f)
+        self.stub = AvwxStubServer(self.reports, invalid_icaos=['AAAA'])
+        self.stub.start()
+        self.metar_collector = MetarCollector(api_url=self.stub.api_url)
+
+
+    def tearDown(self):
+        self.stub.stop()
+
+
+    def helper_create_db_airport(self, icao):
+        db_airport = Airport(name='{0} Airport'.format(icao),
+                             city='City',
+                             country='Country',
+                             icao=icao,
+                             latitude='0',
+                             longitude='0')
         db_airport.full_clean()
         db_airport.save()
-        returned_db_airport = metar_collector.get_random_airport()
-        self.assertEqual(returned_db_airport, db_airport)
+        return db_airport
 
 
-    def test_get_random_airport_empty(self):
-        metar_collector = MetarCollector()
-        returned_db_airport = metar_collector.get_random_airport()
-        self.assertIsNone(returned_db_airport)
+    def test_get_raw_metars(self):
+        db_airport_1 = self.helper_create_db_airport('KJFK')
+        db_airport_2 = self.helper_create_db_airport('EGLL')
+        pulls = self.metar_collector.get_raw_metars([db_airport_1, db_airport_2])
+        self.assertEquals(len(self.stub.paths), 1)
+        self.assertTrue(self.stub.paths[0].startswith('/api/multi/metar/KJFK,EGLL?'))
+        self.assertEquals([(db_airport, status) for db_airport, status, db_metar in pulls], [(db_airport_1, 200), (db_airport_2, 200)])
+        self.assertEquals(pulls[0][2].metar_json, compact_metar_json(json.dumps(self.reports['KJFK'])))
+        self.assertEquals(pulls[1][2].metar_json, compact_metar_json(json.dumps(self.reports['EGLL'])))
+        self.assertEquals(len(Metar.objects.all()), 2)
+
+
+    def test_get_raw_metars_batch_size(self):
+        db_airports = [self.helper_create_db_airport('KJFK'), self.helper_create_db_airport('EGLL'), self.helper_create_db_airport('KLAX')]
+        pulls = self.metar_collector.get_raw_metars(db_airports, batch_size=2)
+        self.assertEquals(len(self.stub.paths), 2)
+        self.assertTrue(self.stub.paths[1].startswith('/api/metar/KLAX?'))
+        self.assertEquals([status for db_airport, status, db_metar in pulls], [200, 200, 204])
+
+
+    def test_get_raw_metars_already_exists(self):
+        db_airport = self.helper_create_db_airport('KJFK')
+        self.helper_create_db_airport('EGLL')
+        first_pulls = self.metar_collector.get_raw_metars(list(Airport.objects.all()))
+        second_pulls = self.metar_collector.get_raw_metars(list(Airport.objects.all()))
+        self.assertEquals(first_pulls[0][2], second_pulls[0][2])
+        self.assertEquals(len(Metar.objects.filter(airport=db_airport)), 1)
+
+
+    def test_get_raw_metars_invalid_icao(self):
+        db_airport_1 = self.helper_create_db_airport('KJFK')
+        db_airport_2 = self.helper_create_db_airport('AAAA')
+        db_airport_3 = self.helper_create_db_airport('EGLL')
+        pulls = self.metar_collector.get_raw_metars([db_airport_1, db_airport_2, db_airport_3])
+        self.assertEquals(len(self.stub.paths), 2)
+        self.assertTrue(self.stub.paths[1].startswith('/api/multi/metar/KJFK,EGLL?'))
+        self.assertEquals([(status, db_metar is None) for db_airport, status, db_metar in pulls], [(200, False), (400, True), (200, False)])
+        self.assertFalse(Airport.objects.filter(icao='AAAA').exists())
+        self.assertEquals(len(Metar.objects.all()), 2)
+
+
+    def test_get_raw_metars_missing_report(self):
+        db_airport_1 = self.helper_create_db_airport('KJFK')
+        db_airport_2 = self.helper_create_db_airport('KLAX')
+        pulls = self.metar_collector.get_raw_metars([db_airport_1, db_airport_2])
+        self.assertEquals(pulls[1], (db_airport_2, 204, None))
+        self.assertTrue(Airport.objects.filter(icao='KLAX').exists())
+        self.assertEquals(len(Metar.objects.all()), 1)
+
+
+    def test_fetch_metars(self):
+        with self.assertNumQueries(0):
+            reports = self.metar_collector.fetch_metars(['KJFK', 'EGLL', 'KJFK'])
+        self.assertEquals(len(self.stub.paths), 1)
+        self.assertEquals(list(reports.keys()), ['KJFK', 'EGLL'])
+        self.assertEquals(reports['EGLL'][0], 200)
+
+
+    def test_fetch_metars_error_exception(self):
+        metar_collector = MetarCollector(api_url='http://127.0.0.1:0/api', retries=0)
+        self.assertEquals(metar_collector.fetch_metars(['KJFK', 'EGLL']), {'KJFK': (None, None), 'EGLL': (None, None)})
+
+
+    def test_fetch_metars_error_status(self):
+        metar_collector = MetarCollector(api_url='{0}/missing'.format(self.stub.api_url))
+        reports = metar_collector.fetch_metars(['KJFK', 'EGLL'])
+        self.assertEquals(reports['KJFK'][0], 404)
+        self.assertEquals(reports['EGLL'][0], 404)
+
+
+class TestMetarCollectorSession(TestCase):
+
+    def setUp(self):
+        self.stub = AvwxStubServer({'KJFK': {'station': 'KJFK'}})
+        self.stub.start()
+
+
+    def tearDown(self):
+        self.stub.stop()
+
+
+    def test_connection_reused(self):
+        metar_collector = MetarCollector(api_url=self.stub.api_url)
+        for i in range(0, 3):
+            self.assertEquals(metar_collector.fetch_metar('KJFK')[0], 200)
+        self.assertEquals(metar_collector.get_connection_stats(), {'requests': 3, 'connections': 1, 'reused': 2})
+        metar_collector.close()
+
+
+    def test_connection_stats_empty(self):
+        metar_collector = MetarCollector(api_url=self.stub.api_url)
+        self.assertEquals(metar_collector.get_connection_stats(), {'requests': 0, 'connections': 0, 'reused': 0})
+
+
+    def test_retry(self):
+        self.stub.failures = 2
+        metar_collector = MetarCollector(api_url=self.stub.api_url, backoff_factor=0)
+        self.assertEquals(metar_collector.fetch_metar('KJFK'), (200, json.dumps({'station': 'KJFK'})))
+        self.assertEquals(len(self.stub.paths), 3)
+
+
+    def test_retry_exhausted(self):
+        self.stub.failures = 2
+        metar_collector = MetarCollector(api_url=self.stub.api_url, retries=1, backoff_factor=0)
+        self.assertEquals(metar_collector.fetch_metar('KJFK')[0], 503)
+        self.assertEquals(len(self.stub.paths), 2)
+
+
+    def test_invalid_icao_not_retried(self):
+        self.stub.invalid_icaos.add('AAAA')
+        metar_collector = MetarCollector(api_url=self.stub.api_url, backoff_factor=0)
+        self.assertEquals(metar_collector.fetch_metar('AAAA')[0], 400)
+        self.assertEquals(len(self.stub.paths), 1)
+
+
+    @mock.patch('requests.Session.get')
+    def test_timeout(self, mock_session_get):
+        mock_session_get.side_effect = requests.exceptions.ReadTimeout()
+        metar_collector = MetarCollector(api_url=self.stub.api_url, timeout=(1, 2))
+        self.assertEquals(metar_collector.fetch_metar('KJFK'), (None, None))
+        mock_session_get.assert_called_once_with('{0}/metar/KJFK?options=&airport=true&reporting=true&format=json&onfail=cache'.format(self.stub.api_url),
+                                                 timeout=(1, 2))
+
+
+    @mock.patch.dict(os.environ, {'METAR_KEY': 'test-key'})
+    def test_authorization_header(self):
+        metar_collector = MetarCollector(api_url=self.stub.api_url)
+        self.assertEquals(metar_collector.session.headers['Authorization'], 'test-key')
@@ -0,0 +1,73 @@
+from django.test import TestCase
+
+from metar_practice.metar_digests import backfill_metar_digests
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+
+import json
+
+
+class TestMetarDigest(TestCase):
+
+    def helper_get_metar_json(self, raw, timestamp='2020-04-03T15:56:47.000000Z'):
+        return json.dumps({'meta': {'timestamp': timestamp},
+                           'station': 'KJFK',
+                           'time': {'repr': '031551Z', 'dt': '2020-04-03T15:51:00+00:00Z'},
+                           'raw': raw})
+
+
+    def test_get_digest_ignores_fetch_metadata(self):
+        self.assertEquals(Metar.get_digest(self.helper_get_metar_json('KJFK 031551Z 22010KT')),
+                          Metar.get_digest(self.helper_get_metar_json('KJFK 031551Z 22010KT', timestamp='2020-04-03T16:05:00.000000Z')))
+
+
+    def test_get_digest_different_report(self):
+        self.assertNotEqual(Metar.get_digest(self.helper_get_metar_json('KJFK 031551Z 22010KT')),
+                            Metar.get_digest(self.helper_get_metar_json('KJFK 031551Z COR 22012KT')))
+
+
+    def test_get_digest_invalid_json(self):
+        self.assertEquals(len(Metar.get_digest('not json')), 64)
+        self.assertNotEqual(Metar.get_digest('[]'), Metar.get_digest('{}'))
+
+
+    def test_save_sets_digest_and_fields(self):
+        db_airport = Airport.objects.create(name='John F Kennedy International Airport',
+                                            city='New York',
+                                            country='United States',
+                                            icao='KJFK',
+                                            latitude='40.63980103',
+                                            longitude='-73.77890015')
+        metar_json = self.helper_get_metar_json('KJFK 031551Z 22010KT')
+        db_metar = Metar.objects.create(metar_json=metar_json, airport=db_airport)
+        self.assertEquals(db_metar.digest, Metar.get_digest(metar_json))
+        self.assertEquals(db_metar.station, 'KJFK')
+        self.assertEquals(db_metar.raw, 'KJFK 031551Z 22010KT')
+        self.assertTrue(Metar.objects.filter(observed_at__hour=15, raw__startswith='KJFK').exists())
+
+
+class TestBackfillMetarDigests(TestCase):
+
+    def setUp(self):
+        self.db_airport = Airport.objects.create(name='John F Kennedy International Airport',
+                                                 city='New York',
+                                                 country='United States',
+                                                 icao='KJFK',
+                                                 latitude='40.63980103',
+                                                 longitude='-73.77890015')
+
+
+    def test_backfill_metar_digests(self):
+        metar_jsons = [json.dumps({'station': 'KJFK', 'raw': 'KJFK {0}'.format(i)}) for i in range(0, 5)]
+        Metar.objects.bulk_create([Metar(metar_json=metar_json, airport=self.db_airport) for metar_json in metar_jsons])
+        self.assertEquals(backfill_metar_digests(batch_size=2), 5)
+        self.assertEquals([db_metar.digest for db_metar in Metar.objects.order_by('pk')],
+                          [Metar.get_digest(metar_json) for metar_json in metar_jsons])
+
+
+    def test_backfill_metar_digests_skips_existing(self):
+        Metar.objects.create(metar_json='{}', airport=self.db_airport)
+        Metar.objects.bulk_create([Metar(metar_json='[]', airport=self.db_airport)])
+        with self.assertNumQueries(3):
+            self.assertEquals(backfill_metar_digests(), 1)
@@ -0,0 +1,81 @@
+from django.test import SimpleTestCase
+
+from metar_practice.metar_storage import compact_metar_json
+from metar_practice.metar_storage import encode_metar_json
+from metar_practice.metar_storage import decode_metar_json
+from metar_practice.metar_storage import extract_metar_fields
+from metar_practice.metar_storage import METAR_FIELDS
+
+import datetime
+import os
+import json
+
+
+class TestMetarStorage(SimpleTestCase):
+
+    def helper_extract_json(self):
+        metar_path = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'question_collector', 'sample_metar.json')
+        with open(metar_path) as f:
+            return json.dumps(json.load(f))
+
+
+    def test_compact_metar_json(self):
+        metar = json.loads(compact_metar_json(self.helper_extract_json()))
+        self.assertEquals(set(metar.keys()), set(METAR_FIELDS))
+        self.assertNotIn('spoken', metar['altimeter'])
+        self.assertEquals(metar['altimeter']['value'], 29.66)
+        self.assertEquals(metar['raw'], json.loads(self.helper_extract_json())['raw'])
+
+
+    def test_compact_metar_json_missing_fields(self):
+        self.assertEquals(compact_metar_json(json.dumps({'meta': {}, 'raw': 'KJFK 031551Z'})), '{"raw":"KJFK 031551Z"}')
+
+
+    def test_compact_metar_json_not_object(self):
+        self.assertEquals(compact_metar_json('not json'), 'not json')
+        self.assertEquals(compact_metar_json('[]'), '[]')
+
+
+    def test_encode_decode(self):
+        metar_json = self.helper_extract_json()
+        metar_data = encode_metar_json(metar_json)
+        self.assertLess(len(metar_data), len(metar_json) / 3)
+        self.assertEquals(decode_metar_json(metar_data), compact_metar_json(metar_json))
+        self.assertEquals(decode_metar_json(memoryview(metar_data)), compact_metar_json(metar_json))
+
+
+    def test_extract_metar_fields(self):
+        fields = extract_metar_fields(self.helper_extract_json())
+        self.assertEquals(fields, {'station': 'KJFK',
+                                   'raw': json.loads(self.helper_extract_json())['raw'],
+                                   'observed_at': datetime.datetime(2020, 4, 3, 15, 51, tzinfo=datetime.timezone.utc),
+                                   'flight_rules': 'VFR',
+                                   'wind_direction': 350,
+                                   'wind_speed': 21,
+                                   'wind_gust': 29,
+                                   'visibility': 10.0,
+                                   'temperature': 10,
+                                   'dewpoint': 7,
+                                   'altimeter': 29.66,
+                                   'clouds': 'FEW024 BKN036 OVC046',
+                                   'ceiling': 36})
+
+
+    def test_extract_metar_fields_variable_wind_no_ceiling(self):
+        metar_json = json.dumps({'time': {'dt': '2022-01-27T12:50:00Z'},
+                                 'wind_direction': {'repr': 'VRB', 'value': None},
+                                 'wind_gust': None,
+                                 'clouds': [{'repr': 'FEW024', 'type': 'FEW', 'altitude': 24}]})
+        fields = extract_metar_fields(metar_json)
+        self.assertEquals(fields['observed_at'], datetime.datetime(2022, 1, 27, 12, 50, tzinfo=datetime.timezone.utc))
+        self.assertIsNone(fields['wind_direction'])
+        self.assertIsNone(fields['wind_gust'])
+        self.assertEquals(fields['clouds'], 'FEW024')
+        self.assertIsNone(fields['ceiling'])
+
+
+    def test_extract_metar_fields_not_object(self):
+        fields = extract_metar_fields('not json')
+        self.assertEquals(fields['station'], '')
+        self.assertIsNone(fields['observed_at'])
+        self.assertIsNone(fields['temperature'])
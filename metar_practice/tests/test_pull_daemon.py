@@ -0,0 +1,95 @@
+import mock
+from django.test import TestCase
+from django.test import override_settings
+
+from metar_practice.pull_daemon import PullDaemon
+
+from metar_practice.models import Airport
+from metar_practice.models import AirportPullState
+from metar_practice.models import Metar
+
+import os
+import json
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                           'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'}})
+class TestPullDaemon(TestCase):
+
+    def setUp(self):
+        self.db_airport = Airport(name='John F Kennedy International Airport',
+                                  city='New York',
+                                  country='United States',
+                                  icao='KJFK',
+                                  latitude='40.63980103',
+                                  longitude='-73.77890015')
+        self.db_airport.full_clean()
+        self.db_airport.save()
+
+
+    def helper_extract_json(self, path):
+        with open(path) as f:
+            return json.dumps(json.load(f))
+
+
+    def test_tick_interval(self):
+        self.assertEquals(PullDaemon(pulls_per_hour=50, batch_size=1).tick_interval, 72)
+        self.assertEquals(PullDaemon(pulls_per_hour=50, batch_size=5).tick_interval, 360)
+
+
+    @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
+    @mock.patch('metar_practice.metar_collector.MetarCollector.fetch_metars')
+    def test_pull_due(self, mock_metar_collector_fetch_metars, mock_question_collector_generate_questions):
+        metar_path = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'pull_metar_data', 'sample_metar_KJFK_1.json')
+        mock_metar_collector_fetch_metars.return_value = {'KJFK': (200, self.helper_extract_json(metar_path))}
+        pull_daemon = PullDaemon(batch_size=1)
+        self.assertEquals(pull_daemon.pull_due(), 1)
+        mock_metar_collector_fetch_metars.assert_called_once_with(['KJFK'])
+        self.assertEquals(mock_question_collector_generate_questions.call_count, 1)
+        self.assertEquals(len(Metar.objects.filter(airport=self.db_airport)), 1)
+        self.assertEquals(AirportPullState.objects.get(pk=self.db_airport.pk).failure_count, 0)
+        self.assertEquals(pull_daemon.pull_scheduler.new_reports, 1)
+
+
+    @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
+    @mock.patch('metar_practice.metar_collector.MetarCollector.fetch_metars')
+    def test_pull_due_failure(self, mock_metar_collector_fetch_metars, mock_question_collector_generate_questions):
+        mock_metar_collector_fetch_metars.return_value = {'KJFK': (204, None)}
+        pull_daemon = PullDaemon(batch_size=1)
+        self.assertEquals(pull_daemon.pull_due(), 1)
+        self.assertEquals(mock_question_collector_generate_questions.call_count, 0)
+        self.assertEquals(AirportPullState.objects.get(pk=self.db_airport.pk).failure_count, 1)
+
+
+    @mock.patch('metar_practice.metar_collector.MetarCollector.fetch_metars')
+    def test_pull_due_none_due(self, mock_metar_collector_fetch_metars):
+        Airport.objects.all().update(retired=True)
+        self.assertEquals(PullDaemon().pull_due(), 0)
+        self.assertEquals(mock_metar_collector_fetch_metars.call_count, 0)
+
+
+    @mock.patch('metar_practice.pull_daemon.PullDaemon.pull_due')
+    def test_tick_failure(self, mock_pull_daemon_pull_due):
+        mock_pull_daemon_pull_due.side_effect = Exception('database is locked')
+        PullDaemon().tick()
+        self.assertEquals(mock_pull_daemon_pull_due.call_count, 1)
+
+
+    @mock.patch('metar_practice.pull_daemon.PullDaemon.housekeep')
+    @mock.patch('metar_practice.pull_daemon.PullDaemon.pull_due')
+    def test_run_until_stopped(self, mock_pull_daemon_pull_due, mock_pull_daemon_housekeep):
+        clock = mock.Mock(return_value=0)
+        pull_daemon = PullDaemon(pulls_per_hour=3600, housekeeping_interval=2, clock=clock)
+        ticks = []
+
+        def pull_due():
+            ticks.append(clock.return_value)
+            clock.return_value += 1
+            if len(ticks) == 3:
+                pull_daemon.stop()
+            return 1
+
+        mock_pull_daemon_pull_due.side_effect = pull_due
+        pull_daemon.run()
+        self.assertEquals(ticks, [0, 1, 2])
+        self.assertEquals(mock_pull_daemon_housekeep.call_count, 2)
@@ -1,6 +1,7 @@
 from django import db
 import mock
 from django.test import TestCase
+from django.test import override_settings
 
 import metar_practice.pull_metar_data as pull_metar_data
 
@@ -8,6 +9,7 @@ from metar_practice.models import Airport
 from metar_practice.models import Metar
 from metar_practice.models import Question
 from metar_practice.models import Answer
+from metar_practice.models import AirportPullState
 
 from metar_practice.enums import QuestionType
 
@@ -15,6 +17,8 @@ import os
 import json
 
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                           'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'}})
 class TestPullMetarData(TestCase):
 
     def helper_extract_json(self, path):
@@ -47,9 +51,7 @@ class TestPullMetarData(TestCase):
     def helper_create_db_question(self, db_metar, question_text, answers_text, category):
         db_answers = []
         for answer_text in answers_text:
-            db_answer = Answer(text=answer_text)
-            db_answer.full_clean()
-            db_answer.save()
+            db_answer = Answer.objects.get_or_create(text=answer_text)[0]
             db_answers.append(db_answer)
         db_question = Question(metar=db_metar,
                                text=question_text,
@@ -71,9 +73,9 @@ class TestPullMetarData(TestCase):
 
     @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
     @mock.patch('metar_practice.metar_collector.MetarCollector.get_raw_metar')
-    @mock.patch('metar_practice.metar_collector.MetarCollector.get_random_airport')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
     def test_pull_metar_data(self,
-                             mock_metar_collector_random_airport,
+                             mock_pull_scheduler_due_airports,
                              mock_metar_collector_raw_metar,
                              mock_question_collector_generate_questions):
         db_airport = self.helper_create_db_airport()
@@ -87,22 +89,23 @@ class TestPullMetarData(TestCase):
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind speed?', ['21 kt'], QuestionType.WIND_SPEED))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind gusting to?', ['The wind is not currently gusting.'], QuestionType.WIND_GUST))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the altimeter?', ['29.66 inHg'], QuestionType.ALTIMETER))
-        mock_metar_collector_random_airport.return_value = db_airport
+        mock_pull_scheduler_due_airports.return_value = [db_airport]
         mock_metar_collector_raw_metar.return_value = (status, db_metar)
         mock_question_collector_generate_questions.return_value = db_questions
         pull_metar_data.hour_pull_count = 1
         pull_metar_data.database_question_limit = 100
         pull_metar_data.main()
-        mock_metar_collector_random_airport.assert_called_once()
+        mock_pull_scheduler_due_airports.assert_called_once()
         mock_metar_collector_raw_metar.assert_called_once()
         mock_question_collector_generate_questions.assert_called_once()
+        self.assertEquals(AirportPullState.objects.get(airport=db_airport).failure_count, 0)
 
 
     @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
     @mock.patch('metar_practice.metar_collector.MetarCollector.get_raw_metar')
-    @mock.patch('metar_practice.metar_collector.MetarCollector.get_random_airport')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
     def test_pull_metar_data_none_airport(self,
-                                          mock_metar_collector_random_airport,
+                                          mock_pull_scheduler_due_airports,
                                           mock_metar_collector_raw_metar,
                                           mock_question_collector_generate_questions):
         db_airport = self.helper_create_db_airport()
@@ -116,22 +119,26 @@ class TestPullMetarData(TestCase):
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind speed?', ['21 kt'], QuestionType.WIND_SPEED))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind gusting to?', ['The wind is not currently gusting.'], QuestionType.WIND_GUST))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the altimeter?', ['29.66 inHg'], QuestionType.ALTIMETER))
-        mock_metar_collector_random_airport.return_value = None
+        mock_pull_scheduler_due_airports.return_value = []
         mock_metar_collector_raw_metar.return_value = (status, db_metar)
         mock_question_collector_generate_questions.return_value = db_questions
         pull_metar_data.hour_pull_count = 1
         pull_metar_data.database_question_limit = 100
-        pull_metar_data.main()
-        mock_metar_collector_random_airport.assert_called_once()
+        with mock.patch('builtins.print') as mock_print:
+            pull_metar_data.main()
+        printed = ''.join(str(call) for call in mock_print.call_args_list)
+        self.assertIn('leaving 1/1 pulls unused', printed)
+        self.assertNotIn('Failed to pull', printed)
+        mock_pull_scheduler_due_airports.assert_called_once()
         mock_metar_collector_raw_metar.assert_not_called()
         mock_question_collector_generate_questions.assert_not_called()
 
 
     @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
     @mock.patch('metar_practice.metar_collector.MetarCollector.get_raw_metar')
-    @mock.patch('metar_practice.metar_collector.MetarCollector.get_random_airport')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
     def test_pull_metar_data_none_200_status(self,
-                                             mock_metar_collector_random_airport,
+                                             mock_pull_scheduler_due_airports,
                                              mock_metar_collector_raw_metar,
                                              mock_question_collector_generate_questions):
         db_airport = self.helper_create_db_airport()
@@ -145,22 +152,22 @@ class TestPullMetarData(TestCase):
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind speed?', ['21 kt'], QuestionType.WIND_SPEED))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind gusting to?', ['The wind is not currently gusting.'], QuestionType.WIND_GUST))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the altimeter?', ['29.66 inHg'], QuestionType.ALTIMETER))
-        mock_metar_collector_random_airport.return_value = db_airport
+        mock_pull_scheduler_due_airports.return_value = [db_airport]
         mock_metar_collector_raw_metar.return_value = (status, db_metar)
         mock_question_collector_generate_questions.return_value = db_questions
         pull_metar_data.hour_pull_count = 1
         pull_metar_data.database_question_limit = 100
         pull_metar_data.main()
-        mock_metar_collector_random_airport.assert_called_once()
+        mock_pull_scheduler_due_airports.assert_called_once()
         mock_metar_collector_raw_metar.assert_called_once()
         mock_question_collector_generate_questions.assert_not_called()
 
 
     @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
     @mock.patch('metar_practice.metar_collector.MetarCollector.get_raw_metar')
-    @mock.patch('metar_practice.metar_collector.MetarCollector.get_random_airport')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
     def test_pull_metar_data_none_db_metar(self,
-                                           mock_metar_collector_random_airport,
+                                           mock_pull_scheduler_due_airports,
                                            mock_metar_collector_raw_metar,
                                            mock_question_collector_generate_questions):
         db_airport = self.helper_create_db_airport()
@@ -174,22 +181,22 @@ class TestPullMetarData(TestCase):
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind speed?', ['21 kt'], QuestionType.WIND_SPEED))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind gusting to?', ['The wind is not currently gusting.'], QuestionType.WIND_GUST))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the altimeter?', ['29.66 inHg'], QuestionType.ALTIMETER))
-        mock_metar_collector_random_airport.return_value = db_airport
+        mock_pull_scheduler_due_airports.return_value = [db_airport]
         mock_metar_collector_raw_metar.return_value = (status, None)
         mock_question_collector_generate_questions.return_value = db_questions
         pull_metar_data.hour_pull_count = 1
         pull_metar_data.database_question_limit = 100
         pull_metar_data.main()
-        mock_metar_collector_random_airport.assert_called_once()
+        mock_pull_scheduler_due_airports.assert_called_once()
         mock_metar_collector_raw_metar.assert_called_once()
         mock_question_collector_generate_questions.assert_not_called()
 
 
     @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
     @mock.patch('metar_practice.metar_collector.MetarCollector.get_raw_metar')
-    @mock.patch('metar_practice.metar_collector.MetarCollector.get_random_airport')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
     def test_pull_metar_data_non_overflow(self,
-                                         mock_metar_collector_random_airport,
+                                         mock_pull_scheduler_due_airports,
                                          mock_metar_collector_raw_metar,
                                          mock_question_collector_generate_questions):
         db_airport = self.helper_create_db_airport()
@@ -204,7 +211,7 @@ class TestPullMetarData(TestCase):
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the wind gusting to?', ['The wind is not currently gusting.'], QuestionType.WIND_GUST))
         db_questions.append(self.helper_create_db_question(db_metar, 'What is the altimeter?', ['29.66 inHg'], QuestionType.ALTIMETER))
         db_answers = self.helper_get_db_answers(db_questions)
-        mock_metar_collector_random_airport.return_value = db_airport
+        mock_pull_scheduler_due_airports.return_value = [db_airport]
         mock_metar_collector_raw_metar.return_value = (status, db_metar)
         mock_question_collector_generate_questions.return_value = db_questions
         pull_metar_data.hour_pull_count = 1
@@ -218,20 +225,18 @@ class TestPullMetarData(TestCase):
         self.assertEquals(len(db_answers), len(Answer.objects.all()))
         for db_answer in db_answers:
             self.assertTrue(db_answer in Answer.objects.all())
-        mock_metar_collector_random_airport.assert_called_once()
+        mock_pull_scheduler_due_airports.assert_called_once()
         mock_metar_collector_raw_metar.assert_called_once()
         mock_question_collector_generate_questions.assert_called_once()
 
 
-    @mock.patch('metar_practice.models.Metar.objects.order_by')
     @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
     @mock.patch('metar_practice.metar_collector.MetarCollector.get_raw_metar')
-    @mock.patch('metar_practice.metar_collector.MetarCollector.get_random_airport')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
     def test_pull_metar_data_overflow_all_answers_overlap(self,
-                                                          mock_metar_collector_random_airport,
+                                                          mock_pull_scheduler_due_airports,
                                                           mock_metar_collector_raw_metar,
-                                                          mock_question_collector_generate_questions,
-                                                          mock_models_metar_order_by):
+                                                          mock_question_collector_generate_questions):
         db_airport = self.helper_create_db_airport()
         status = 200
         metar_path_1 = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'pull_metar_data', 'sample_metar_KJFK_1.json')
@@ -247,10 +252,9 @@ class TestPullMetarData(TestCase):
         db_questions_2.append(self.helper_create_db_question(db_metar_2, 'What is the wind gusting to?', ['The wind is not currently gusting.'], QuestionType.WIND_GUST))
         db_questions_2.append(self.helper_create_db_question(db_metar_2, 'What is the visibility?', ['10 sm'], QuestionType.VISIBILITY))
         db_answers = self.helper_get_db_answers(db_questions_2)
-        mock_metar_collector_random_airport.return_value = db_airport
+        mock_pull_scheduler_due_airports.return_value = [db_airport] * 2
         mock_metar_collector_raw_metar.side_effect = [(status, db_metar_1), (status, db_metar_2)]
         mock_question_collector_generate_questions.side_effect = [db_questions_1, db_questions_2]
-        mock_models_metar_order_by.side_effect = [Metar.objects.filter(pk=db_metar_1.pk)]
         pull_metar_data.hour_pull_count = 2
         pull_metar_data.database_question_limit =  3
         pull_metar_data.main()
@@ -262,21 +266,18 @@ class TestPullMetarData(TestCase):
         self.assertEquals(len(db_answers), len(Answer.objects.all()))
         for db_answer in db_answers:
             self.assertTrue(db_answer in Answer.objects.all())
-        mock_models_metar_order_by.assert_called_once()
-        self.assertEquals(mock_metar_collector_random_airport.call_count, 2)
+        mock_pull_scheduler_due_airports.assert_called_once()
         self.assertEquals(mock_metar_collector_raw_metar.call_count, 2)
         self.assertEquals(mock_question_collector_generate_questions.call_count, 2)
 
 
-    @mock.patch('metar_practice.models.Metar.objects.order_by')
     @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
     @mock.patch('metar_practice.metar_collector.MetarCollector.get_raw_metar')
-    @mock.patch('metar_practice.metar_collector.MetarCollector.get_random_airport')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
     def test_pull_metar_data_overflow_some_answers_overlap(self,
-                                                           mock_metar_collector_random_airport,
+                                                           mock_pull_scheduler_due_airports,
                                                            mock_metar_collector_raw_metar,
-                                                           mock_question_collector_generate_questions,
-                                                           mock_models_metar_order_by):
+                                                           mock_question_collector_generate_questions):
         db_airport = self.helper_create_db_airport()
         status = 200
         metar_path_1 = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'pull_metar_data', 'sample_metar_KJFK_1.json')
@@ -297,10 +298,9 @@ class TestPullMetarData(TestCase):
         db_questions_2.append(self.helper_create_db_question(db_metar_2, 'What is the wind speed?', ['3 kt'], QuestionType.WIND_SPEED))
         db_questions_2.append(self.helper_create_db_question(db_metar_2, 'What is the wind gusting to?', ['The wind is not currently gusting.'], QuestionType.WIND_GUST))
         db_answers = self.helper_get_db_answers(db_questions_2)
-        mock_metar_collector_random_airport.return_value = db_airport
+        mock_pull_scheduler_due_airports.return_value = [db_airport] * 2
         mock_metar_collector_raw_metar.side_effect = [(status, db_metar_1), (status, db_metar_2)]
         mock_question_collector_generate_questions.side_effect = [db_questions_1, db_questions_2]
-        mock_models_metar_order_by.side_effect = [Metar.objects.filter(pk=db_metar_1.pk)]
         pull_metar_data.hour_pull_count = 2
         pull_metar_data.database_question_limit =  5
         pull_metar_data.main()
@@ -312,21 +312,18 @@ class TestPullMetarData(TestCase):
         self.assertEquals(len(db_answers), len(Answer.objects.all()))
         for db_answer in db_answers:
             self.assertTrue(db_answer in Answer.objects.all())
-        mock_models_metar_order_by.assert_called_once()
-        self.assertEquals(mock_metar_collector_random_airport.call_count, 2)
+        mock_pull_scheduler_due_airports.assert_called_once()
         self.assertEquals(mock_metar_collector_raw_metar.call_count, 2)
         self.assertEquals(mock_question_collector_generate_questions.call_count, 2)
 
 
-    @mock.patch('metar_practice.models.Metar.objects.order_by')
     @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
     @mock.patch('metar_practice.metar_collector.MetarCollector.get_raw_metar')
-    @mock.patch('metar_practice.metar_collector.MetarCollector.get_random_airport')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
     def test_pull_metar_data_overflow_none_answers_overlap(self,
-                                                           mock_metar_collector_random_airport,
+                                                           mock_pull_scheduler_due_airports,
                                                            mock_metar_collector_raw_metar,
-                                                           mock_question_collector_generate_questions,
-                                                           mock_models_metar_order_by):
+                                                           mock_question_collector_generate_questions):
         db_airport_1 = self.helper_create_db_airport()
         db_airport_2 = Airport(name='London Heathrow Airport',
                                city='London',
@@ -357,10 +354,9 @@ class TestPullMetarData(TestCase):
         db_questions_2.append(self.helper_create_db_question(db_metar_2, 'What is the dewpoint?', ['9 C'], QuestionType.DEWPOINT))
         db_questions_2.append(self.helper_create_db_question(db_metar_2, 'What is the visibility?', ['9999 sm'], QuestionType.VISIBILITY))
         db_answers = self.helper_get_db_answers(db_questions_2)
-        mock_metar_collector_random_airport.side_effect = [db_airport_1, db_airport_2]
+        mock_pull_scheduler_due_airports.return_value = [db_airport_1, db_airport_2]
         mock_metar_collector_raw_metar.side_effect = [(status, db_metar_1), (status, db_metar_2)]
         mock_question_collector_generate_questions.side_effect = [db_questions_1, db_questions_2]
-        mock_models_metar_order_by.side_effect = [Metar.objects.filter(pk=db_metar_1.pk)]
         pull_metar_data.hour_pull_count = 2
         pull_metar_data.database_question_limit =  8
         pull_metar_data.main()
@@ -372,7 +368,103 @@ class TestPullMetarData(TestCase):
         self.assertEquals(len(db_answers), len(Answer.objects.all()))
         for db_answer in db_answers:
             self.assertTrue(db_answer in Answer.objects.all())
-        mock_models_metar_order_by.assert_called_once()
-        self.assertEquals(mock_metar_collector_random_airport.call_count, 2)
+        mock_pull_scheduler_due_airports.assert_called_once()
         self.assertEquals(mock_metar_collector_raw_metar.call_count, 2)
         self.assertEquals(mock_question_collector_generate_questions.call_count, 2)
+
+
+    @mock.patch('metar_practice.pull_metar_data.pull_concurrency', 4)
+    @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
+    @mock.patch('metar_practice.metar_collector.MetarCollector.fetch_metar')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
+    def test_pull_metar_data_concurrently(self,
+                                          mock_pull_scheduler_due_airports,
+                                          mock_metar_collector_fetch_metar,
+                                          mock_question_collector_generate_questions):
+        db_airport_1 = self.helper_create_db_airport()
+        db_airport_2 = Airport(name='London Heathrow Airport',
+                               city='London',
+                               country='United Kingdom',
+                               icao='EGLL',
+                               latitude='51.4706',
+                               longitude='-0.461941')
+        db_airport_2.full_clean()
+        db_airport_2.save()
+        metar_json_1 = self.helper_extract_json(os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'pull_metar_data', 'sample_metar_KJFK_1.json'))
+        metar_json_2 = self.helper_extract_json(os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'pull_metar_data', 'sample_metar_EGLL.json'))
+        responses = {'KJFK': (200, metar_json_1), 'EGLL': (200, metar_json_2)}
+        mock_pull_scheduler_due_airports.return_value = [db_airport_1, db_airport_2]
+        mock_metar_collector_fetch_metar.side_effect = lambda icao: responses[icao]
+        pull_metar_data.hour_pull_count = 3
+        pull_metar_data.database_question_limit = 100
+        pull_metar_data.main()
+        self.assertEquals(len(Metar.objects.all()), 2)
+        self.assertTrue(Metar.objects.filter(airport=db_airport_1, digest=Metar.get_digest(metar_json_1)).exists())
+        self.assertTrue(Metar.objects.filter(airport=db_airport_2, digest=Metar.get_digest(metar_json_2)).exists())
+        mock_pull_scheduler_due_airports.assert_called_once()
+        self.assertEquals(mock_metar_collector_fetch_metar.call_count, 2)
+        self.assertEquals(mock_question_collector_generate_questions.call_count, 2)
+
+
+    @mock.patch('metar_practice.pull_metar_data.pull_concurrency', 4)
+    @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
+    @mock.patch('metar_practice.metar_collector.MetarCollector.fetch_metar')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
+    def test_pull_metar_data_concurrently_invalid_icao(self,
+                                                       mock_pull_scheduler_due_airports,
+                                                       mock_metar_collector_fetch_metar,
+                                                       mock_question_collector_generate_questions):
+        db_airport = self.helper_create_db_airport()
+        mock_pull_scheduler_due_airports.return_value = [db_airport]
+        mock_metar_collector_fetch_metar.return_value = (400, json.dumps({'error': 'KJFK is not a valid ICAO or IATA code'}))
+        pull_metar_data.hour_pull_count = 1
+        pull_metar_data.database_question_limit = 100
+        pull_metar_data.main()
+        self.assertEquals(len(Airport.objects.all()), 0)
+        self.assertEquals(len(Metar.objects.all()), 0)
+        mock_question_collector_generate_questions.assert_not_called()
+
+
+    @mock.patch('metar_practice.pull_metar_data.avwx_batch_size', 2)
+    @mock.patch('metar_practice.question_collector.QuestionCollector.generate_questions')
+    @mock.patch('metar_practice.metar_collector.MetarCollector.fetch_metars')
+    @mock.patch('metar_practice.pull_scheduler.PullScheduler.get_due_airports')
+    def test_pull_metar_data_batched(self,
+                                     mock_pull_scheduler_due_airports,
+                                     mock_metar_collector_fetch_metars,
+                                     mock_question_collector_generate_questions):
+        db_airport_1 = self.helper_create_db_airport()
+        db_airport_2 = Airport(name='London Heathrow Airport',
+                               city='London',
+                               country='United Kingdom',
+                               icao='EGLL',
+                               latitude='51.4706',
+                               longitude='-0.461941')
+        db_airport_2.full_clean()
+        db_airport_2.save()
+        metar_json_1 = self.helper_extract_json(os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'pull_metar_data', 'sample_metar_KJFK_1.json'))
+        metar_json_2 = self.helper_extract_json(os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'pull_metar_data', 'sample_metar_EGLL.json'))
+        mock_pull_scheduler_due_airports.return_value = [db_airport_1, db_airport_2]
+        mock_metar_collector_fetch_metars.return_value = {'KJFK': (200, metar_json_1), 'EGLL': (200, metar_json_2)}
+        pull_metar_data.hour_pull_count = 3
+        pull_metar_data.database_question_limit = 100
+        pull_metar_data.main()
+        mock_metar_collector_fetch_metars.assert_called_once_with(['KJFK', 'EGLL'])
+        self.assertEquals(len(Metar.objects.all()), 2)
+        self.assertEquals(mock_question_collector_generate_questions.call_count, 2)
+
+
+class TestPullReport(TestCase):
+
+    def test_summary(self):
+        pull_report = pull_metar_data.PullReport()
+        for latency in range(1, 101):
+            pull_report.record('KJFK', 200, latency)
+        summary = pull_report.summary()
+        self.assertTrue(summary.startswith('Made 100 AVWX requests in '))
+        self.assertTrue(summary.endswith('latency p50=50ms p99=99ms'))
+
+
+    def test_summary_empty(self):
+        pull_report = pull_metar_data.PullReport()
+        self.assertTrue(pull_report.summary().startswith('Made 0 AVWX requests in '))
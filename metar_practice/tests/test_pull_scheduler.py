@@ -0,0 +1,145 @@
+from django.test import TestCase
+
+from metar_practice.pull_scheduler import PullScheduler
+from metar_practice.pull_scheduler import REPORT_INTERVAL
+from metar_practice.pull_scheduler import FAILURE_BACKOFF_MAX
+from metar_practice.pull_scheduler import QUARANTINE_FAILURES
+from metar_practice.pull_scheduler import QUARANTINE_PROBE_INTERVAL
+
+from metar_practice.models import Airport
+from metar_practice.models import AirportPullState
+from metar_practice.models import Metar
+
+import datetime
+import json
+
+
+class TestPullScheduler(TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime(2022, 1, 27, 12, 0, tzinfo=datetime.timezone.utc)
+        self.pull_scheduler = PullScheduler()
+        self.db_airports = [self.helper_create_db_airport(icao) for icao in ['KJFK', 'EGLL', 'NZWN', 'RJAA']]
+
+
+    def helper_create_db_airport(self, icao):
+        db_airport = Airport(name=icao, city=icao, country=icao, icao=icao, latitude='0', longitude='0')
+        db_airport.full_clean()
+        db_airport.save()
+        return db_airport
+
+
+    def helper_create_pull_state(self, db_airport, minutes_due, **kwargs):
+        return AirportPullState.objects.create(airport=db_airport, next_due_at=self.now + datetime.timedelta(minutes=minutes_due), **kwargs)
+
+
+    def helper_create_db_metar(self, db_airport, observed_at):
+        metar_json = json.dumps({'station': db_airport.icao, 'time': {'dt': observed_at.isoformat()}, 'raw': observed_at.isoformat()})
+        return Metar.objects.create(metar_json=metar_json, airport=db_airport)
+
+
+    def test_get_due_airports(self):
+        self.helper_create_pull_state(self.db_airports[0], -10)
+        self.helper_create_pull_state(self.db_airports[1], 10)
+        self.helper_create_pull_state(self.db_airports[2], -30)
+        with self.assertNumQueries(1):
+            db_airports = self.pull_scheduler.get_due_airports(10, now=self.now)
+            self.assertEquals([db_airport.icao for db_airport in db_airports], ['RJAA', 'NZWN', 'KJFK'])
+            self.assertEquals(db_airports[1].pull_state.next_due_at, self.now - datetime.timedelta(minutes=30))
+
+
+    def test_get_due_airports_count(self):
+        self.assertEquals(len(self.pull_scheduler.get_due_airports(2, now=self.now)), 2)
+
+
+    def test_get_due_airports_retired(self):
+        Airport.objects.filter(icao='KJFK').update(retired=True)
+        self.assertNotIn('KJFK', [db_airport.icao for db_airport in self.pull_scheduler.get_due_airports(10, now=self.now)])
+
+
+    def test_record_pull_first(self):
+        db_metar = self.helper_create_db_metar(self.db_airports[0], self.now - datetime.timedelta(minutes=9))
+        pull_state = self.pull_scheduler.record_pull(self.db_airports[0], 200, db_metar, now=self.now)
+        self.assertEquals(pull_state.last_fetched_at, self.now)
+        self.assertEquals(pull_state.last_observed_at, self.now - datetime.timedelta(minutes=9))
+        self.assertEquals(pull_state.report_interval, REPORT_INTERVAL)
+        self.assertEquals(pull_state.next_due_at, self.now + datetime.timedelta(minutes=51))
+        self.assertEquals(AirportPullState.objects.get(pk=self.db_airports[0].pk).next_due_at, pull_state.next_due_at)
+
+
+    def test_record_pull_learns_interval(self):
+        self.helper_create_pull_state(self.db_airports[0], -10, last_observed_at=self.now - datetime.timedelta(minutes=40))
+        db_airport = Airport.objects.select_related('pull_state').get(pk=self.db_airports[0].pk)
+        db_metar = self.helper_create_db_metar(db_airport, self.now - datetime.timedelta(minutes=10))
+        pull_state = self.pull_scheduler.record_pull(db_airport, 200, db_metar, now=self.now)
+        self.assertEquals(pull_state.report_interval, int(0.7 * 3600 + 0.3 * 1800))
+        self.assertEquals(pull_state.next_due_at, self.now - datetime.timedelta(minutes=10) + datetime.timedelta(seconds=pull_state.report_interval))
+
+
+    def test_record_pull_unchanged_report(self):
+        observed_at = self.now - datetime.timedelta(hours=3)
+        self.helper_create_pull_state(self.db_airports[0], -10, last_observed_at=observed_at)
+        db_airport = Airport.objects.select_related('pull_state').get(pk=self.db_airports[0].pk)
+        pull_state = self.pull_scheduler.record_pull(db_airport, 200, self.helper_create_db_metar(db_airport, observed_at), now=self.now)
+        self.assertEquals(pull_state.report_interval, REPORT_INTERVAL)
+        self.assertEquals(pull_state.next_due_at, self.now + datetime.timedelta(seconds=REPORT_INTERVAL))
+
+
+    def test_record_pull_failure(self):
+        self.helper_create_pull_state(self.db_airports[0], -10, failure_count=1)
+        db_airport = Airport.objects.select_related('pull_state').get(pk=self.db_airports[0].pk)
+        pull_state = self.pull_scheduler.record_pull(db_airport, None, None, now=self.now)
+        self.assertEquals(pull_state.failure_count, 2)
+        self.assertEquals(pull_state.next_due_at, self.now + datetime.timedelta(seconds=2 * REPORT_INTERVAL))
+        self.assertFalse(pull_state.quarantined)
+
+
+    def test_record_pull_failure_backoff_capped(self):
+        self.helper_create_pull_state(self.db_airports[0], -10, failure_count=QUARANTINE_FAILURES - 2, report_interval=REPORT_INTERVAL * 3)
+        db_airport = Airport.objects.select_related('pull_state').get(pk=self.db_airports[0].pk)
+        pull_state = self.pull_scheduler.record_pull(db_airport, 204, None, now=self.now)
+        self.assertEquals(pull_state.next_due_at, self.now + datetime.timedelta(seconds=FAILURE_BACKOFF_MAX))
+
+
+    def test_record_pull_quarantine(self):
+        self.helper_create_pull_state(self.db_airports[0], -10, failure_count=QUARANTINE_FAILURES - 1)
+        db_airport = Airport.objects.select_related('pull_state').get(pk=self.db_airports[0].pk)
+        pull_state = self.pull_scheduler.record_pull(db_airport, 204, None, now=self.now)
+        self.assertTrue(pull_state.quarantined)
+        self.assertEquals(pull_state.next_due_at, self.now + datetime.timedelta(seconds=QUARANTINE_PROBE_INTERVAL))
+        self.assertEquals(self.pull_scheduler.quarantines, 1)
+        self.assertNotIn('KJFK', [db_airport.icao for db_airport in self.pull_scheduler.get_due_airports(10, now=self.now)])
+
+
+    def test_record_pull_quarantine_recovers(self):
+        self.helper_create_pull_state(self.db_airports[0], -10, failure_count=QUARANTINE_FAILURES, quarantined=True)
+        db_airport = Airport.objects.select_related('pull_state').get(pk=self.db_airports[0].pk)
+        db_metar = self.helper_create_db_metar(db_airport, self.now - datetime.timedelta(minutes=9))
+        pull_state = self.pull_scheduler.record_pull(db_airport, 200, db_metar, now=self.now)
+        self.assertFalse(pull_state.quarantined)
+        self.assertEquals(pull_state.failure_count, 0)
+        self.assertEquals(pull_state.next_due_at, self.now + datetime.timedelta(minutes=51))
+
+
+    def test_summary(self):
+        db_metar = self.helper_create_db_metar(self.db_airports[0], self.now - datetime.timedelta(minutes=9))
+        self.pull_scheduler.record_pull(self.db_airports[0], 200, db_metar, now=self.now)
+        db_airport = Airport.objects.select_related('pull_state').get(pk=self.db_airports[0].pk)
+        self.pull_scheduler.record_pull(db_airport, 200, db_metar, now=self.now)
+        self.pull_scheduler.record_pull(self.db_airports[1], 204, None, now=self.now)
+        self.pull_scheduler.record_pull(self.db_airports[2], None, None, now=self.now)
+        self.assertEquals(self.pull_scheduler.summary(), 'Pulled 4 airports: 1 new reports, 1 unchanged, 2 failed, 75% of calls wasted, 0 airports quarantined')
+
+
+    def test_record_pull_success_resets_failures(self):
+        self.helper_create_pull_state(self.db_airports[0], -10, failure_count=3)
+        db_airport = Airport.objects.select_related('pull_state').get(pk=self.db_airports[0].pk)
+        pull_state = self.pull_scheduler.record_pull(db_airport, 200, self.helper_create_db_metar(db_airport, self.now), now=self.now)
+        self.assertEquals(pull_state.failure_count, 0)
+
+
+    def test_record_pull_airport_removed(self):
+        db_airport = self.db_airports[0]
+        Airport.objects.filter(pk=db_airport.pk).delete()
+        self.assertIsNone(self.pull_scheduler.record_pull(db_airport, 400, None, now=self.now))
+        self.assertEquals(len(AirportPullState.objects.all()), 0)
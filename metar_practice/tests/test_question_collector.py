@@ -1,14 +1,20 @@
 import mock
 from django.test import TestCase
+from django.test import TransactionTestCase
 from unittest.mock import call
 
 from metar_practice.question_collector import QuestionCollector
 from metar_practice.question_collector import UsuableDataError
+from metar_practice.answer_cache import AnswerCache
 
 from metar_practice.models import Airport
 from metar_practice.models import Metar
 from metar_practice.models import Answer
 from metar_practice.models import Question
+from metar_practice.models import QuestionPayload
+from metar_practice.models import Counter
+
+from metar_practice import counters
 
 from metar_practice.enums import QuestionType
 
@@ -166,6 +172,9 @@ class TestCreateDbQuestion(TestCase):
         db_question = self.helper_get_db_question(self.question)
         self.assertEquals(returned_db_question, db_question)
         self.assertEquals(returned_db_question.answers, db_question.answers)
+        db_payload = QuestionPayload.objects.get(pk=db_question.pk)
+        self.assertEquals(db_payload.question_text, self.question)
+        self.assertEquals(db_payload.answers, '\n'.join(self.answers))
 
 
     @mock.patch('metar_practice.question_collector.QuestionCollector.create_db_answers')
@@ -183,6 +192,126 @@ class TestCreateDbQuestion(TestCase):
         self.assertEquals(returned_db_question, db_question)
 
 
+class TestBatchedQuestionWrites(TestCase):
+
+    def setUp(self):
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao='KJFK',
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        metar_path = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'question_collector', 'sample_metar.json')
+        with open(metar_path) as f:
+            self.metar_json = json.load(f)
+        self.db_metar_1 = self.helper_create_db_metar(db_airport, '1')
+        self.db_metar_2 = self.helper_create_db_metar(db_airport, '2')
+
+
+    def helper_create_db_metar(self, db_airport, suffix):
+        db_metar = Metar(metar_json=json.dumps({**self.metar_json, 'sanitized': self.metar_json['sanitized'] + suffix}),
+                         airport=db_airport)
+        db_metar.full_clean()
+        db_metar.save()
+        return db_metar
+
+
+    def test_generate_questions_query_count(self):
+        with self.assertNumQueries(11):
+            db_questions = QuestionCollector(self.db_metar_1).generate_questions()
+        self.assertEquals(len(Question.objects.all()), len(db_questions))
+        self.assertEquals(len(QuestionPayload.objects.all()), len(db_questions))
+        for db_question in db_questions:
+            self.assertEquals(Question.objects.get(pk=db_question.pk).text, db_question.text)
+
+
+    def test_generate_questions_answers_linked(self):
+        db_questions = QuestionCollector(self.db_metar_1).generate_questions()
+        for db_question in db_questions:
+            db_payload = QuestionPayload.objects.get(pk=db_question.pk)
+            self.assertEquals([db_answer.text for db_answer in Question.objects.get(pk=db_question.pk).answers.order_by('pk')],
+                              db_payload.answers.split('\n'))
+
+
+    def test_generate_questions_counters(self):
+        db_questions = QuestionCollector(self.db_metar_1).generate_questions()
+        self.assertEquals(Counter.objects.get(name=counters.QUESTIONS_COUNTER).value, len(db_questions))
+        self.assertEquals(counters.reconcile()[1], {})
+
+
+    def test_generate_questions_twice(self):
+        db_questions = QuestionCollector(self.db_metar_1).generate_questions()
+        answer_count = len(Answer.objects.all())
+        self.assertEquals(QuestionCollector(self.db_metar_1).generate_questions(), db_questions)
+        self.assertEquals(len(Question.objects.all()), len(db_questions))
+        self.assertEquals(len(Answer.objects.all()), answer_count)
+        self.assertEquals(counters.reconcile()[1], {})
+
+
+    def test_generate_questions_answer_cache_shared(self):
+        answer_cache = AnswerCache()
+        QuestionCollector(self.db_metar_1, answer_cache).generate_questions()
+        answer_count = len(Answer.objects.all())
+        with self.assertNumQueries(8):
+            db_questions = QuestionCollector(self.db_metar_2, answer_cache).generate_questions()
+        self.assertEquals(len(Answer.objects.all()), answer_count)
+        self.assertEquals(len(Question.objects.filter(metar=self.db_metar_2)), len(db_questions))
+        self.assertTrue(answer_cache.hits > 0)
+
+
+    def test_create_db_question_duplicate_pending(self):
+        question_collector = QuestionCollector(self.db_metar_1)
+        question_collector.batching = True
+        db_question_1 = question_collector.create_db_question('What is the airport ICAO?', ['KJFK'], QuestionType.AIRPORT)
+        db_question_2 = question_collector.create_db_question('What is the airport ICAO?', ['KJFK'], QuestionType.AIRPORT)
+        question_collector.save_db_questions()
+        self.assertEquals(db_question_1, db_question_2)
+        self.assertEquals(len(Question.objects.all()), 1)
+
+
+    def test_generate_questions_concurrent_writer(self):
+        question_collector = QuestionCollector(self.db_metar_1)
+        db_questions = question_collector.generate_questions()
+        Question.objects.filter(pk__in=[db_question.pk for db_question in db_questions[1:]]).delete()
+        counters.reconcile()
+        get_question_ids = question_collector.get_question_ids
+        stale_reads = [{}]
+        def get_stale_question_ids(pending_questions):
+            return stale_reads.pop() if len(stale_reads) != 0 else get_question_ids(pending_questions)
+        question_collector = QuestionCollector(self.db_metar_1)
+        with mock.patch.object(question_collector, 'get_question_ids', side_effect=get_stale_question_ids):
+            question_collector.generate_questions()                    # First write misses the question another writer stored
+        self.assertEquals(len(Question.objects.all()), len(db_questions))
+        self.assertEquals(counters.reconcile()[1], {})
+
+
+class TestBatchedQuestionWritesStaleCache(TransactionTestCase):
+
+    def test_stale_answer_cache(self):
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao='KJFK',
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        db_metar = Metar(metar_json=json.dumps({'station': 'KJFK'}),
+                         airport=db_airport)
+        db_metar.full_clean()
+        db_metar.save()
+        answer_cache = AnswerCache()
+        answer_cache.put('KJFK', 1000)
+        db_questions = QuestionCollector(db_metar, answer_cache).generate_questions()
+        self.assertEquals(len(db_questions), 1)
+        db_answer = Answer.objects.get(text='KJFK')
+        self.assertEquals(list(Question.objects.get(pk=db_questions[0].pk).answers.all()), [db_answer])
+        self.assertEquals(answer_cache.misses, 1)
+        self.assertEquals(answer_cache.get('KJFK'), db_answer.pk)
+
+
 class ModifyJSONChoices(Enum):
     DELETE = auto()
     NONE = None
@@ -245,9 +374,7 @@ class TestGenerateTypeQustion(TestCase):
     def helper_create_db_question(self, db_metar, question_text, answers_text, category):
         db_answers = []
         for answer_text in answers_text:
-            db_answer = Answer(text=answer_text)
-            db_answer.full_clean()
-            db_answer.save()
+            db_answer = Answer.objects.get_or_create(text=answer_text)[0]
             db_answers.append(db_answer)
         db_question = Question(metar=db_metar,
                                text=question_text,
@@ -261,9 +388,7 @@ class TestGenerateTypeQustion(TestCase):
     def helper_create_db_questions(self, db_metar, questions_answers_text, category):
         db_questions = []
         for question_text, answer_text in questions_answers_text:
-            db_answer = Answer(text=answer_text)
-            db_answer.full_clean()
-            db_answer.save()
+            db_answer = Answer.objects.get_or_create(text=answer_text)[0]
             db_question = Question(metar=db_metar,
                                    text=question_text,
                                    category=category.value)
@@ -2675,9 +2800,7 @@ class TestGenerateQuestions(TestCase):
     def helper_create_db_question(self, db_metar, question_text, answers_text, category):
         db_answers = []
         for answer_text in answers_text:
-            db_answer = Answer(text=answer_text)
-            db_answer.full_clean()
-            db_answer.save()
+            db_answer = Answer.objects.get_or_create(text=answer_text)[0]
             db_answers.append(db_answer)
         db_question = Question(metar=db_metar,
                                text=question_text,
@@ -2691,9 +2814,7 @@ class TestGenerateQuestions(TestCase):
     def helper_create_db_questions(self, db_metar, questions_answers_text, category):
         db_questions = []
         for question_text, answer_text in questions_answers_text:
-            db_answer = Answer(text=answer_text)
-            db_answer.full_clean()
-            db_answer.save()
+            db_answer = Answer.objects.get_or_create(text=answer_text)[0]
             db_question = Question(metar=db_metar,
                                    text=question_text,
                                    category=category.value)
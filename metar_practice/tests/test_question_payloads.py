@@ -0,0 +1,144 @@
+from django.test import TestCase
+
+from metar_practice.question_payloads import build_question_payload
+from metar_practice.question_payloads import get_question_payload
+from metar_practice.question_payloads import payload_to_context
+from metar_practice.question_payloads import rebuild_question_payloads
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Answer
+from metar_practice.models import Question
+from metar_practice.models import QuestionPayload
+
+from metar_practice.enums import QuestionType
+
+import os
+import json
+
+
+class TestQuestionPayloads(TestCase):
+
+    def setUp(self):
+        self.db_airport = Airport(name='John F Kennedy International Airport',
+                                  city='New York',
+                                  country='United States',
+                                  icao='KJFK',
+                                  latitude='40.63980103',
+                                  longitude='-73.77890015')
+        self.db_airport.full_clean()
+        self.db_airport.save()
+        metar_path = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'question_collector', 'sample_metar.json')
+        with open(metar_path) as f:
+            self.metar = json.load(f)
+        self.db_metar = Metar(metar_json=json.dumps(self.metar),
+                              airport=self.db_airport)
+        self.db_metar.full_clean()
+        self.db_metar.save()
+        self.answers = ['Few Clouds', 'Broken Clouds', 'Overcast Clouds']
+        self.db_question = self.helper_create_db_question('What is the reported cloud coverage?', self.answers, QuestionType.CLOUD_COVERAGE)
+
+
+    def helper_create_db_question(self, question_text, answers_text, category):
+        db_answers = []
+        for answer_text in answers_text:
+            db_answer = Answer.objects.get_or_create(text=answer_text)[0]
+            db_answers.append(db_answer)
+        db_question = Question(metar=self.db_metar,
+                               text=question_text,
+                               category=category.value)
+        db_question.full_clean()
+        db_question.save()
+        [db_question.answers.add(db_answer) for db_answer in db_answers]
+        return db_question
+
+
+    def helper_expected_context(self, db_question, answers):
+        airport = {'name': self.db_airport.name,
+                   'city': self.db_airport.city,
+                   'country': self.db_airport.country,
+                   'icao': self.db_airport.icao,
+                   'latitude': self.db_airport.latitude,
+                   'longitude': self.db_airport.longitude}
+        question = {'id': db_question.pk,
+                    'text': db_question.text,
+                    'category': db_question.category,
+                    'answers': [{'text': answer} for answer in answers]}
+        return airport, {'raw': self.metar['raw']}, question
+
+
+    def test_build_question_payload(self):
+        db_payload = build_question_payload(self.db_question)
+        self.assertEquals(db_payload.question, self.db_question)
+        self.assertEquals(db_payload.metar_raw, self.metar['raw'])
+        self.assertEquals(db_payload.airport_icao, 'KJFK')
+        self.assertEquals(db_payload.question_text, self.db_question.text)
+        self.assertEquals(db_payload.question_category, QuestionType.CLOUD_COVERAGE.value)
+        self.assertEquals(db_payload.answers, 'Few Clouds\nBroken Clouds\nOvercast Clouds')
+        self.assertEquals(len(QuestionPayload.objects.all()), 0)
+
+
+    def test_build_question_payload_given_answers(self):
+        db_answers = list(self.db_question.answers.all())
+        db_question = Question.objects.select_related('metar__airport').defer('metar__metar_data').get(pk=self.db_question.pk)
+        with self.assertNumQueries(0):
+            db_payload = build_question_payload(db_question, db_answers)
+        self.assertEquals(db_payload.metar_raw, self.metar['raw'])
+
+
+    def test_get_question_payload(self):
+        build_question_payload(self.db_question).save()
+        with self.assertNumQueries(1):
+            db_payload = get_question_payload(self.db_question.pk)
+        self.assertEquals(db_payload.pk, self.db_question.pk)
+
+
+    def test_get_question_payload_missing(self):
+        db_payload = get_question_payload(self.db_question.pk)
+        self.assertEquals(db_payload.pk, self.db_question.pk)
+        self.assertEquals(len(QuestionPayload.objects.all()), 1)
+
+
+    def test_get_question_payload_question_does_not_exist(self):
+        self.assertIsNone(get_question_payload(self.db_question.pk + 1))
+
+
+    def test_payload_to_context(self):
+        db_payload = build_question_payload(self.db_question)
+        self.assertEquals(payload_to_context(db_payload), self.helper_expected_context(self.db_question, self.answers))
+
+
+    def test_payload_to_context_no_answers(self):
+        db_question = self.helper_create_db_question('What are the reported weather codes?', [], QuestionType.WEATHER_CODES)
+        db_payload = build_question_payload(db_question)
+        self.assertEquals(payload_to_context(db_payload), self.helper_expected_context(db_question, []))
+
+
+    def test_payload_deleted_with_question(self):
+        build_question_payload(self.db_question).save()
+        self.db_question.delete()
+        self.assertEquals(len(QuestionPayload.objects.all()), 0)
+
+
+    def test_rebuild_question_payloads(self):
+        db_question = self.helper_create_db_question('What is the airport ICAO?', ['KJFK'], QuestionType.AIRPORT)
+        build_question_payload(db_question).save()
+        self.assertEquals(rebuild_question_payloads(batch_size=1), 1)
+        self.assertEquals(len(QuestionPayload.objects.all()), 2)
+        self.assertEquals(payload_to_context(QuestionPayload.objects.get(pk=self.db_question.pk)),
+                          self.helper_expected_context(self.db_question, self.answers))
+
+
+    def test_rebuild_question_payloads_db_questions(self):
+        db_question = self.helper_create_db_question('What is the airport ICAO?', ['KJFK'], QuestionType.AIRPORT)
+        QuestionPayload.objects.all().delete()
+        self.assertEquals(rebuild_question_payloads(db_questions=Question.objects.filter(pk=db_question.pk)), 1)
+        self.assertEquals(list(QuestionPayload.objects.values_list('pk', flat=True)), [db_question.pk])
+
+
+    def test_rebuild_question_payloads_all(self):
+        db_payload = build_question_payload(self.db_question)
+        db_payload.question_text = 'This is a stale question string'
+        db_payload.save()
+        self.assertEquals(rebuild_question_payloads(rebuild_all=True), 1)
+        self.assertEquals(QuestionPayload.objects.get(pk=self.db_question.pk).question_text, self.db_question.text)
@@ -0,0 +1,139 @@
+import mock
+from django.test import TestCase
+from django.core.cache import cache
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.urls import reverse
+
+from metar_practice.question_pool import QuestionPool
+from metar_practice.question_pool import invalidate_question_pools
+from metar_practice.question_pool import POOL_GENERATION_CACHE
+from metar_practice.question_pool import POOL_GENERATION_CACHE_KEY
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Question
+
+from metar_practice.enums import QuestionType
+
+from metar_practice.question_payloads import rebuild_question_payloads
+from metar_practice.retention import RetentionEngine
+
+import random
+import tempfile
+
+
+class TestQuestionPool(TestCase):
+
+    def setUp(self):
+        shared_cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(shared_cache_dir.cleanup)
+        shared_cache_settings = self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                                                      'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                                                 'LOCATION': shared_cache_dir.name}})
+        shared_cache_settings.enable()              # Never touch the shared cache directory of a running deployment
+        self.addCleanup(shared_cache_settings.disable)
+        cache.clear()
+        self.now = 1000
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao='KJFK',
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        for i in range(0, 6):
+            db_metar = Metar.objects.create(metar_json='{{"raw": "KJFK {0}"}}'.format(i), airport=db_airport)
+            Question.objects.create(metar=db_metar, text='What is the airport ICAO?', category=QuestionType.AIRPORT.value)
+            Question.objects.create(metar=db_metar, text='What is the wind speed?', category=QuestionType.WIND_SPEED.value)
+        rebuild_question_payloads()
+
+
+    def helper_create_pool(self, **kwargs):
+        return QuestionPool(size=4, low_water=2, refill_async=False, rng=random.Random(1), clock=lambda: self.now, **kwargs)
+
+
+    def test_get_refills_empty_buffer(self):
+        question_pool = self.helper_create_pool()
+        self.assertIsNone(question_pool.get([QuestionType.AIRPORT.value]))
+        self.assertEquals(question_pool.misses, 1)
+        self.assertEquals(len(question_pool.buffers[QuestionType.WIND_SPEED.value]), 4)
+        with self.assertNumQueries(0):
+            db_payload = question_pool.get([QuestionType.AIRPORT.value])
+        self.assertEquals(db_payload.question_category, QuestionType.WIND_SPEED.value)
+        self.assertEquals(question_pool.hits, 1)
+
+
+    def test_load_mixes_positions(self):
+        question_pool = self.helper_create_pool(run_length=1)
+        question_pool.rng = mock.Mock()
+        airport_ids = list(Question.objects.filter(category=QuestionType.AIRPORT.value).order_by('pk').values_list('pk', flat=True))
+        question_pool.rng.randint.side_effect = [airport_ids[4], airport_ids[1], airport_ids[4]]
+        db_payloads = question_pool.load(QuestionType.AIRPORT.value, 3)
+        self.assertEquals(sorted(db_payload.pk for db_payload in db_payloads), [airport_ids[1], airport_ids[4], airport_ids[5]])
+        self.assertEquals(question_pool.rng.randint.call_count, 3)
+
+
+    def test_load_whole_category(self):
+        question_pool = self.helper_create_pool()
+        self.assertEquals(len(question_pool.load(QuestionType.AIRPORT.value, 10)), 6)
+
+
+    def test_get_serves_each_payload_once(self):
+        question_pool = self.helper_create_pool()
+        question_pool.get([QuestionType.AIRPORT.value])
+        question_ids = [question_pool.get([QuestionType.AIRPORT.value]).pk for i in range(0, 4)]
+        self.assertEquals(len(set(question_ids)), 4)
+        self.assertEquals(question_pool.refills, 2)
+
+
+    def test_buffer_bounded(self):
+        question_pool = self.helper_create_pool()
+        for i in range(0, 10):
+            question_pool.get()
+        for buffer in question_pool.buffers.values():
+            self.assertLessEqual(len(buffer), 4)
+
+
+    def test_expired_payloads_dropped(self):
+        question_pool = self.helper_create_pool(max_age=60)
+        question_pool.get([QuestionType.AIRPORT.value])
+        self.now += 61
+        self.assertIsNone(question_pool.get([QuestionType.AIRPORT.value]))
+        self.assertEquals(question_pool.misses, 2)
+
+
+    def test_invalidate(self):
+        question_pool = self.helper_create_pool()
+        question_pool.get([QuestionType.AIRPORT.value])
+        invalidate_question_pools()
+        self.assertIsNone(question_pool.get([QuestionType.AIRPORT.value]))
+        self.assertIsNotNone(question_pool.get([QuestionType.AIRPORT.value]))
+
+
+    def test_invalidate_from_another_process(self):
+        question_pool = self.helper_create_pool()
+        question_pool.get([QuestionType.AIRPORT.value])
+        other_process_cache = FileBasedCache(caches[POOL_GENERATION_CACHE]._dir, {})
+        other_process_cache.set(POOL_GENERATION_CACHE_KEY, 1, None)
+        self.assertIsNone(question_pool.get([QuestionType.AIRPORT.value]))
+
+
+    def test_retention_invalidates(self):
+        question_pool = self.helper_create_pool()
+        question_pool.get([QuestionType.AIRPORT.value])
+        RetentionEngine(10).evict()
+        self.assertIsNone(question_pool.get([QuestionType.AIRPORT.value]))
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_view_uses_pool(self, mock_question_sampler_random_question_id):
+        question_pool = self.helper_create_pool()
+        question_pool.refill(QuestionType.AIRPORT.value)
+        question_pool.refill(QuestionType.WIND_SPEED.value)
+        with mock.patch('metar_practice.views.question_pool', question_pool):
+            response = self.client.get(reverse('metar_practice'))
+        mock_question_sampler_random_question_id.assert_not_called()
+        self.assertEquals(question_pool.hits, 1)
+        self.assertEquals(response.context['airport']['icao'], 'KJFK')
@@ -0,0 +1,206 @@
+import mock
+from django.test import TestCase
+from django.core.cache import cache
+from django.db.models import Count
+
+from metar_practice.question_sampler import QuestionSampler
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Question
+
+from metar_practice.enums import QuestionType
+
+import os
+import json
+import random
+
+
+class TestQuestionSampler(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao='KJFK',
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        metar_path = os.path.join(os.getcwd(), 'metar_practice', 'tests', 'static', 'question_collector', 'sample_metar.json')
+        with open(metar_path) as f:
+            metar_json = json.load(f)
+        self.db_metar = Metar(metar_json=json.dumps(metar_json),
+                              airport=db_airport)
+        self.db_metar.full_clean()
+        self.db_metar.save()
+        self.db_questions = []
+        for category in [QuestionType.AIRPORT, QuestionType.TIME, QuestionType.WIND_SPEED, QuestionType.AIRPORT, QuestionType.TIME]:
+            self.db_questions.append(self.helper_create_db_question(category))
+
+
+    def helper_create_db_question(self, category):
+        db_question = Question(metar=self.db_metar,
+                               text='This is test question string {0}'.format(Question.objects.count()),
+                               category=category.value)
+        db_question.full_clean()
+        db_question.save()
+        return db_question
+
+
+    def helper_create_sampler(self, category, pivot):
+        rng = mock.Mock()
+        rng.choices.return_value = [category.value]
+        rng.randint.return_value = pivot
+        return QuestionSampler(rng=rng)
+
+
+    def test_get_category_stats(self):
+        question_sampler = QuestionSampler()
+        expected = {QuestionType.AIRPORT.value: (2, self.db_questions[0].pk, self.db_questions[3].pk),
+                    QuestionType.TIME.value: (2, self.db_questions[1].pk, self.db_questions[4].pk),
+                    QuestionType.WIND_SPEED.value: (1, self.db_questions[2].pk, self.db_questions[2].pk)}
+        self.assertEquals(question_sampler.get_category_stats(), expected)
+        with self.assertNumQueries(0):
+            self.assertEquals(question_sampler.get_category_stats(), expected)
+
+
+    def test_get_category_stats_empty(self):
+        Question.objects.all().delete()
+        question_sampler = QuestionSampler()
+        self.assertEquals(question_sampler.get_category_stats(), {})
+
+
+    def test_choose_category(self):
+        question_sampler = self.helper_create_sampler(QuestionType.TIME, 0)
+        category_stats = {QuestionType.AIRPORT.value: (4, 1, 4), QuestionType.TIME.value: (1, 5, 5), QuestionType.WIND_SPEED.value: (0, None, None)}
+        self.assertEquals(question_sampler.choose_category(category_stats, []), QuestionType.TIME.value)
+        question_sampler.rng.choices.assert_called_once_with([QuestionType.AIRPORT.value, QuestionType.TIME.value], weights=[4, 1])
+
+
+    def test_choose_category_unwanted_categories(self):
+        question_sampler = self.helper_create_sampler(QuestionType.TIME, 0)
+        category_stats = {QuestionType.AIRPORT.value: (4, 1, 4), QuestionType.TIME.value: (1, 5, 5)}
+        question_sampler.choose_category(category_stats, [QuestionType.AIRPORT.value])
+        question_sampler.rng.choices.assert_called_once_with([QuestionType.TIME.value], weights=[1])
+
+
+    def test_choose_category_unwanted_categories_all(self):
+        question_sampler = self.helper_create_sampler(QuestionType.TIME, 0)
+        category_stats = {QuestionType.AIRPORT.value: (4, 1, 4), QuestionType.TIME.value: (1, 5, 5)}
+        question_sampler.choose_category(category_stats, [QuestionType.AIRPORT.value, QuestionType.TIME.value])
+        question_sampler.rng.choices.assert_called_once_with([QuestionType.AIRPORT.value, QuestionType.TIME.value], weights=[4, 1])
+
+
+    def test_choose_category_empty(self):
+        question_sampler = self.helper_create_sampler(QuestionType.TIME, 0)
+        self.assertIsNone(question_sampler.choose_category({}, []))
+        question_sampler.rng.choices.assert_not_called()
+
+
+    def test_get_random_question_id_id(self):
+        question_sampler = self.helper_create_sampler(QuestionType.AIRPORT, self.db_questions[0].pk)
+        self.assertEquals(question_sampler.get_random_question_id(), self.db_questions[0].pk)
+        question_sampler.rng.randint.assert_called_once_with(self.db_questions[0].pk, self.db_questions[3].pk)
+
+
+    def test_get_random_question_id_empty(self):
+        Question.objects.all().delete()
+        question_sampler = self.helper_create_sampler(QuestionType.AIRPORT, 0)
+        self.assertIsNone(question_sampler.get_random_question_id())
+        question_sampler.rng.randint.assert_not_called()
+
+
+    def test_get_random_question_id_gap(self):
+        question_sampler = self.helper_create_sampler(QuestionType.AIRPORT, self.db_questions[0].pk + 1)
+        self.assertEquals(question_sampler.get_random_question_id(), self.db_questions[3].pk)
+
+
+    def test_get_random_question_id_unwanted_categories(self):
+        question_sampler = self.helper_create_sampler(QuestionType.WIND_SPEED, self.db_questions[2].pk)
+        returned_question_id = question_sampler.get_random_question_id([QuestionType.AIRPORT.value, QuestionType.TIME.value])
+        self.assertEquals(returned_question_id, self.db_questions[2].pk)
+        question_sampler.rng.choices.assert_called_once_with([QuestionType.WIND_SPEED.value], weights=[1])
+
+
+    def test_get_random_question_id_stale_highest(self):
+        question_sampler = self.helper_create_sampler(QuestionType.AIRPORT, self.db_questions[3].pk)
+        question_sampler.get_category_stats()
+        self.db_questions[3].delete()
+        self.assertEquals(question_sampler.get_random_question_id(), self.db_questions[0].pk)
+
+
+    def test_get_random_question_id_stale_category(self):
+        question_sampler = self.helper_create_sampler(QuestionType.WIND_SPEED, self.db_questions[2].pk)
+        question_sampler.get_category_stats()
+        question_sampler.rng.choices.side_effect = [[QuestionType.WIND_SPEED.value], [QuestionType.AIRPORT.value]]
+        self.db_questions[2].delete()
+        self.assertEquals(question_sampler.get_random_question_id(), self.db_questions[3].pk)
+        self.assertEquals(question_sampler.rng.choices.call_count, 2)
+        question_sampler.rng.choices.assert_called_with([QuestionType.AIRPORT.value, QuestionType.TIME.value], weights=[2, 2])
+        self.assertNotIn(QuestionType.WIND_SPEED.value, question_sampler.get_category_stats())
+
+
+    def test_get_random_question_id_query_count(self):
+        question_sampler = self.helper_create_sampler(QuestionType.AIRPORT, self.db_questions[0].pk)
+        with self.assertNumQueries(2):
+            question_sampler.get_random_question_id([QuestionType.TIME.value])
+        with self.assertNumQueries(1):
+            question_sampler.get_random_question_id([QuestionType.TIME.value])
+
+
+    def helper_create_area_sampler(self, category, offset):
+        rng = mock.Mock()
+        rng.choices.return_value = [category.value]
+        rng.randrange.return_value = offset
+        return QuestionSampler(rng=rng)
+
+
+    def test_get_random_question_id_for_airports(self):
+        question_sampler = self.helper_create_area_sampler(QuestionType.TIME, 1)
+        db_airports = Airport.objects.filter(pk=self.db_metar.airport_id)
+        question_id = question_sampler.get_random_question_id_for_airports(db_airports, [QuestionType.AIRPORT.value])
+        self.assertEquals(question_id, self.db_questions[4].pk)
+        question_sampler.rng.choices.assert_called_once_with([QuestionType.TIME.value, QuestionType.WIND_SPEED.value], weights=[2, 1])
+        question_sampler.rng.randrange.assert_called_once_with(2)
+
+
+    def test_get_random_question_id_for_airports_all_unwanted(self):
+        question_sampler = self.helper_create_area_sampler(QuestionType.AIRPORT, 0)
+        db_airports = Airport.objects.filter(pk=self.db_metar.airport_id)
+        unwanted_categories = [QuestionType.AIRPORT.value, QuestionType.TIME.value, QuestionType.WIND_SPEED.value]
+        self.assertEquals(question_sampler.get_random_question_id_for_airports(db_airports, unwanted_categories), self.db_questions[0].pk)
+
+
+    def test_get_random_question_id_for_airports_query_count(self):
+        question_sampler = self.helper_create_area_sampler(QuestionType.AIRPORT, 0)
+        db_airports = Airport.objects.filter(latitude__gte=-90)
+        with self.assertNumQueries(2):
+            question_sampler.get_random_question_id_for_airports(db_airports, [QuestionType.TIME.value])
+
+
+    def test_get_random_question_id_for_airports_sparse_area_spread(self):
+        db_other_airport = Airport(name='London Heathrow Airport', city='London', country='United Kingdom', icao='EGLL', latitude='51.4706', longitude='-0.461941')
+        db_other_airport.full_clean()
+        db_other_airport.save()
+        metar_json = Metar.objects.get(pk=self.db_metar.pk).metar_json
+        categories = [QuestionType.AIRPORT, QuestionType.TIME, QuestionType.WIND_SPEED, QuestionType.WIND_DIRECTION]
+        for i in range(0, 10):
+            for db_airport in [db_other_airport] * 5 + [self.db_metar.airport]:             # Area questions sit after large gaps of ids
+                db_metar = Metar.objects.create(metar_json=metar_json, airport=db_airport)
+                Question.objects.bulk_create([Question(metar=db_metar, text='Question {0}'.format(category.value), category=category.value) for category in categories])
+        question_sampler = QuestionSampler(rng=random.Random(0))
+        db_airports = Airport.objects.filter(pk=self.db_metar.airport_id)
+        counts = {}
+        for i in range(0, 1000):
+            category = Question.objects.get(pk=question_sampler.get_random_question_id_for_airports(db_airports)).category
+            counts[category] = counts.get(category, 0) + 1
+        area_counts = dict(Question.objects.filter(metar__airport__in=db_airports).values_list('category').annotate(count=Count('pk')).order_by())
+        for category, count in area_counts.items():
+            expected = 1000 * count / sum(area_counts.values())
+            self.assertTrue(expected * 0.7 < counts.get(category, 0) < expected * 1.3, (category, counts))
+
+
+    def test_get_random_question_id_for_airports_none(self):
+        self.assertIsNone(QuestionSampler().get_random_question_id_for_airports(Airport.objects.none()))
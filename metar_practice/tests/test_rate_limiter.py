@@ -0,0 +1,66 @@
+from django.test import SimpleTestCase
+
+from metar_practice.rate_limiter import TokenBucket
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+
+    def clock(self):
+        return self.now
+
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(SimpleTestCase):
+
+    def setUp(self):
+        self.fake_clock = FakeClock()
+
+
+    def helper_create_bucket(self, rate, capacity):
+        return TokenBucket(rate, capacity, clock=self.fake_clock.clock, sleep=self.fake_clock.sleep)
+
+
+    def test_acquire_burst(self):
+        token_bucket = self.helper_create_bucket(1, 3)
+        for i in range(0, 3):
+            self.assertEquals(token_bucket.acquire(), 0)
+        self.assertEquals(self.fake_clock.sleeps, [])
+
+
+    def test_acquire_waits_when_empty(self):
+        token_bucket = self.helper_create_bucket(2, 1)
+        token_bucket.acquire()
+        self.assertEquals(token_bucket.acquire(), 0.5)
+        self.assertEquals(self.fake_clock.now, 0.5)
+
+
+    def test_acquire_refills_over_time(self):
+        token_bucket = self.helper_create_bucket(1, 2)
+        token_bucket.acquire()
+        token_bucket.acquire()
+        self.fake_clock.now += 1
+        self.assertEquals(token_bucket.acquire(), 0)
+
+
+    def test_acquire_refill_capped_at_capacity(self):
+        token_bucket = self.helper_create_bucket(1, 2)
+        self.fake_clock.now += 100
+        token_bucket.acquire()
+        token_bucket.acquire()
+        self.assertEquals(token_bucket.acquire(), 1)
+
+
+    def test_acquire_average_rate(self):
+        token_bucket = self.helper_create_bucket(4, 1)
+        for i in range(0, 9):
+            token_bucket.acquire()
+        self.assertAlmostEqual(self.fake_clock.now, 2)
@@ -0,0 +1,135 @@
+from django.test import TestCase
+from django.test import override_settings
+
+from metar_practice.retention import RetentionEngine
+from metar_practice.retention import RetentionReport
+from metar_practice.retention import OLDEST_FIRST
+from metar_practice.retention import BUSIEST_AIRPORT_FIRST
+from metar_practice.retention import RANDOM
+
+from metar_practice.models import Airport
+from metar_practice.models import Metar
+from metar_practice.models import Answer
+from metar_practice.models import Question
+from metar_practice.models import QuestionPayload
+from metar_practice.models import Counter
+
+from metar_practice.question_payloads import build_question_payload
+from metar_practice.enums import QuestionType
+
+from metar_practice import counters
+
+import json
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                           'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'}})
+class TestRetentionEngine(TestCase):
+
+    def setUp(self):
+        self.db_airport_1 = self.helper_create_db_airport('KJFK')
+        self.db_airport_2 = self.helper_create_db_airport('EGLL')
+
+
+    def helper_create_db_airport(self, icao):
+        db_airport = Airport(name='{0} Airport'.format(icao),
+                             city='City',
+                             country='Country',
+                             icao=icao,
+                             latitude='0',
+                             longitude='0')
+        db_airport.full_clean()
+        db_airport.save()
+        return db_airport
+
+
+    def helper_create_db_metar(self, db_airport, question_count):
+        db_metar = Metar(metar_json=json.dumps({'raw': '{0} {1}'.format(db_airport.icao, Metar.objects.count())}),
+                         airport=db_airport)
+        db_metar.full_clean()
+        db_metar.save()
+        for i in range(0, question_count):
+            db_answer = Answer(text='{0} answer {1}'.format(db_metar.pk, i))
+            db_answer.full_clean()
+            db_answer.save()
+            db_question = Question(metar=db_metar,
+                                   text='This is test question string {0}'.format(i),
+                                   category=QuestionType.AIRPORT.value)
+            db_question.full_clean()
+            db_question.save()
+            db_question.answers.add(db_answer)
+            build_question_payload(db_question).save()
+        return db_metar
+
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            RetentionEngine(10, policy='newest')
+
+
+    def test_get_eviction_set_under_limit(self):
+        self.helper_create_db_metar(self.db_airport_1, 3)
+        with self.assertNumQueries(1):
+            self.assertEquals(RetentionEngine(3).get_eviction_set(), ([], 0))
+
+
+    def test_get_eviction_set_oldest_first(self):
+        db_metar_1 = self.helper_create_db_metar(self.db_airport_1, 2)
+        db_metar_2 = self.helper_create_db_metar(self.db_airport_2, 0)
+        db_metar_3 = self.helper_create_db_metar(self.db_airport_1, 2)
+        self.helper_create_db_metar(self.db_airport_2, 2)
+        with self.assertNumQueries(2):
+            metar_ids, question_count = RetentionEngine(3).get_eviction_set()
+        self.assertEquals(metar_ids, [db_metar_1.pk, db_metar_2.pk, db_metar_3.pk])
+        self.assertEquals(question_count, 4)
+
+
+    def test_get_eviction_set_busiest_airport_first(self):
+        db_metar_1 = self.helper_create_db_metar(self.db_airport_1, 1)
+        db_metar_2 = self.helper_create_db_metar(self.db_airport_1, 1)
+        self.helper_create_db_metar(self.db_airport_2, 1)
+        self.helper_create_db_metar(self.db_airport_1, 1)
+        metar_ids, question_count = RetentionEngine(2, policy=BUSIEST_AIRPORT_FIRST).get_eviction_set()
+        self.assertEquals(metar_ids, [db_metar_1.pk, db_metar_2.pk])
+
+
+    def test_get_eviction_set_random(self):
+        for i in range(0, 4):
+            self.helper_create_db_metar(self.db_airport_1, 1)
+        metar_ids, question_count = RetentionEngine(1, policy=RANDOM).get_eviction_set()
+        self.assertEquals(len(set(metar_ids)), 3)
+        self.assertEquals(question_count, 3)
+
+
+    def test_evict(self):
+        db_metar_1 = self.helper_create_db_metar(self.db_airport_1, 2)
+        db_metar_2 = self.helper_create_db_metar(self.db_airport_2, 2)
+        db_metar_3 = self.helper_create_db_metar(self.db_airport_1, 2)
+        report = RetentionEngine(2, batch_size=1).evict()
+        self.assertEquals(list(Metar.objects.all()), [db_metar_3])
+        self.assertEquals(report.metars, 2)
+        self.assertEquals(report.questions, 4)
+        self.assertEquals(len(QuestionPayload.objects.all()), 2)
+        self.assertEquals(Counter.objects.get(name=counters.QUESTIONS_COUNTER).value, 2)
+        self.assertEquals(counters.reconcile()[1], {})
+
+
+    def test_evict_nothing(self):
+        self.helper_create_db_metar(self.db_airport_1, 2)
+        report = RetentionEngine(2).evict()
+        self.assertEquals(report.metars, 0)
+        self.assertEquals(len(Question.objects.all()), 2)
+
+
+class TestRetentionReport(TestCase):
+
+    def test_summary(self):
+        report = RetentionReport()
+        report.metars = 10
+        report.questions = 90
+        report.seconds = 2
+        self.assertEquals(report.summary(), 'Evicted 10 METARs and 90 questions in 2.00s (50 rows/s)')
+
+
+    def test_summary_empty(self):
+        self.assertEquals(RetentionReport().summary(), 'Evicted 0 METARs and 0 questions in 0.00s (0 rows/s)')
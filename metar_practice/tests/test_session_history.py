@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+
+from metar_practice.session_history import HISTORY_SESSION_KEY
+from metar_practice.session_history import pack_question
+from metar_practice.session_history import unpack_question
+from metar_practice.session_history import get_history
+from metar_practice.session_history import add_to_history
+
+from metar_practice.enums import QuestionType
+
+
+class TestSessionHistory(SimpleTestCase):
+
+    def test_pack_unpack(self):
+        for question_type in QuestionType:
+            self.assertEquals(unpack_question(pack_question(123456, question_type.value)), (123456, question_type.value))
+
+
+    def test_get_history_empty(self):
+        self.assertEquals(get_history({}), [])
+
+
+    def test_get_history_skips_unreadable(self):
+        session = {HISTORY_SESSION_KEY: [pack_question(1, QuestionType.TIME.value), {'id': 2}, 31]}
+        self.assertEquals(get_history(session), [(1, QuestionType.TIME.value)])
+
+
+    def test_add_to_history_limit(self):
+        session = {}
+        add_to_history(session, 1, QuestionType.AIRPORT.value, 2)
+        add_to_history(session, 2, QuestionType.TIME.value, 2)
+        add_to_history(session, 3, QuestionType.WIND_GUST.value, 2)
+        self.assertEquals(get_history(session), [(2, QuestionType.TIME.value), (3, QuestionType.WIND_GUST.value)])
+        self.assertEquals(session[HISTORY_SESSION_KEY], [pack_question(2, QuestionType.TIME.value), pack_question(3, QuestionType.WIND_GUST.value)])
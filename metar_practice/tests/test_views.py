@@ -1,15 +1,20 @@
 import mock
 from django.test import TestCase
+from django.test import override_settings
+from django.core.cache import cache
 from unittest.mock import patch
 from unittest.mock import call
 
 from django.urls import reverse
 from django.test.client import Client
 from django.conf import settings
+from django.http import QueryDict
+from django.core.exceptions import ValidationError
 
 from django.forms.models import model_to_dict
 
 from metar_practice.views import metar_practice
+from metar_practice.views import QUESTION_SAMPLES_ALLOWED
 
 from metar_practice.models import Airport
 from metar_practice.models import Metar
@@ -21,13 +26,21 @@ from metar_practice.enums import QuestionType
 
 from metar_practice.forms import ReportForm
 
+from metar_practice.session_history import HISTORY_SESSION_KEY
+from metar_practice.session_history import pack_question
+
+from metar_practice import counters
+
 import os
 import json
 
 
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+@mock.patch('metar_practice.views.QUESTION_POOL_ENABLED', False)
 class TestMetarPracticeView(TestCase):
 
     def setUp(self):
+        cache.clear()
         db_airport = Airport(name='John F Kennedy International Airport',
                              city='New York',
                              country='United States',
@@ -50,9 +63,7 @@ class TestMetarPracticeView(TestCase):
     def helper_create_db_question(self, db_metar, question_text, answers_text, category):
         db_answers = []
         for answer_text in answers_text:
-            db_answer = Answer(text=answer_text)
-            db_answer.full_clean()
-            db_answer.save()
+            db_answer = Answer.objects.get_or_create(text=answer_text)[0]
             db_answers.append(db_answer)
         db_question = Question(metar=db_metar,
                                text=question_text,
@@ -66,9 +77,7 @@ class TestMetarPracticeView(TestCase):
     def helper_create_db_questions(self, db_metar, questions_answers_text, category):
         db_questions = []
         for question_text, answer_text in questions_answers_text:
-            db_answer = Answer(text=answer_text)
-            db_answer.full_clean()
-            db_answer.save()
+            db_answer = Answer.objects.get_or_create(text=answer_text)[0]
             db_question = Question(metar=db_metar,
                                    text=question_text,
                                    category=category.value)
@@ -80,12 +89,23 @@ class TestMetarPracticeView(TestCase):
 
 
     def helper_db_question_to_dict(self, db_question):
-        question = model_to_dict(db_question)
         answers = []
-        for db_answer in question['answers']:
-            answers.append(model_to_dict(db_answer))
-        question['answers'] = answers
-        return question
+        for db_answer in db_question.answers.all():
+            answers.append({'text': db_answer.text})
+        return {'id': db_question.pk,
+                'text': db_question.text,
+                'category': db_question.category,
+                'answers': answers}
+
+
+    def helper_pack_questions(self, questions):
+        return [pack_question(question['id'], question['category']) for question in questions]
+
+
+    def helper_db_airport_to_dict(self, db_airport):
+        airport = model_to_dict(db_airport)
+        del airport['id']
+        return airport
 
 
     def helper_add_db_questions(self):
@@ -119,17 +139,21 @@ class TestMetarPracticeView(TestCase):
 
 
     @mock.patch('metar_practice.views.QUESTIONS_TRACEBACK_ALLOWED', 8)
-    @mock.patch('metar_practice.models.Question.objects.order_by')
-    def test_practice_initial_visit(self, mock_question_order_by):
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_initial_visit(self, mock_question_sampler_random_question_id):
         self.helper_add_db_questions()
         random_db_question = self.db_questions[0]
         random_question = self.helper_db_question_to_dict(random_db_question)
-        mock_question_order_by.side_effect = [Question.objects.filter(pk=random_db_question.pk)]
+        mock_question_sampler_random_question_id.return_value = random_db_question.pk
         response = self.client.get(reverse('metar_practice'))
-        self.assertRaises(KeyError)
-        session = self.client.session
-        self.assertEqual(session['previous_questions'], [random_question])
-        self.assertEqual(session['logged'], None)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertNotIn(HISTORY_SESSION_KEY, self.client.session)
+        self.assertTrue(response.context['sessionless'])
+        self.assertContains(response, '?report={0}'.format(random_db_question.pk))
+        self.assertContains(response, 'data-questions-url="{0}"'.format(reverse('metar_practice_questions')))
+        self.assertContains(response, 'data-question-id="{0}"'.format(random_db_question.pk))
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
         self.assertTemplateUsed(response, 'base.html')
         self.assertTemplateUsed(response, 'metar_practice/sub_base.html')
         self.assertTemplateUsed(response, 'metar_practice/practice.html')
@@ -138,28 +162,139 @@ class TestMetarPracticeView(TestCase):
                                                      {'url': '/METAR_practice', 'traversal': 'METAR_practice'}])
         self.assertEquals(response.context['logged'], None)
         self.assertEquals(response.context['database_data'], {'questions_count': len(self.db_questions), 'airports_count': 1})
-        self.assertEquals(response.context['airport'], model_to_dict(random_db_question.metar.airport))
-        self.assertEquals(response.context['metar'], json.loads(random_db_question.metar.metar_json))
+        self.assertEquals(response.context['airport'], self.helper_db_airport_to_dict(random_db_question.metar.airport))
+        self.assertEquals(response.context['metar'], {'raw': json.loads(random_db_question.metar.metar_json)['raw']})
         self.assertEquals(response.context['question'], random_question)
         self.assertEquals(type(response.context['report_form']), ReportForm)
 
 
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_initial_visit_sessionless_disabled(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        random_question = self.helper_db_question_to_dict(self.db_questions[0])
+        mock_question_sampler_random_question_id.return_value = self.db_questions[0].pk
+        with mock.patch('metar_practice.views.SESSIONLESS_VISITS', False):
+            response = self.client.get(reverse('metar_practice'))
+        session = self.client.session
+        self.assertEqual(session[HISTORY_SESSION_KEY], self.helper_pack_questions([random_question]))
+        self.assertEqual(session['logged'], None)
+        self.assertFalse(response.context['sessionless'])
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_report_link(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        report_question = self.helper_db_question_to_dict(self.db_questions[2])
+        response = self.client.get(reverse('metar_practice'), {'report': self.db_questions[2].pk})
+        mock_question_sampler_random_question_id.assert_not_called()
+        self.assertEquals(response.context['question'], report_question)
+        self.assertFalse(response.context['sessionless'])
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertEqual(self.client.session[HISTORY_SESSION_KEY], self.helper_pack_questions([report_question]))
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_report_link_question_missing(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        mock_question_sampler_random_question_id.return_value = self.db_questions[0].pk
+        response = self.client.get(reverse('metar_practice'), {'report': 'KJFK'})
+        mock_question_sampler_random_question_id.assert_called_once()
+        self.assertEquals(response.context['question'], self.helper_db_question_to_dict(self.db_questions[0]))
+        self.assertFalse(response.context['sessionless'])
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_report_link_question_overflow(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        mock_question_sampler_random_question_id.return_value = self.db_questions[0].pk
+        for report in [str(2 ** 64), '-1', '0']:
+            response = self.client.get(reverse('metar_practice'), {'report': report})
+            self.assertEquals(response.status_code, 200)
+            self.assertEquals(response.context['question'], self.helper_db_question_to_dict(self.db_questions[0]))
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_near(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        response = self.client.get(reverse('metar_practice'), {'near': '40.7,-73.8', 'radius': '50'})
+        self.assertEquals(response.context['airport']['icao'], 'KJFK')
+        mock_question_sampler_random_question_id.assert_not_called()
+
+
+    def test_practice_near_report_link(self):
+        self.helper_add_db_questions()
+        response = self.client.get(reverse('metar_practice'), {'near': '40.7,-73.8', 'radius': '50'})
+        report_url = response.context['report_url']
+        self.assertEquals(QueryDict(report_url[1:]), QueryDict('near=40.7,-73.8&radius=50&report={0}'.format(response.context['question']['id'])))
+        response = self.client.get(reverse('metar_practice') + report_url)
+        self.assertFalse(response.context['sessionless'])
+        self.assertEquals(QueryDict(response.context['report_url'][1:])['near'], '40.7,-73.8')
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_box_no_airports(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        mock_question_sampler_random_question_id.return_value = self.db_questions[0].pk
+        response = self.client.get(reverse('metar_practice'), {'box': '50,-1,52,0'})
+        self.assertEquals(response.context['question'], self.helper_db_question_to_dict(self.db_questions[0]))
+        mock_question_sampler_random_question_id.assert_called_once()
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_question_deleted_before_load(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        deleted_question_id = self.db_questions[0].pk
+        def sample_then_delete(unwanted_question_types):
+            if Question.objects.filter(pk=deleted_question_id).exists():
+                Question.objects.filter(pk=deleted_question_id).delete()        # Pruned after sampling, before the payload is read
+                return deleted_question_id
+            return self.db_questions[1].pk
+        mock_question_sampler_random_question_id.side_effect = sample_then_delete
+        response = self.client.get(reverse('metar_practice'))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(mock_question_sampler_random_question_id.call_count, 2)
+        self.assertEquals(response.context['question'], self.helper_db_question_to_dict(self.db_questions[1]))
+
+
+    @mock.patch('metar_practice.views.SESSIONLESS_VISITS', False)
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_question_deleted_every_sample(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        mock_question_sampler_random_question_id.return_value = self.db_questions[-1].pk + 1
+        response = self.client.get(reverse('metar_practice'))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(mock_question_sampler_random_question_id.call_count, QUESTION_SAMPLES_ALLOWED)
+        self.assertEquals(response.context['question'], None)
+        self.assertContains(response, 'No questions are available right now')
+        self.assertNotIn(HISTORY_SESSION_KEY, self.client.session)
+
+
+    def test_practice_no_questions(self):
+        response = self.client.get(reverse('metar_practice'))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.context['question'], None)
+        self.assertContains(response, 'No questions are available right now')
+        self.assertNotContains(response, 'airport_location')
+
+
     @mock.patch('metar_practice.views.QUESTIONS_TRACEBACK_ALLOWED', 8)
-    @mock.patch('metar_practice.models.Question.objects.order_by')
-    def test_practice_revisit(self, mock_question_order_by):
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_revisit(self, mock_question_sampler_random_question_id):
         self.helper_add_db_questions()
         random_db_question = self.db_questions[1]
         random_question = self.helper_db_question_to_dict(random_db_question)
-        mock_question_order_by.side_effect = [Question.objects.filter(pk=random_db_question.pk)]
+        mock_question_sampler_random_question_id.return_value = random_db_question.pk
         session = self.client.session
         previous_questions = [self.helper_db_question_to_dict(self.db_questions[0])]
-        session['previous_questions'] = previous_questions
+        session[HISTORY_SESSION_KEY] = self.helper_pack_questions(previous_questions)
         session['logged'] = None
         session.save()
         response = self.client.get(reverse('metar_practice'))
         session = self.client.session
+        mock_question_sampler_random_question_id.assert_called_once_with([QuestionType.AIRPORT.value])
         previous_questions.append(random_question)
-        self.assertEqual(session['previous_questions'], previous_questions)
+        self.assertEqual(session[HISTORY_SESSION_KEY], self.helper_pack_questions(previous_questions))
         self.assertEqual(session['logged'], None)
         self.assertTemplateUsed(response, 'base.html')
         self.assertTemplateUsed(response, 'metar_practice/sub_base.html')
@@ -169,15 +304,15 @@ class TestMetarPracticeView(TestCase):
                                                      {'url': '/METAR_practice', 'traversal': 'METAR_practice'}])
         self.assertEquals(response.context['logged'], None)
         self.assertEquals(response.context['database_data'], {'questions_count': len(self.db_questions), 'airports_count': 1})
-        self.assertEquals(response.context['airport'], model_to_dict(random_db_question.metar.airport))
-        self.assertEquals(response.context['metar'], json.loads(random_db_question.metar.metar_json))
+        self.assertEquals(response.context['airport'], self.helper_db_airport_to_dict(random_db_question.metar.airport))
+        self.assertEquals(response.context['metar'], {'raw': json.loads(random_db_question.metar.metar_json)['raw']})
         self.assertEquals(response.context['question'], random_question)
         self.assertEquals(type(response.context['report_form']), ReportForm)
 
 
     @mock.patch('metar_practice.views.QUESTIONS_TRACEBACK_ALLOWED', 3)
-    @mock.patch('metar_practice.models.Question.objects.order_by')
-    def test_practice_overlimit(self, mock_question_order_by):
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_overlimit(self, mock_question_sampler_random_question_id):
         QUESTIONS_TRACEBACK_ALLOWED = 3
         self.helper_add_db_questions()
         previous_questions = []
@@ -185,15 +320,15 @@ class TestMetarPracticeView(TestCase):
             previous_questions.append(self.helper_db_question_to_dict(self.db_questions[i]))
         random_db_question = self.db_questions[QUESTIONS_TRACEBACK_ALLOWED]
         random_question = self.helper_db_question_to_dict(random_db_question)
-        mock_question_order_by.side_effect = [Question.objects.filter(pk=random_db_question.pk)]
+        mock_question_sampler_random_question_id.return_value = random_db_question.pk
         session = self.client.session
-        session['previous_questions'] = previous_questions
+        session[HISTORY_SESSION_KEY] = self.helper_pack_questions(previous_questions)
         session['logged'] = None
         session.save()
         response = self.client.get(reverse('metar_practice'))
         session = self.client.session
         previous_questions.append(random_question)
-        self.assertEqual(session['previous_questions'], previous_questions[1::])
+        self.assertEqual(session[HISTORY_SESSION_KEY], self.helper_pack_questions(previous_questions[1::]))
         self.assertEqual(session['logged'], None)
         self.assertTemplateUsed(response, 'base.html')
         self.assertTemplateUsed(response, 'metar_practice/sub_base.html')
@@ -203,22 +338,22 @@ class TestMetarPracticeView(TestCase):
                                                      {'url': '/METAR_practice', 'traversal': 'METAR_practice'}])
         self.assertEquals(response.context['logged'], None)
         self.assertEquals(response.context['database_data'], {'questions_count': len(self.db_questions), 'airports_count': 1})
-        self.assertEquals(response.context['airport'], model_to_dict(random_db_question.metar.airport))
-        self.assertEquals(response.context['metar'], json.loads(random_db_question.metar.metar_json))
+        self.assertEquals(response.context['airport'], self.helper_db_airport_to_dict(random_db_question.metar.airport))
+        self.assertEquals(response.context['metar'], {'raw': json.loads(random_db_question.metar.metar_json)['raw']})
         self.assertEquals(response.context['question'], random_question)
         self.assertEquals(type(response.context['report_form']), ReportForm)
 
 
-    @mock.patch('metar_practice.models.Question.objects.order_by')
-    def test_practice_post_form(self, mock_question_order_by):
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_post_form(self, mock_question_sampler_random_question_id):
         self.helper_add_db_questions()
         random_db_question = self.db_questions[1]
         random_question = self.helper_db_question_to_dict(random_db_question)
         form_db_question = self.db_questions[0]
-        mock_question_order_by.side_effect = [Question.objects.filter(pk=random_db_question.pk)]
+        mock_question_sampler_random_question_id.return_value = random_db_question.pk
         session = self.client.session
         previous_questions = [self.helper_db_question_to_dict(form_db_question)]
-        session['previous_questions'] = previous_questions
+        session[HISTORY_SESSION_KEY] = self.helper_pack_questions(previous_questions)
         session['logged'] = None
         session.save()
         description = 'The ICAO is incorrectly saying EGLL.'
@@ -232,7 +367,7 @@ class TestMetarPracticeView(TestCase):
         self.assertRedirects(response, '/METAR_practice/')
         session = self.client.session
         previous_questions.append(random_question)
-        self.assertEqual(session['previous_questions'], previous_questions)
+        self.assertEqual(session[HISTORY_SESSION_KEY], self.helper_pack_questions(previous_questions))
         self.assertEqual(session['logged'], None)
         self.assertTemplateUsed(response, 'base.html')
         self.assertTemplateUsed(response, 'metar_practice/sub_base.html')
@@ -242,25 +377,57 @@ class TestMetarPracticeView(TestCase):
                                                      {'url': '/METAR_practice', 'traversal': 'METAR_practice'}])
         self.assertEquals(response.context['logged'], 'Thank you. Your issue has been logged.')
         self.assertEquals(response.context['database_data'], {'questions_count': len(self.db_questions), 'airports_count': 1})
-        self.assertEquals(response.context['airport'], model_to_dict(random_db_question.metar.airport))
-        self.assertEquals(response.context['metar'], json.loads(random_db_question.metar.metar_json))
+        self.assertEquals(response.context['airport'], self.helper_db_airport_to_dict(random_db_question.metar.airport))
+        self.assertEquals(response.context['metar'], {'raw': json.loads(random_db_question.metar.metar_json)['raw']})
         self.assertEquals(response.context['question'], random_question)
         self.assertEquals(type(response.context['report_form']), ReportForm)
 
 
-    @mock.patch('metar_practice.models.Question.objects.order_by')
-    def test_practice_post_form_multiple_previous_question(self, mock_question_order_by):
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_post_form_question_posted(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        mock_question_sampler_random_question_id.return_value = self.db_questions[1].pk
+        session = self.client.session
+        session[HISTORY_SESSION_KEY] = self.helper_pack_questions([self.helper_db_question_to_dict(self.db_questions[0])])
+        session.save()
+        description = 'The wind direction is wrong.'
+        response = self.client.post(reverse('metar_practice'), {'description': description, 'question': self.db_questions[2].pk}, follow=True)
+        self.assertRedirects(response, '/METAR_practice/')
+        self.assertEquals(Report.objects.get(description=description).question, self.db_questions[2])
+        self.assertContains(response, 'name="question" value="{0}"'.format(self.db_questions[1].pk))
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_post_form_question_overflow(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        mock_question_sampler_random_question_id.return_value = self.db_questions[1].pk
+        response = self.client.post(reverse('metar_practice'), {'description': 'Wrong', 'question': str(2 ** 64)})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(Report.objects.all()), 0)
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_exclude(self, mock_question_sampler_random_question_id):
+        self.helper_add_db_questions()
+        mock_question_sampler_random_question_id.return_value = self.db_questions[0].pk
+        exclude = [QuestionType.TIME.value, 'NOT_A_CATEGORY', QuestionType.WIND_SPEED.value]
+        self.client.get(reverse('metar_practice'), {'exclude': ','.join(exclude)})
+        mock_question_sampler_random_question_id.assert_called_once_with([QuestionType.TIME.value, QuestionType.WIND_SPEED.value])
+
+
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_post_form_multiple_previous_question(self, mock_question_sampler_random_question_id):
         self.helper_add_db_questions()
         random_db_question = self.db_questions[1]
         random_question = self.helper_db_question_to_dict(random_db_question)
         form_db_question = self.db_questions[0]
-        mock_question_order_by.side_effect = [Question.objects.filter(pk=random_db_question.pk)]
+        mock_question_sampler_random_question_id.return_value = random_db_question.pk
         session = self.client.session
         previous_questions = [self.helper_db_question_to_dict(self.db_questions[2]),
                               self.helper_db_question_to_dict(self.db_questions[3]),
                               self.helper_db_question_to_dict(self.db_questions[4]),
                               self.helper_db_question_to_dict(form_db_question)]
-        session['previous_questions'] = previous_questions
+        session[HISTORY_SESSION_KEY] = self.helper_pack_questions(previous_questions)
         session['logged'] = None
         session.save()
         description = 'The ICAO is incorrectly saying EGLL.'
@@ -274,7 +441,7 @@ class TestMetarPracticeView(TestCase):
         self.assertRedirects(response, '/METAR_practice/')
         session = self.client.session
         previous_questions.append(random_question)
-        self.assertEqual(session['previous_questions'], previous_questions)
+        self.assertEqual(session[HISTORY_SESSION_KEY], self.helper_pack_questions(previous_questions))
         self.assertEqual(session['logged'], None)
         self.assertTemplateUsed(response, 'base.html')
         self.assertTemplateUsed(response, 'metar_practice/sub_base.html')
@@ -284,23 +451,23 @@ class TestMetarPracticeView(TestCase):
                                                      {'url': '/METAR_practice', 'traversal': 'METAR_practice'}])
         self.assertEquals(response.context['logged'], 'Thank you. Your issue has been logged.')
         self.assertEquals(response.context['database_data'], {'questions_count': len(self.db_questions), 'airports_count': 1})
-        self.assertEquals(response.context['airport'], model_to_dict(random_db_question.metar.airport))
-        self.assertEquals(response.context['metar'], json.loads(random_db_question.metar.metar_json))
+        self.assertEquals(response.context['airport'], self.helper_db_airport_to_dict(random_db_question.metar.airport))
+        self.assertEquals(response.context['metar'], {'raw': json.loads(random_db_question.metar.metar_json)['raw']})
         self.assertEquals(response.context['question'], random_question)
         self.assertEquals(type(response.context['report_form']), ReportForm)
 
 
 
-    @mock.patch('metar_practice.models.Question.objects.order_by')
-    def test_practice_post_form_error_not_valid(self, mock_question_order_by):
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_post_form_error_not_valid(self, mock_question_sampler_random_question_id):
         self.helper_add_db_questions()
         random_db_question = self.db_questions[1]
         random_question = self.helper_db_question_to_dict(random_db_question)
         form_db_question = self.db_questions[0]
-        mock_question_order_by.side_effect = [Question.objects.filter(pk=random_db_question.pk)]
+        mock_question_sampler_random_question_id.return_value = random_db_question.pk
         session = self.client.session
         previous_questions = [self.helper_db_question_to_dict(form_db_question)]
-        session['previous_questions'] = previous_questions
+        session[HISTORY_SESSION_KEY] = self.helper_pack_questions(previous_questions)
         session['logged'] = None
         session.save()
         description = 'The ICAO is incorrectly saying EGLL.'
@@ -309,7 +476,7 @@ class TestMetarPracticeView(TestCase):
         self.assertEquals(len(Report.objects.all()), 0)
         session = self.client.session
         previous_questions.append(random_question)
-        self.assertEqual(session['previous_questions'], previous_questions)
+        self.assertEqual(session[HISTORY_SESSION_KEY], self.helper_pack_questions(previous_questions))
         self.assertEqual(session['logged'], None)
         self.assertTemplateUsed(response, 'base.html')
         self.assertTemplateUsed(response, 'metar_practice/sub_base.html')
@@ -319,27 +486,28 @@ class TestMetarPracticeView(TestCase):
                                                      {'url': '/METAR_practice', 'traversal': 'METAR_practice'}])
         self.assertEquals(response.context['logged'], None)
         self.assertEquals(response.context['database_data'], {'questions_count': len(self.db_questions), 'airports_count': 1})
-        self.assertEquals(response.context['airport'], model_to_dict(random_db_question.metar.airport))
-        self.assertEquals(response.context['metar'], json.loads(random_db_question.metar.metar_json))
+        self.assertEquals(response.context['airport'], self.helper_db_airport_to_dict(random_db_question.metar.airport))
+        self.assertEquals(response.context['metar'], {'raw': json.loads(random_db_question.metar.metar_json)['raw']})
         self.assertEquals(response.context['question'], random_question)
         self.assertEquals(type(response.context['report_form']), ReportForm)
 
 
-    @mock.patch('metar_practice.models.Question.objects.order_by')
-    def test_practice_post_form_error_question_does_not_exist(self, mock_question_order_by):
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_post_form_error_question_does_not_exist(self, mock_question_sampler_random_question_id):
         self.helper_add_db_questions()
         random_db_question = self.db_questions[1]
         random_question = self.helper_db_question_to_dict(random_db_question)
         form_db_question = self.db_questions[0]
-        mock_question_order_by.side_effect = [Question.objects.filter(pk=random_db_question.pk)]
+        mock_question_sampler_random_question_id.return_value = random_db_question.pk
         session = self.client.session
         previous_questions = [self.helper_db_question_to_dict(form_db_question)]
-        session['previous_questions'] = previous_questions
+        session[HISTORY_SESSION_KEY] = self.helper_pack_questions(previous_questions)
         session['logged'] = None
         session.save()
         description = 'The ICAO is incorrectly saying EGLL.'
         form = {'description': description}
         form_db_question.delete()
+        counters.reconcile()                        # Deleted questions are uncounted by the next reconcile
         response = self.client.post(reverse('metar_practice'), form, follow=True)
         self.assertRaises(Question.DoesNotExist)
         try:
@@ -349,7 +517,7 @@ class TestMetarPracticeView(TestCase):
             pass
         session = self.client.session
         previous_questions.append(random_question)
-        self.assertEqual(session['previous_questions'], previous_questions)
+        self.assertEqual(session[HISTORY_SESSION_KEY], self.helper_pack_questions(previous_questions))
         self.assertEqual(session['logged'], None)
         self.assertTemplateUsed(response, 'base.html')
         self.assertTemplateUsed(response, 'metar_practice/sub_base.html')
@@ -359,24 +527,24 @@ class TestMetarPracticeView(TestCase):
                                                      {'url': '/METAR_practice', 'traversal': 'METAR_practice'}])
         self.assertEquals(response.context['logged'], None)
         self.assertEquals(response.context['database_data'], {'questions_count': len(self.db_questions)-1, 'airports_count': 1})
-        self.assertEquals(response.context['airport'], model_to_dict(random_db_question.metar.airport))
-        self.assertEquals(response.context['metar'], json.loads(random_db_question.metar.metar_json))
+        self.assertEquals(response.context['airport'], self.helper_db_airport_to_dict(random_db_question.metar.airport))
+        self.assertEquals(response.context['metar'], {'raw': json.loads(random_db_question.metar.metar_json)['raw']})
         self.assertEquals(response.context['question'], random_question)
         self.assertEquals(type(response.context['report_form']), ReportForm)
 
 
-    @mock.patch('metar_practice.models.Question.objects.order_by')
-    def test_practice_post_form_error_previous_questions_empty(self, mock_question_order_by):
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_post_form_error_previous_questions_empty(self, mock_question_sampler_random_question_id):
         self.helper_add_db_questions()
         random_db_question = self.db_questions[0]
         random_question = self.helper_db_question_to_dict(random_db_question)
-        mock_question_order_by.side_effect = [Question.objects.filter(pk=random_db_question.pk)]
+        mock_question_sampler_random_question_id.return_value = random_db_question.pk
         description = 'The ICAO is incorrectly saying EGLL.'
         form = {'description': description}
         response = self.client.post(reverse('metar_practice'), form, follow=True)
         self.assertEquals(len(Report.objects.all()), 0)
         session = self.client.session
-        self.assertEqual(session['previous_questions'], [random_question])
+        self.assertEqual(session[HISTORY_SESSION_KEY], self.helper_pack_questions([random_question]))
         self.assertEqual(session['logged'], None)
         self.assertTemplateUsed(response, 'base.html')
         self.assertTemplateUsed(response, 'metar_practice/sub_base.html')
@@ -386,8 +554,172 @@ class TestMetarPracticeView(TestCase):
                                                      {'url': '/METAR_practice', 'traversal': 'METAR_practice'}])
         self.assertEquals(response.context['logged'], None)
         self.assertEquals(response.context['database_data'], {'questions_count': len(self.db_questions), 'airports_count': 1})
-        self.assertEquals(response.context['airport'], model_to_dict(random_db_question.metar.airport))
-        self.assertEquals(response.context['metar'], json.loads(random_db_question.metar.metar_json))
+        self.assertEquals(response.context['airport'], self.helper_db_airport_to_dict(random_db_question.metar.airport))
+        self.assertEquals(response.context['metar'], {'raw': json.loads(random_db_question.metar.metar_json)['raw']})
         self.assertEquals(response.context['question'], random_question)
         self.assertEquals(type(response.context['report_form']), ReportForm)
 
+
+
+@mock.patch('metar_practice.views.QUESTION_POOL_ENABLED', False)
+class TestMetarPracticeSignedCookieSession(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao='KJFK',
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        self.db_metar = Metar(metar_json='{"raw": "KJFK 271551Z"}', airport=db_airport)
+        self.db_metar.full_clean()
+        self.db_metar.save()
+        self.db_question = Question(metar=self.db_metar, text='What is the airport ICAO?', category=QuestionType.AIRPORT.value)
+        self.db_question.full_clean()
+        self.db_question.save()
+
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    @mock.patch('metar_practice.question_sampler.QuestionSampler.get_random_question_id')
+    def test_practice_history_in_cookie(self, mock_question_sampler_random_question_id):
+        mock_question_sampler_random_question_id.return_value = self.db_question.pk
+        self.client.get(reverse('metar_practice'), {'report': self.db_question.pk})
+        with self.assertNumQueries(1):
+            self.client.get(reverse('metar_practice'))
+        mock_question_sampler_random_question_id.assert_called_with([QuestionType.AIRPORT.value])
+        self.assertLess(len(self.client.cookies[settings.SESSION_COOKIE_NAME].value), 200)
+
+
+class TestMetarPracticeQuestionsApi(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao='KJFK',
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        db_metar = Metar(metar_json='{"raw": "KJFK 271551Z 35021G29KT"}', airport=db_airport)
+        db_metar.full_clean()
+        db_metar.save()
+        db_answer = Answer.objects.create(text='KJFK')
+        for question_type in [QuestionType.AIRPORT, QuestionType.TIME, QuestionType.WIND_SPEED]:
+            db_question = Question(metar=db_metar, text='What is the {0}?'.format(question_type.value), category=question_type.value)
+            db_question.full_clean()
+            db_question.save()
+            db_question.answers.add(db_answer)
+
+
+    def test_questions(self):
+        response = self.client.get(reverse('metar_practice_questions'), {'count': 3})
+        self.assertEquals(response.status_code, 200)
+        questions = response.json()['questions']
+        self.assertEquals(len(questions), 3)
+        self.assertEquals(set(question['question']['category'] for question in questions),
+                          set([QuestionType.AIRPORT.value, QuestionType.TIME.value, QuestionType.WIND_SPEED.value]))
+        self.assertEquals(questions[0]['airport']['icao'], 'KJFK')
+        self.assertEquals(questions[0]['metar'], {'raw': 'KJFK 271551Z 35021G29KT'})
+        self.assertEquals(questions[0]['question']['answers'], [{'text': 'KJFK'}])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+
+    def test_questions_exclude(self):
+        response = self.client.get(reverse('metar_practice_questions'), {'count': 1, 'exclude': 'AIRPORT,TIME,NOT_A_CATEGORY'})
+        self.assertEquals(response.json()['questions'][0]['question']['category'], QuestionType.WIND_SPEED.value)
+
+
+    def test_questions_max_count(self):
+        response = self.client.get(reverse('metar_practice_questions'), {'count': 100})
+        self.assertEquals(len(response.json()['questions']), 20)
+
+
+    def test_questions_invalid_count(self):
+        response = self.client.get(reverse('metar_practice_questions'), {'count': 'all'})
+        self.assertEquals(response.status_code, 400)
+
+
+    def test_questions_seed(self):
+        first_response = self.client.get(reverse('metar_practice_questions'), {'count': 3, 'seed': 7})
+        second_response = self.client.get(reverse('metar_practice_questions'), {'count': 3, 'seed': 7})
+        self.assertEquals(first_response.json(), second_response.json())
+        self.assertEquals(first_response.json()['seed'], 7)
+        self.assertEquals(first_response['ETag'], second_response['ETag'])
+        self.assertIn('max-age=60', first_response['Cache-Control'])
+        self.assertIn('public', first_response['Cache-Control'])
+
+
+    def test_questions_not_modified(self):
+        response = self.client.get(reverse('metar_practice_questions'), {'count': 3, 'seed': 7})
+        response = self.client.get(reverse('metar_practice_questions'), {'count': 3, 'seed': 7}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEquals(response.status_code, 304)
+        self.assertEquals(response.content, b'')
+
+
+class TestMetarPracticeReport(TestCase):
+
+    def setUp(self):
+        db_airport = Airport(name='John F Kennedy International Airport',
+                             city='New York',
+                             country='United States',
+                             icao='KJFK',
+                             latitude='40.63980103',
+                             longitude='-73.77890015')
+        db_airport.full_clean()
+        db_airport.save()
+        db_metar = Metar(metar_json='{"raw": "KJFK 271551Z 35021G29KT"}', airport=db_airport)
+        db_metar.full_clean()
+        db_metar.save()
+        self.db_question = Question(metar=db_metar, text='What is the airport ICAO?', category=QuestionType.AIRPORT.value)
+        self.db_question.full_clean()
+        self.db_question.save()
+
+
+    def test_report(self):
+        description = 'The ICAO is incorrectly saying EGLL.'
+        response = self.client.post(reverse('metar_practice_report'), {'description': description, 'question': self.db_question.pk})
+        self.assertEquals(response.json(), {'logged': 'Thank you. Your issue has been logged.'})
+        self.assertEquals(Report.objects.get(description=description).question, self.db_question)
+
+
+    def test_report_question_does_not_exist(self):
+        response = self.client.post(reverse('metar_practice_report'), {'description': 'Wrong', 'question': self.db_question.pk + 1})
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(len(Report.objects.all()), 0)
+
+
+    def test_report_question_missing(self):
+        response = self.client.post(reverse('metar_practice_report'), {'description': 'Wrong'})
+        self.assertEquals(response.status_code, 400)
+        self.assertIn('question', response.json()['error'])
+        self.assertEquals(len(Report.objects.all()), 0)
+
+
+    def test_report_question_overflow(self):
+        response = self.client.post(reverse('metar_practice_report'), {'description': 'Wrong', 'question': str(2 ** 64)})
+        self.assertEquals(response.status_code, 400)
+        self.assertIn('question', response.json()['error'])
+        self.assertEquals(len(Report.objects.all()), 0)
+
+
+    def test_report_not_valid(self):
+        response = self.client.post(reverse('metar_practice_report'), {'question': self.db_question.pk})
+        self.assertEquals(response.status_code, 400)
+        self.assertIn('description', response.json()['error'])
+
+
+    @mock.patch('metar_practice.models.Report.full_clean')
+    def test_report_validation_error(self, mock_report_full_clean):
+        mock_report_full_clean.side_effect = ValidationError({'description': 'Not valid'})
+        response = self.client.post(reverse('metar_practice_report'), {'description': 'Wrong', 'question': self.db_question.pk})
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(len(Report.objects.all()), 0)
+
+
+    def test_report_get(self):
+        self.assertEquals(self.client.get(reverse('metar_practice_report')).status_code, 405)
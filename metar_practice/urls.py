@@ -5,4 +5,6 @@ from . import views
 
 urlpatterns = [
     path('METAR_practice/', views.metar_practice, name='metar_practice'),
+    path('METAR_practice/questions/', views.metar_practice_questions, name='metar_practice_questions'),
+    path('METAR_practice/report/', views.metar_practice_report, name='metar_practice_report'),
 ]
@@ -1,73 +1,160 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
-from django.forms.models import model_to_dict
+from django.views.decorators.http import require_POST
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import decorator_from_middleware
+from django.middleware.http import ConditionalGetMiddleware
 
 from common.utils import get_url
 
-from metar_practice.models import Airport
 from metar_practice.models import Question
 
 from metar_practice.forms import ReportForm
 
-import json
+from metar_practice.question_sampler import QuestionSampler
+from metar_practice.question_pool import QuestionPool
+from metar_practice.question_payloads import get_question_payload
+from metar_practice.question_payloads import payload_to_context
+from metar_practice.airport_geo import get_selected_airports
+from metar_practice.session_history import get_history
+from metar_practice.session_history import add_to_history
+from metar_practice.session_history import CATEGORIES
+
+from metar_practice import counters
+
+import random
 
 
 QUESTIONS_TRACEBACK_ALLOWED = 10
+SESSIONLESS_VISITS = True               # Visitors without a session cookie are shown questions without a session or CSRF token
+REPORT_QUESTION_PARAM = 'report'        # ?report=QUESTION_ID shows that question with the report form, starting a session
+REPORT_QUESTION_FIELD = 'question'      # Posted with a report, the question on screen which may have been swapped in without a reload
+QUESTION_POOL_ENABLED = True            # Serve questions from this worker's QuestionPool, the sampler is used when it runs dry
+QUESTIONS_API_COUNT = 5                 # Questions returned by the JSON API when no ?count= is given
+QUESTIONS_API_MAX_COUNT = 20            # Most questions the JSON API returns in one call
+QUESTIONS_API_MAX_AGE = 60              # Seconds clients and proxies may cache a seeded JSON API response
+QUESTION_SAMPLES_ALLOWED = 3            # Questions sampled per page view before showing no question, one may be pruned before it loads
+MAX_QUESTION_ID = 2 ** 63 - 1           # Largest primary key the database can store
+REPORT_LOGGED_MESSAGE = 'Thank you. Your issue has been logged.'
+
+question_pool = QuestionPool()
+
+
+def is_sessionless(request):
+    """  Determines if a request can be served without reading or writing a session, only plain visits without a session cookie """
+    return SESSIONLESS_VISITS and \
+           request.method == 'GET' and \
+           settings.SESSION_COOKIE_NAME not in request.COOKIES and \
+           REPORT_QUESTION_PARAM not in request.GET
+
+
+def get_report_question_id(params, name=REPORT_QUESTION_PARAM):
+    """  Returns question id asked for by ?report= or the named parameter, or None without a valid one """
+    try:
+        question_id = int(params[name])
+    except (KeyError, ValueError) as e:
+        return None
+    if question_id < 1 or question_id > MAX_QUESTION_ID:
+        return None                                 # Larger ids overflow the database integer
+    return question_id
+
+
+def get_report_url(params, question_id):
+    """  Returns the ?report= link for a question, keeping the page's other parameters such as ?near= and ?box= """
+    params = params.copy()
+    params[REPORT_QUESTION_PARAM] = question_id
+    return '?{0}'.format(params.urlencode())
+
+
+def get_excluded_categories(params):
+    """  Returns known categories given by ?exclude=CATEGORY,CATEGORY """
+    return [category for category in params.get('exclude', '').split(',') if category in CATEGORIES]
+
+
+def choose_question_id(question_sampler, db_airports, unwanted_question_types):
+    """  Picks random question id from the selected airports if any have questions, otherwise from every airport """
+    question_id = None
+    if db_airports is not None:
+        question_id = question_sampler.get_random_question_id_for_airports(db_airports, unwanted_question_types)
+    if question_id is None:
+        question_id = question_sampler.get_random_question_id(unwanted_question_types)
+    return question_id
+
+
+def sample_question_payload(question_sampler, db_airports, unwanted_question_types):
+    """  Samples questions until one's payload loads as a sampled question can be pruned before it is read, or None if none can be """
+    for i in range(0, QUESTION_SAMPLES_ALLOWED):
+        question_id = choose_question_id(question_sampler, db_airports, unwanted_question_types)
+        if question_id is None:
+            return None
+        db_payload = get_question_payload(question_id)
+        if db_payload is not None:
+            return db_payload
+    return None
 
 
 def metar_practice(request):
     """  Responsible for displaying user with data and handling reports made by user """
+    sessionless = is_sessionless(request)
     previous_questions = []
     logged = None
 
-    try:
-        previous_questions = request.session['previous_questions']
-        logged = request.session['logged']
-    except KeyError as e:
-        print(e)
+    if not sessionless:
+        previous_questions = get_history(request.session)
+        try:
+            logged = request.session['logged']
+        except KeyError as e:
+            print(e)
 
     try:
         if request.method == 'POST':
             report_form = ReportForm(request.POST)
-            if report_form.is_valid() and len(previous_questions) >= 1:
+            question_id = get_report_question_id(request.POST, REPORT_QUESTION_FIELD)
+            if question_id is None and len(previous_questions) >= 1:
+                question_id = previous_questions[-1][0]
+            if report_form.is_valid() and question_id is not None:
                 report = report_form.save(commit=False)
-                report.question = Question.objects.get(id=previous_questions[-1]['id'])
+                report.question = Question.objects.get(id=question_id)
                 report.full_clean()
                 report.save()
-                request.session['logged'] = 'Thank you. Your issue has been logged.'
+                request.session['logged'] = REPORT_LOGGED_MESSAGE
                 return redirect('metar_practice')
-    except Question.DoesNotExist as e:
+    except (Question.DoesNotExist, ValidationError) as e:
         print(e)
 
     airport = None
     metar = None
     question = None
 
-    unwanted_question_types = [question['category'] for question in previous_questions]
-
-    while True:
-        db_question = Question.objects.order_by('?').first()
-        if db_question.category not in unwanted_question_types:
-            db_metar = db_question.metar
-            metar = json.loads(db_metar.metar_json)
-            airport = model_to_dict(db_metar.airport)
-            question = model_to_dict(db_question)
-            answers = []
-            for db_answer in question['answers']:
-                answers.append(model_to_dict(db_answer))
-            question['answers'] = answers
-            break
-
-    previous_questions.append(question)
-    while len(previous_questions) > QUESTIONS_TRACEBACK_ALLOWED:
-        previous_questions.pop(0)
-
-    request.session['previous_questions'] = previous_questions
-    if logged is not None:
-        request.session['logged'] = None
-    else:
-        request.session['logged'] = logged
-
-    database_data = {'questions_count': Question.objects.count(), 'airports_count': Airport.objects.count()}
+    unwanted_question_types = [category for question_id, category in previous_questions]
+    unwanted_question_types = (unwanted_question_types + get_excluded_categories(request.GET))[-QUESTIONS_TRACEBACK_ALLOWED:]   # Shown by the page without a reload
+
+    db_payload = None
+    report_question_id = get_report_question_id(request.GET)
+    if report_question_id is not None:
+        db_payload = get_question_payload(report_question_id)
+    db_airports = None
+    if db_payload is None:
+        db_airports = get_selected_airports(request.GET)
+    if db_payload is None and db_airports is None and QUESTION_POOL_ENABLED:
+        db_payload = question_pool.get(unwanted_question_types)
+    if db_payload is None:
+        db_payload = sample_question_payload(QuestionSampler(), db_airports, unwanted_question_types)
+    if db_payload is not None:
+        airport, metar, question = payload_to_context(db_payload)
+
+    if not sessionless:
+        if question is not None:
+            add_to_history(request.session, question['id'], question['category'], QUESTIONS_TRACEBACK_ALLOWED)
+        if logged is not None:
+            request.session['logged'] = None
+        else:
+            request.session['logged'] = logged
+
+    counts = counters.get_counts()
+    database_data = {'questions_count': counts.get(counters.QUESTIONS_COUNTER, 0), 'airports_count': counts.get(counters.AIRPORTS_COUNTER, 0)}
 
     data = {
         'title' : 'METAR Practice',
@@ -77,7 +164,68 @@ def metar_practice(request):
         'airport' : airport,
         'metar' : metar,
         'question' : question,
-        'report_form' : ReportForm()
+        'report_form' : ReportForm(),
+        'report_url' : get_report_url(request.GET, question['id']) if question is not None else None,
+        'sessionless' : sessionless
     }
 
     return render(request, 'metar_practice/practice.html', data)
+
+
+@decorator_from_middleware(ConditionalGetMiddleware)
+def metar_practice_questions(request):
+    """  Returns a batch of practice questions as JSON, each with its METAR, airport and answers
+
+         Each question avoids the categories given by ?exclude= and those earlier in the batch, as the practice page
+         avoids those in a visitor's history, and ?near= or ?box= select airports like the practice page. The same
+         ?seed= returns the same batch while the questions table is unchanged so seeded responses can be cached, the
+         seed used is returned for requests without one. Responses carry an ETag and If-None-Match gets a 304. """
+    try:
+        count = min(int(request.GET.get('count', QUESTIONS_API_COUNT)), QUESTIONS_API_MAX_COUNT)
+        seed = int(request.GET['seed']) if 'seed' in request.GET else random.getrandbits(32)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    unwanted_question_types = get_excluded_categories(request.GET)
+    question_sampler = QuestionSampler(random.Random(seed))
+    db_airports = get_selected_airports(request.GET)
+    questions = []
+    for i in range(0, count):
+        question_id = choose_question_id(question_sampler, db_airports, unwanted_question_types[-QUESTIONS_TRACEBACK_ALLOWED:])
+        if question_id is None:
+            break
+        db_payload = get_question_payload(question_id)
+        if db_payload is None:
+            continue
+        airport, metar, question = payload_to_context(db_payload)
+        questions.append({'airport': airport, 'metar': metar, 'question': question})
+        unwanted_question_types.append(question['category'])
+
+    response = JsonResponse({'seed': seed, 'questions': questions})
+    if 'seed' in request.GET:
+        patch_cache_control(response, public=True, max_age=QUESTIONS_API_MAX_AGE)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_POST
+def metar_practice_report(request):
+    """  Logs a report about the question given in the POST data, letting the practice page report without reloading """
+    report_form = ReportForm(request.POST)
+    if not report_form.is_valid():
+        return JsonResponse({'error': report_form.errors.get_json_data()}, status=400)
+    try:
+        question_id = get_report_question_id(request.POST, REPORT_QUESTION_FIELD)
+        if question_id is None:
+            raise ValidationError({REPORT_QUESTION_FIELD: 'Select a valid question.'}, code='invalid')
+        report = report_form.save(commit=False)
+        report.question = Question.objects.get(id=question_id)
+        report.full_clean()
+        report.save()
+    except Question.DoesNotExist as e:
+        return JsonResponse({'error': {REPORT_QUESTION_FIELD: [{'message': str(e), 'code': 'invalid'}]}}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'error': {field: [{'message': message, 'code': 'invalid'} for message in messages]
+                                       for field, messages in e.message_dict.items()}}, status=400)
+    return JsonResponse({'logged': REPORT_LOGGED_MESSAGE})
@@ -64,6 +64,28 @@ DATABASES = {
 }
 
 
+# The default cache is per process. The shared cache is seen by every web worker, pull run and pull daemon on this
+# host, it carries the question pool generation so pruning METARs empties every worker's pool.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.environ.get('DJANGO_SHARED_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('DJANGO_SHARED_CACHE_LOCATION', str(BASE_DIR / 'shared_cache')),
+    }
+}
+
+
+# Sessions are kept server side by default so logging out of the admin revokes the session. Practice sessions only hold
+# a few packed question ids, set DJANGO_SESSION_ENGINE to django.contrib.sessions.backends.signed_cookies to keep them in
+# a signed cookie so page views write nothing to the database. The engine is site wide, so admin logins then also live
+# in the cookie and a copied cookie stays valid after logout until SESSION_COOKIE_AGE passes or SECRET_KEY changes.
+
+SESSION_ENGINE = os.environ.get('DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -1,6 +1,26 @@
 const value = JSON.parse(document.getElementById('airport_location').textContent);
+const PREFETCH_COUNT = 3;               // Questions fetched per request to the questions API
+const PREFETCH_LOW_WATER = 2;           // Fetch more questions once fewer than this are queued
+const RECENT_CATEGORIES_ALLOWED = 10;   // Categories of recently shown questions the next questions avoid
 
-window.onload = map_initialize;
+var map = null;
+var marker = null;
+var question_queue = [];
+var recent_categories = [];
+var prefetch_request = null;
+
+window.onload = function() {
+  map_initialize();
+  recent_categories.push(document.getElementById('question').dataset.category);
+  prefetch_questions();
+  var report_form = document.getElementById('report_form');
+  if (report_form != null) {
+    report_form.addEventListener('submit', function(event) {
+      event.preventDefault();
+      submit_report().then(show_next_question_if_logged);
+    });
+  }
+};
 
 // Google function for adding map
 function map_initialize() {
@@ -16,15 +36,26 @@ function map_initialize() {
       mapTypeControl: false
   }
 
-  var map = new google.maps.Map(document.getElementById('map'), map_config);
+  map = new google.maps.Map(document.getElementById('map'), map_config);
 
-  var marker = new google.maps.Marker({
+  marker = new google.maps.Marker({
     position: airport,
     map: map,
   });
 }
 
 
+// Moves the existing map and marker to a new airport instead of building another map
+function map_recenter(latitude, longitude) {
+  var airport = { lat: parseFloat(latitude), lng: parseFloat(longitude) };
+  if (map == null) {
+    return;
+  }
+  map.setCenter(airport);
+  marker.setPosition(airport);
+}
+
+
 function reveal_answer() {
   document.getElementById('answer_revealer').style.display = 'none';
   document.getElementById('answer_container').style.display = 'block';
@@ -32,11 +63,195 @@ function reveal_answer() {
 }
 
 
+function hide_answer() {
+  document.getElementById('answer_container').classList.remove('fade_in_effect');
+  document.getElementById('answer_container').style.display = 'none';
+  document.getElementById('answer_revealer').style.display = '';
+}
+
+
+// Keeps PREFETCH_COUNT or more upcoming questions queued, using the same area selection as the page
+function prefetch_questions() {
+  if (prefetch_request != null) {
+    return prefetch_request;
+  }
+  if (question_queue.length >= PREFETCH_LOW_WATER) {
+    return Promise.resolve();
+  }
+  var params = new URLSearchParams(window.location.search);
+  params.delete('report');
+  params.set('count', PREFETCH_COUNT);
+  params.set('exclude', recent_categories.concat(question_queue.map(function(item) { return item['question']['category']; })).join(','));
+  var url = document.getElementById('core').dataset.questionsUrl + '?' + params.toString();
+  prefetch_request = fetch(url, { credentials: 'same-origin' })
+    .then(function(response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.json();
+    })
+    .then(function(data) {
+      question_queue = question_queue.concat(data['questions']);
+    })
+    .catch(function(error) {
+      console.log(error);
+    })
+    .finally(function() {
+      prefetch_request = null;
+    });
+  return prefetch_request;
+}
+
+
+function set_text(id, text) {
+  document.getElementById(id).textContent = text;
+}
+
+
+// Swaps the METAR, airport details and answers of a prefetched question into the page
+function show_question(item) {
+  var airport = item['airport'];
+  var question = item['question'];
+  set_text('metar', item['metar']['raw']);
+  set_text('airport_name', airport['name']);
+  set_text('airport_icao', airport['icao']);
+  set_text('airport_country', airport['country']);
+  set_text('airport_city', airport['city']);
+  set_text('airport_latitude', airport['latitude']);
+  set_text('airport_longitude', airport['longitude']);
+  map_recenter(airport['latitude'], airport['longitude']);
+
+  var question_element = document.getElementById('question');
+  question_element.textContent = question['text'];
+  question_element.dataset.questionId = question['id'];
+  question_element.dataset.category = question['category'];
+
+  var answers = document.getElementById('answers');
+  answers.textContent = '';
+  if (question['answers'].length == 1) {
+    var answer = document.createElement('p');
+    answer.className = 'answer';
+    answer.textContent = question['answers'][0]['text'];
+    answers.appendChild(answer);
+  } else {
+    var container = document.createElement('div');
+    container.id = 'multiple_answer_container';
+    var list = document.createElement('ul');
+    list.id = 'answer_list';
+    question['answers'].forEach(function(item) {
+      var answer = document.createElement('li');
+      answer.className = 'answer';
+      answer.textContent = item['text'];
+      list.appendChild(answer);
+    });
+    container.appendChild(list);
+    answers.appendChild(container);
+  }
+
+  var report_link = document.getElementById('report_link');
+  if (report_link != null) {
+    var params = new URLSearchParams(window.location.search);
+    params.set('report', question['id']);
+    report_link.href = '?' + params.toString();
+  }
+  var report_question = document.getElementById('report_question');
+  if (report_question != null) {
+    report_question.value = question['id'];
+  }
+  hide_answer();
+  recent_categories.push(question['category']);
+  recent_categories = recent_categories.slice(-RECENT_CATEGORIES_ALLOWED);
+}
+
+
+// Reloads the page passing the categories shown without a reload, the session history only holds the first question
+function reload_page() {
+  var params = new URLSearchParams(window.location.search);
+  params.delete('report');
+  params.set('exclude', recent_categories.join(','));
+  window.location.search = params.toString();
+}
+
+
+// Shows the next queued question, reloading the page only if nothing could be prefetched
+function show_next_question() {
+  if (question_queue.length == 0) {
+    return prefetch_questions().then(function() {
+      if (question_queue.length == 0) {
+        reload_page();
+      } else {
+        show_next_question();
+      }
+    });
+  }
+  show_question(question_queue.shift());
+  prefetch_questions();
+  return Promise.resolve();
+}
+
+
+// Moves on after a report only if it was logged, a rejected report stays on screen with its error
+function show_next_question_if_logged(logged) {
+  if (logged) {
+    return show_next_question();
+  }
+}
+
+
+function show_logged(message) {
+  var logged = document.getElementById('logged');
+  if (logged == null) {
+    var container = document.createElement('div');
+    container.id = 'logged_container';
+    logged = document.createElement('p');
+    logged.id = 'logged';
+    container.appendChild(logged);
+    document.getElementById('banner').before(container);
+  }
+  logged.textContent = message;
+}
+
+
+// Posts the report form about the question on screen without leaving the page, resolving false if it was rejected
+function submit_report() {
+  var report_form = document.getElementById('report_form');
+  var form_data = new FormData(report_form);
+  return fetch(document.getElementById('core').dataset.reportUrl, { method: 'POST', body: form_data, credentials: 'same-origin' })
+    .then(function(response) {
+      return response.json().then(function(data) {
+        if (!response.ok) {
+          show_logged(get_error_message(data['error']));
+          return false;
+        }
+        show_logged(data['logged']);
+        document.getElementById('description_text_area').value = '';
+        return true;
+      });
+    })
+    .catch(function(error) {
+      console.log(error);
+      return false;
+    });
+}
+
+
+// Joins the messages of a JSON error response, keyed by field as Django form errors are
+function get_error_message(error) {
+  var messages = [];
+  Object.keys(error || {}).forEach(function(field) {
+    error[field].forEach(function(item) {
+      messages.push(item['message']);
+    });
+  });
+  return messages.length > 0 ? messages.join(' ') : 'Your issue could not be logged.';
+}
+
+
 function refresh_page() {
-  var description_value = document.getElementById('description_text_area').value;
-  if (description_value != "") {
-    document.getElementById("submit_report_form").click();
+  var description = document.getElementById('description_text_area');
+  if (description != null && description.value != "") {
+    submit_report().then(show_next_question_if_logged);
   } else{
-    window.location.reload(false);
+    show_next_question();
   }
 }